@@ -3,7 +3,7 @@ API Router aggregation
 """
 from fastapi import APIRouter
 
-from app.api.v1 import scraping, insights, auth
+from app.api.v1 import scraping, insights, items, results, auth, system, webhooks
 
 router = APIRouter()
 
@@ -11,3 +11,7 @@ router = APIRouter()
 router.include_router(auth.router, prefix="/v1/auth", tags=["인증"])
 router.include_router(scraping.router, prefix="/v1/scraping", tags=["스크래핑"])
 router.include_router(insights.router, prefix="/v1/insights", tags=["인사이트"])
+router.include_router(items.router, prefix="/v1/items", tags=["아이템 분석"])
+router.include_router(results.router, prefix="/v1/results", tags=["저장된 결과"])
+router.include_router(system.router, prefix="/v1/system", tags=["시스템"])
+router.include_router(webhooks.router, prefix="/v1/webhooks", tags=["웹훅"])
@@ -2,11 +2,16 @@
 LLM Insights endpoints
 MVP 핵심 차별화 기능: 스크래핑 데이터 → AI 분석 → 인사이트 리포트
 """
+from datetime import datetime
 from typing import Optional, Dict, Any, List
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
 
+from app.core.deps import get_tenant_id
+from app.services.item_store_service import item_store
 from app.services.llm_service import LLMService
+from app.services.result_store_service import result_store
+from app.services.scheduler_service import llm_scheduler
 
 router = APIRouter()
 
@@ -28,6 +33,16 @@ class InsightResponse(BaseModel):
     summary: Optional[str] = None
     recommendations: Optional[List[str]] = None
     error: Optional[str] = None
+    result_id: Optional[str] = None  # GET /results/{result_id}
+
+
+class TrendInsightRequest(BaseModel):
+    """Insight generation over stored item aggregates."""
+    domain: Optional[str] = None
+    data_type: Optional[str] = None
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    analysis_type: str = "trends"
 
 
 class CompareRequest(BaseModel):
@@ -43,6 +58,7 @@ class CompareResponse(BaseModel):
     comparison: Optional[Dict[str, Any]] = None
     highlights: Optional[List[str]] = None
     error: Optional[str] = None
+    result_id: Optional[str] = None  # GET /results/{result_id}
 
 
 class ReportRequest(BaseModel):
@@ -58,10 +74,11 @@ class ReportResponse(BaseModel):
     report: Optional[str] = None  # Markdown formatted report
     sections: Optional[Dict[str, str]] = None
     error: Optional[str] = None
+    result_id: Optional[str] = None  # GET /results/{result_id}
 
 
 @router.post("/analyze", response_model=InsightResponse)
-async def analyze_data(request: InsightRequest):
+async def analyze_data(request: InsightRequest, tenant_id: str = Depends(get_tenant_id)):
     """
     데이터 분석 및 인사이트 생성
     
@@ -72,19 +89,70 @@ async def analyze_data(request: InsightRequest):
     - **analysis_type**: 분석 유형 (summary, trends, recommendations)
     """
     try:
-        insights = await llm.generate_insights(
+        insights = await llm_scheduler.run(
+            tenant_id,
+            llm.generate_insights,
             data=request.data,
             data_type=request.data_type,
             analysis_type=request.analysis_type
         )
         
-        return InsightResponse(
+        return await result_store.save(tenant_id, "insights.analyze", InsightResponse(
             success=True,
             analysis_type=request.analysis_type,
             insights=insights,
             summary=insights.get("summary"),
             recommendations=insights.get("recommendations")
+        ))
+    except Exception as e:
+        return InsightResponse(
+            success=False,
+            analysis_type=request.analysis_type,
+            error=str(e)
         )
+
+
+@router.post("/trends", response_model=InsightResponse)
+async def analyze_trends(request: TrendInsightRequest, tenant_id: str = Depends(get_tenant_id)):
+    """
+    누적 아이템 집계 기반 인사이트 생성
+    
+    지금까지 추출된 아이템(컬럼 저장소)의 사전 집계 결과 - 컬럼별 통계, 일별 추이,
+    주요 카테고리 - 를 LLM에 전달합니다. 원본 JSON을 잘라서 보내는 대신 전체 데이터를 반영합니다.
+    
+    - **domain**: 특정 도메인만 분석 (선택)
+    - **data_type**: 데이터 유형 필터 (선택)
+    - **since / until**: 기간 필터 (선택)
+    """
+    summary = await item_store.summarize(
+        tenant_id,
+        domain=request.domain,
+        data_type=request.data_type,
+        since=request.since.timestamp() if request.since else None,
+        until=request.until.timestamp() if request.until else None,
+    )
+    if not summary["item_count"]:
+        return InsightResponse(
+            success=False,
+            analysis_type=request.analysis_type,
+            error="분석할 아이템이 없습니다"
+        )
+    try:
+        insights = await llm_scheduler.run(
+            tenant_id,
+            llm.generate_insights,
+            data=summary,
+            data_type=request.data_type or "auto",
+            analysis_type=request.analysis_type
+        )
+        
+        return await result_store.save(tenant_id, "insights.trends", InsightResponse(
+            success=True,
+            analysis_type=request.analysis_type,
+            insights=insights,
+            summary=insights.get("summary"),
+            recommendations=insights.get("recommendations")
+        ))
     except Exception as e:
         return InsightResponse(
             success=False,
@@ -94,7 +162,7 @@ async def analyze_data(request: InsightRequest):
 
 
 @router.post("/compare", response_model=CompareResponse)
-async def compare_data(request: CompareRequest):
+async def compare_data(request: CompareRequest, tenant_id: str = Depends(get_tenant_id)):
     """
     데이터 비교 분석
     
@@ -106,17 +174,19 @@ async def compare_data(request: CompareRequest):
     - **comparison_type**: 비교 유형
     """
     try:
-        comparison = await llm.compare_data(
+        comparison = await llm_scheduler.run(
+            tenant_id,
+            llm.compare_data,
             data_sets=request.data_sets,
             labels=request.labels,
             comparison_type=request.comparison_type
         )
         
-        return CompareResponse(
+        return await result_store.save(tenant_id, "insights.compare", CompareResponse(
             success=True,
             comparison=comparison,
             highlights=comparison.get("highlights")
-        )
+        ))
     except Exception as e:
         return CompareResponse(
             success=False,
@@ -125,7 +195,7 @@ async def compare_data(request: CompareRequest):
 
 
 @router.post("/report", response_model=ReportResponse)
-async def generate_report(request: ReportRequest):
+async def generate_report(request: ReportRequest, tenant_id: str = Depends(get_tenant_id)):
     """
     인사이트 리포트 생성
     
@@ -136,17 +206,19 @@ async def generate_report(request: ReportRequest):
     - **language**: 언어 (ko, en)
     """
     try:
-        report = await llm.generate_report(
+        report = await llm_scheduler.run(
+            tenant_id,
+            llm.generate_report,
             data=request.data,
             report_type=request.report_type,
             language=request.language
         )
         
-        return ReportResponse(
+        return await result_store.save(tenant_id, "insights.report", ReportResponse(
             success=True,
             report=report.get("full_report"),
             sections=report.get("sections")
-        )
+        ))
     except Exception as e:
         return ReportResponse(
             success=False,
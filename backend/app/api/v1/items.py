@@ -0,0 +1,89 @@
+"""
+Item analytics endpoints
+Aggregate queries over extracted items (columnar item store)
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from pydantic import BaseModel
+
+from app.core.deps import get_tenant_id
+from app.services.item_store_service import ItemQueryError, item_store
+
+router = APIRouter()
+
+
+class AggregateRequest(BaseModel):
+    """Aggregate query over the tenant's extracted items."""
+    metrics: List[str] = ["count"]  # count, sum:<col>, avg:<col>, min:<col>, max:<col>, p95:<col>
+    group_by: List[str] = []
+    bucket: Optional[str] = None  # hour, day, week
+    domain: Optional[str] = None
+    data_type: Optional[str] = None
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    limit: int = 1000
+
+
+class AggregateResponse(BaseModel):
+    """Aggregate query result (one row per group)."""
+    rows: List[Dict[str, Any]]
+    scanned_rows: int
+    engine: str
+    elapsed_ms: float
+
+
+@router.get("/columns")
+async def get_columns(tenant_id: str = Depends(get_tenant_id)):
+    """
+    집계 가능한 아이템 컬럼 목록 (현재 테넌트 기준)
+
+    추출된 아이템의 중첩 필드는 점(.)으로 이어진 컬럼명으로 펼쳐집니다 (예: `seller.name`).
+    컬럼 타입은 이 테넌트가 저장한 값으로 정해집니다 (값 대부분이 숫자면 `number`).
+    메타 컬럼: `_domain`, `_url`, `_data_type`, `_ts`
+    """
+    return {"columns": item_store.columns(tenant_id), "engine": item_store.engine}
+
+
+@router.post("/aggregate", response_model=AggregateResponse)
+async def aggregate_items(request: AggregateRequest, tenant_id: str = Depends(get_tenant_id)):
+    """
+    추출 아이템 집계 쿼리
+    
+    그룹별/기간별 집계를 벡터 연산으로 실행합니다.
+    예: 카테고리별 일 평균 가격 → `metrics=["avg:price"], group_by=["category"], bucket="day"`
+    
+    - **metrics**: count, sum, avg, min, max, 백분위수(p50, p95 ...) - `avg:price` 형식
+    - **group_by**: 그룹 기준 컬럼
+    - **bucket**: 시간 단위 (hour, day, week)
+    - **domain / data_type / since / until**: 필터
+    """
+    try:
+        return await item_store.query(
+            tenant_id,
+            metrics=request.metrics,
+            group_by=request.group_by,
+            bucket=request.bucket,
+            domain=request.domain,
+            data_type=request.data_type,
+            since=request.since.timestamp() if request.since else None,
+            until=request.until.timestamp() if request.until else None,
+            limit=request.limit,
+        )
+    except ItemQueryError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.get("/summary")
+async def get_summary(
+    domain: Optional[str] = None,
+    data_type: Optional[str] = None,
+    tenant_id: str = Depends(get_tenant_id),
+):
+    """
+    아이템 사전 집계 요약 (컬럼별 통계, 일별 추이, 주요 카테고리)
+    
+    `/insights/trends`가 LLM에 전달하는 데이터와 같습니다.
+    """
+    return await item_store.summarize(tenant_id, domain=domain, data_type=data_type)
@@ -0,0 +1,112 @@
+"""
+Stored result endpoints
+Re-read scraping / insight results by ID with projection, pagination and ETags
+"""
+from typing import Any, Callable, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+
+from app.core.deps import get_tenant_id
+from app.core.serialization import FastJSONResponse
+from app.services.result_store_service import (
+    InvalidCursorError,
+    ResultNotFoundError,
+    StoredResult,
+    decode_cursor,
+    encode_cursor,
+    etag_matches,
+    project,
+    result_store,
+    view_etag,
+)
+
+router = APIRouter()
+
+# Clients may keep a copy but must revalidate it (cheap: 304 without a body)
+CACHE_CONTROL = "private, no-cache"
+
+
+def _split(value: Optional[str]) -> list:
+    return [field.strip() for field in (value or "").split(",") if field.strip()]
+
+
+def _get_result(tenant_id: str, result_id: str) -> StoredResult:
+    try:
+        return result_store.get(tenant_id, result_id)
+    except ResultNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+
+def _conditional(request: Request, etag: str, build: Callable[[], Any]) -> Response:
+    """304 when the client already has this representation, else the JSON body."""
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        result_store.not_modified += 1
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return FastJSONResponse(content=build(), headers=headers)
+
+
+@router.get("/{result_id}")
+async def get_result(
+    result_id: str,
+    request: Request,
+    fields: Optional[str] = Query(None, description="포함할 필드 (쉼표 구분, 예: url,extracted_data.items)"),
+    exclude: Optional[str] = Query(None, description="제외할 필드 (쉼표 구분, 예: raw_content)"),
+    tenant_id: str = Depends(get_tenant_id),
+):
+    """
+    저장된 결과 조회
+
+    `/scraping/*`, `/insights/*` 응답의 `result_id`로 파이프라인을 다시 실행하지 않고 결과를 가져옵니다.
+    응답의 `ETag`를 `If-None-Match` 헤더로 보내면 변경이 없을 때 본문 없이 `304`를 반환합니다.
+
+    - **fields**: 포함할 필드만 반환
+    - **exclude**: 제외할 필드 (예: `raw_content`)
+    """
+    result = _get_result(tenant_id, result_id)
+    include, drop = _split(fields), _split(exclude)
+    etag = view_etag(result, "result", include, drop)
+    return _conditional(request, etag, lambda: {
+        "result_id": result.id,
+        "kind": result.kind,
+        "created_at": result.created_at,
+        **project(result.body, include, drop),
+    })
+
+
+@router.get("/{result_id}/items")
+async def get_result_items(
+    result_id: str,
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    fields: Optional[str] = Query(None, description="항목별 포함할 필드 (쉼표 구분, 예: name,price)"),
+    tenant_id: str = Depends(get_tenant_id),
+):
+    """
+    저장된 결과의 추출 항목(`items`) 페이지 조회
+
+    `next_cursor`를 다음 요청의 `cursor`로 전달합니다 (마지막 페이지에서는 `null`).
+    페이지별로 `ETag` / `If-None-Match` → `304`를 지원합니다.
+    """
+    result = _get_result(tenant_id, result_id)
+    items = result.items
+    if items is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="이 결과에는 items 목록이 없습니다")
+    try:
+        offset = decode_cursor(result.id, cursor)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    include = _split(fields)
+    etag = view_etag(result, "items", offset, limit, include)
+
+    def build() -> Any:
+        end = offset + limit
+        return {
+            "result_id": result.id,
+            "items": [project(item, include) for item in items[offset:end]],
+            "total": len(items),
+            "next_cursor": encode_cursor(result.id, end) if end < len(items) else None,
+        }
+
+    return _conditional(request, etag, build)
@@ -2,25 +2,42 @@
 Web Scraping endpoints using Firecrawl
 Core MVP functionality: URL → Scrape → Extract
 """
+import asyncio
 from typing import Optional, Dict, Any, List
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, HttpUrl
 
+from app.core.config import settings
+from app.core.deadline import cancel_on_disconnect, deadline_scope, request_deadline
+from app.core.deps import get_tenant_id
+from app.core.executor import run_cpu
+from app.core.serialization import dumps_str
+from app.core.spill import materialize
+from app.services.boilerplate_service import boilerplate_filter
+from app.services.crawl_service import CrawlJobLimitError, CrawlJobNotFoundError, crawl_manager
+from app.services.dedup_service import dedup_index, task_key
 from app.services.firecrawl_service import FirecrawlService
 from app.services.llm_service import LLMService
+from app.services.pipeline_service import QuickPipeline
+from app.services.prefetch_service import prefetcher
+from app.services.result_store_service import result_store
+from app.services.scheduler_service import firecrawl_scheduler, llm_scheduler
 
 router = APIRouter()
 
 firecrawl = FirecrawlService()
 llm = LLMService()
+pipeline = QuickPipeline(firecrawl, llm)
 
 
 class ScrapeRequest(BaseModel):
     """Single URL scrape request."""
     url: HttpUrl
     formats: List[str] = ["markdown"]
-    only_main_content: bool = True
-    wait_for: Optional[int] = None  # milliseconds
+    only_main_content: Optional[bool] = None  # None: learned per domain
+    wait_for: Optional[int] = None  # milliseconds, None: learned per domain
+    max_age: Optional[float] = None  # Oldest cached result to accept in seconds, 0: always scrape
 
 
 class ScrapeResponse(BaseModel):
@@ -30,6 +47,7 @@ class ScrapeResponse(BaseModel):
     content: Optional[str] = None
     metadata: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
+    result_id: Optional[str] = None  # GET /results/{result_id}
 
 
 class ExtractRequest(BaseModel):
@@ -45,13 +63,16 @@ class ExtractResponse(BaseModel):
     url: str
     data: Optional[Dict[str, Any]] = None
     raw_content: Optional[str] = None
+    duplicate_of: Optional[str] = None  # Already processed near-duplicate page
     error: Optional[str] = None
+    result_id: Optional[str] = None  # GET /results/{result_id}
 
 
 class QuickScrapeRequest(BaseModel):
     """MVP: Quick scrape with auto extraction."""
     url: HttpUrl
     data_type: str = "auto"  # auto, products, articles, contacts, etc.
+    max_age: Optional[float] = None  # Oldest cached scrape to accept in seconds, 0: always scrape
 
 
 class QuickScrapeResponse(BaseModel):
@@ -61,11 +82,14 @@ class QuickScrapeResponse(BaseModel):
     extracted_data: Optional[Dict[str, Any]] = None
     insights: Optional[Dict[str, Any]] = None
     raw_content: Optional[str] = None
+    duplicate_of: Optional[str] = None  # Already processed near-duplicate page
+    partial: bool = False  # Deadline hit; later stages are missing
     error: Optional[str] = None
+    result_id: Optional[str] = None  # GET /results/{result_id}
 
 
 @router.post("/scrape", response_model=ScrapeResponse)
-async def scrape_url(request: ScrapeRequest):
+async def scrape_url(request: ScrapeRequest, tenant_id: str = Depends(get_tenant_id)):
     """
     URL 스크래핑
     
@@ -73,21 +97,30 @@ async def scrape_url(request: ScrapeRequest):
     
     - **url**: 스크래핑할 URL
     - **formats**: 출력 형식 (markdown, html, rawHtml)
-    - **only_main_content**: 메인 콘텐츠만 추출
+    - **only_main_content**: 메인 콘텐츠만 추출 (생략 시 도메인별 학습값)
+    - **wait_for**: 렌더링 대기 시간(ms) (생략 시 도메인별 학습값)
+    - **max_age**: 이보다 오래된(초) 캐시 결과는 쓰지 않음 (0이면 항상 새로 스크래핑)
     """
     try:
-        result = await firecrawl.scrape(
+        options = dict(
             url=str(request.url),
             formats=request.formats,
             only_main_content=request.only_main_content,
-            wait_for=request.wait_for
+            wait_for=request.wait_for,
         )
-        return ScrapeResponse(
+        # Cache hits don't queue for a Firecrawl slot
+        result = firecrawl.cached(**options, max_age=request.max_age)
+        if result is None:
+            result = await firecrawl_scheduler.run(
+                tenant_id, firecrawl.scrape, **options, cache_checked=True
+            )
+        prefetcher.observe(tenant_id, str(request.url))
+        return await result_store.save(tenant_id, "scraping.scrape", ScrapeResponse(
             success=True,
             url=str(request.url),
-            content=result.get("markdown") or result.get("html"),
+            content=materialize(result.get("markdown") or result.get("html")),
             metadata=result.get("metadata")
-        )
+        ))
     except Exception as e:
         return ScrapeResponse(
             success=False,
@@ -97,7 +130,11 @@ async def scrape_url(request: ScrapeRequest):
 
 
 @router.post("/extract", response_model=ExtractResponse)
-async def extract_data(request: ExtractRequest):
+async def extract_data(
+    request: ExtractRequest,
+    raw_request: Request,
+    tenant_id: str = Depends(get_tenant_id),
+):
     """
     구조화된 데이터 추출
     
@@ -106,30 +143,13 @@ async def extract_data(request: ExtractRequest):
     - **url**: 데이터를 추출할 URL
     - **prompt**: 추출할 데이터에 대한 설명
     - **schema**: 추출할 데이터의 JSON 스키마 (선택사항)
+    
+    `X-Request-Timeout` 헤더(초)로 전체 처리 시간 한도를 지정할 수 있습니다.
     """
+    deadline = request_deadline(raw_request, settings.EXTRACT_DEADLINE_SECONDS, settings.MAX_DEADLINE_SECONDS)
     try:
-        # First scrape the page
-        scraped = await firecrawl.scrape(
-            url=str(request.url),
-            formats=["markdown"],
-            only_main_content=True
-        )
-        
-        raw_content = scraped.get("markdown", "")
-        
-        # Then extract structured data using LLM
-        extracted = await llm.extract_structured_data(
-            content=raw_content,
-            prompt=request.prompt,
-            schema=request.schema
-        )
-        
-        return ExtractResponse(
-            success=True,
-            url=str(request.url),
-            data=extracted,
-            raw_content=raw_content[:1000] if raw_content else None  # Truncate
-        )
+        with deadline_scope(deadline):
+            return await cancel_on_disconnect(raw_request, _extract(request, tenant_id))
     except Exception as e:
         return ExtractResponse(
             success=False,
@@ -138,8 +158,58 @@ async def extract_data(request: ExtractRequest):
         )
 
 
+async def _extract(request: ExtractRequest, tenant_id: str) -> ExtractResponse:
+    # First scrape the page (cache hits don't queue for a Firecrawl slot)
+    scraped = firecrawl.cached(str(request.url), ["markdown"])
+    if scraped is None:
+        scraped = await firecrawl_scheduler.run(
+            tenant_id,
+            firecrawl.scrape,
+            url=str(request.url),
+            formats=["markdown"],
+            cache_checked=True,
+        )
+    prefetcher.observe(tenant_id, str(request.url))
+    
+    raw_content = scraped.get("markdown", "")
+    content, _ = boilerplate_filter.strip(str(request.url), raw_content)
+    
+    # Reuse the extraction of a near-duplicate page with the same prompt
+    task = task_key("extract", request.prompt, request.schema)
+    signature = await run_cpu(
+        dedup_index.signature, raw_content, size=len(raw_content), shared_state=True
+    )
+    reused = dedup_index.reuse(str(request.url), signature, task) if signature is not None else None
+    duplicate, extracted = reused or (None, None)
+    
+    # Then extract structured data using LLM
+    if extracted is None:
+        extracted = await llm_scheduler.run(
+            tenant_id,
+            llm.extract_structured_data,
+            content=content,
+            prompt=request.prompt,
+            schema=request.schema
+        )
+        if signature is not None:
+            dedup_index.add(str(request.url), signature)
+            dedup_index.put_result(str(request.url), task, extracted)
+    
+    return await result_store.save(tenant_id, "scraping.extract", ExtractResponse(
+        success=True,
+        url=str(request.url),
+        data=extracted,
+        raw_content=raw_content[:1000] if raw_content else None,  # Truncate
+        duplicate_of=duplicate.url if duplicate else None
+    ))
+
+
 @router.post("/quick", response_model=QuickScrapeResponse)
-async def quick_scrape(request: QuickScrapeRequest):
+async def quick_scrape(
+    request: QuickScrapeRequest,
+    raw_request: Request,
+    tenant_id: str = Depends(get_tenant_id),
+):
     """
     MVP 핵심 기능: 빠른 스크래핑 + 자동 추출 + 인사이트
     
@@ -147,35 +217,25 @@ async def quick_scrape(request: QuickScrapeRequest):
     
     - **url**: 분석할 URL
     - **data_type**: 데이터 타입 (auto, products, articles, contacts)
+    - **max_age**: 이보다 오래된(초) 캐시된 스크래핑 결과는 쓰지 않음 (0이면 항상 새로 스크래핑)
+    
+    `X-Request-Timeout` 헤더(초)로 전체 처리 시간 한도를 지정할 수 있습니다.
+    시간이 부족하면 완료된 단계까지의 결과를 `partial: true`로 반환합니다.
     """
+    deadline = request_deadline(raw_request, settings.QUICK_DEADLINE_SECONDS, settings.MAX_DEADLINE_SECONDS)
     try:
-        # Step 1: Scrape the page
-        scraped = await firecrawl.scrape(
-            url=str(request.url),
-            formats=["markdown"],
-            only_main_content=True
-        )
-        raw_content = scraped.get("markdown", "")
-        
-        # Step 2: Auto-detect and extract data
-        extracted = await llm.auto_extract(
-            content=raw_content,
-            data_type=request.data_type
-        )
-        
-        # Step 3: Generate insights
-        insights = await llm.generate_insights(
-            data=extracted,
-            data_type=request.data_type
-        )
-        
-        return QuickScrapeResponse(
+        with deadline_scope(deadline):
+            result = await cancel_on_disconnect(raw_request, pipeline.run(
+                url=str(request.url),
+                data_type=request.data_type,
+                tenant_id=tenant_id,
+                max_age=request.max_age,
+            ))
+        return await result_store.save(tenant_id, "scraping.quick", QuickScrapeResponse(
             success=True,
             url=str(request.url),
-            extracted_data=extracted,
-            insights=insights,
-            raw_content=raw_content[:500] if raw_content else None
-        )
+            **result
+        ))
     except Exception as e:
         return QuickScrapeResponse(
             success=False,
@@ -184,6 +244,168 @@ async def quick_scrape(request: QuickScrapeRequest):
         )
 
 
+@router.post("/quick/stream")
+async def quick_scrape_stream(
+    request: QuickScrapeRequest,
+    raw_request: Request,
+    tenant_id: str = Depends(get_tenant_id),
+):
+    """
+    빠른 스크래핑 진행 상황 스트리밍 (Server-Sent Events)
+    
+    `/quick`과 동일한 파이프라인을 실행하면서 단계별 진행 이벤트를 전송합니다.
+    스크래핑이 끝나는 즉시 마크다운 미리보기, 추출이 끝나는 즉시 추출 결과를 받을 수 있습니다.
+    
+    이벤트: `stage_start`, `stage_end`, `partial`, `deadline`, `result`, `error`
+    """
+    deadline = request_deadline(raw_request, settings.QUICK_DEADLINE_SECONDS, settings.MAX_DEADLINE_SECONDS)
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def on_event(event: str, payload: Dict[str, Any]) -> None:
+        await queue.put((event, payload))
+
+    async def run_pipeline() -> None:
+        try:
+            with deadline_scope(deadline):
+                result = await pipeline.run(
+                    url=str(request.url),
+                    data_type=request.data_type,
+                    tenant_id=tenant_id,
+                    on_event=on_event,
+                    max_age=request.max_age,
+                )
+            response = await result_store.save(
+                tenant_id, "scraping.quick", QuickScrapeResponse(success=True, url=str(request.url), **result)
+            )
+            await queue.put(("result", response.model_dump()))
+        except Exception as e:
+            await queue.put(("error", {"url": str(request.url), "error": str(e)}))
+        finally:
+            await queue.put(None)
+
+    async def event_stream():
+        task = asyncio.create_task(run_pipeline())
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                event, payload = item
+                data = dumps_str(payload)
+                yield f"event: {event}\ndata: {data}\n\n"
+        finally:
+            # Client went away - stop spending upstream capacity on it
+            if not task.done():
+                task.cancel()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+class CrawlRequest(BaseModel):
+    """Website crawl processed page by page via webhooks."""
+    url: HttpUrl
+    data_type: str = "auto"
+    limit: int = 100
+    max_depth: Optional[int] = None
+    include_paths: Optional[List[str]] = None  # URL path regexes
+    exclude_paths: Optional[List[str]] = None
+
+
+class BatchScrapeRequest(BaseModel):
+    """Batch scrape processed page by page via webhooks."""
+    urls: List[HttpUrl]
+    data_type: str = "auto"
+
+
+@router.post("/crawl")
+async def start_crawl(request: CrawlRequest, tenant_id: str = Depends(get_tenant_id)):
+    """
+    사이트 크롤링 시작 (비동기)
+    
+    Firecrawl 크롤링 작업을 웹훅과 함께 등록합니다. 페이지가 완료될 때마다 웹훅으로 전달되어
+    즉시 반복 블록 제거 → 중복 확인 → 자동 추출이 실행되며, 상태 조회(폴링) 요청은 필요 없습니다.
+    
+    - **url**: 시작 URL
+    - **limit**: 최대 페이지 수
+    - **max_depth**: 최대 링크 깊이
+    """
+    try:
+        job = await crawl_manager.start_crawl(
+            tenant_id,
+            str(request.url),
+            data_type=request.data_type,
+            limit=request.limit,
+            max_depth=request.max_depth,
+            include_paths=request.include_paths,
+            exclude_paths=request.exclude_paths,
+        )
+    except CrawlJobLimitError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=f"크롤링 시작 실패: {str(e)}"
+        )
+    return job.summary()
+
+
+@router.post("/batch")
+async def start_batch_scrape(request: BatchScrapeRequest, tenant_id: str = Depends(get_tenant_id)):
+    """
+    여러 URL 일괄 스크래핑 시작 (비동기, 웹훅으로 페이지별 처리)
+    """
+    try:
+        job = await crawl_manager.start_batch(
+            tenant_id, [str(url) for url in request.urls], data_type=request.data_type
+        )
+    except CrawlJobLimitError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=f"일괄 스크래핑 시작 실패: {str(e)}"
+        )
+    return job.summary()
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, tenant_id: str = Depends(get_tenant_id)):
+    """
+    크롤링/일괄 스크래핑 작업 상태 및 처리된 페이지 결과
+    """
+    try:
+        job = crawl_manager.get(job_id)
+    except CrawlJobNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    if job.tenant_id != tenant_id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"작업을 찾을 수 없습니다: {job_id}")
+    return job.summary(include_results=True)
+
+
+@router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str, tenant_id: str = Depends(get_tenant_id)):
+    """
+    크롤링 작업 취소
+    """
+    try:
+        job = crawl_manager.get(job_id)
+        if job.tenant_id != tenant_id:
+            raise CrawlJobNotFoundError(f"작업을 찾을 수 없습니다: {job_id}")
+        job = await crawl_manager.cancel(job_id)
+    except CrawlJobNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=f"크롤링 취소 실패: {str(e)}"
+        )
+    return job.summary()
+
+
 @router.get("/test")
 async def test_connection():
     """
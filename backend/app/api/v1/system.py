@@ -0,0 +1,160 @@
+"""
+System endpoints
+Upstream capacity, scheduling and usage statistics
+
+All endpoints except /usage require the operator key (X-Admin-Key).
+"""
+from fastapi import APIRouter, Depends
+
+from app.core.admission import admission_controller
+from app.core.deps import get_tenant_id, is_admin, require_admin
+from app.core.loop_monitor import loop_monitor
+from app.core.tracing import InMemoryExporter, tracer
+
+from app.services.boilerplate_service import boilerplate_filter
+from app.services.crawl_service import crawl_manager
+from app.services.dedup_service import dedup_index
+from app.services.item_store_service import item_store
+from app.services.prefetch_service import prefetcher
+from app.services.rate_limit_service import rate_limiter
+from app.services.render_profile_service import render_profiles
+from app.services.result_store_service import result_store
+from app.services.scheduler_service import firecrawl_scheduler, llm_scheduler
+from app.services.token_service import token_ledger
+
+router = APIRouter()
+# Everything except /usage spans all tenants (IDs, client IPs, domains, URLs) - operators only
+admin_router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+@admin_router.get("/scheduler")
+async def get_scheduler_stats():
+    """
+    테넌트별 업스트림 대기열 현황
+
+    Firecrawl / OpenRouter 스케줄러의 테넌트별 대기열 길이와 대기 시간 통계,
+    클러스터 공용 요청 한도(rate limit) 상태를 반환합니다.
+    """
+    return {
+        "firecrawl": firecrawl_scheduler.stats(),
+        "openrouter": llm_scheduler.stats(),
+        "rate_limits": rate_limiter.stats(),
+    }
+
+
+@admin_router.get("/admission")
+async def get_admission_stats():
+    """
+    요청 승인(admission) 및 부하 차단 현황
+
+    요청 유형별 예상 처리 시간, 승인/거부 수, 대기열 길이와 CoDel 차단 상태를 반환합니다.
+    """
+    return admission_controller.stats()
+
+
+@router.get("/usage")
+async def get_token_usage(tenant_id: str = Depends(get_tenant_id), admin: bool = Depends(is_admin)):
+    """
+    LLM 토큰 사용량 및 비용
+
+    현재 테넌트의 실제 프롬프트·완료 토큰과 비용, 오늘 사용량, 최근 호출을 반환합니다.
+    `X-Admin-Key` 헤더에 `SYSTEM_ADMIN_KEY`를 보내면 전체 테넌트/엔드포인트/모델/프롬프트 버전별 사용량을 반환합니다.
+    """
+    return token_ledger.summary(None if admin else tenant_id)
+
+
+@admin_router.get("/boilerplate")
+async def get_boilerplate_stats():
+    """
+    도메인별 반복 블록(헤더/메뉴/푸터) 학습 현황
+
+    학습된 페이지 수와 LLM 전송 전 제거된 콘텐츠 비율을 반환합니다.
+    """
+    return boilerplate_filter.stats()
+
+
+@admin_router.get("/dedup")
+async def get_dedup_stats():
+    """
+    유사 중복 페이지 인덱스 현황
+
+    인덱싱된 페이지 수, 조회 수, 중복으로 판정되어 추출을 재사용한 횟수를 반환합니다.
+    """
+    return dedup_index.stats()
+
+
+@admin_router.get("/prefetch")
+async def get_prefetch_stats():
+    """
+    스크래핑 캐시 및 예측 프리페치 현황
+
+    캐시 적중률, 도메인별 프리페치 적중/낭비 수와 비활성화(효과 없음) 상태를 반환합니다.
+    """
+    return prefetcher.stats()
+
+
+@admin_router.get("/render")
+async def get_render_profile_stats():
+    """
+    도메인별 렌더링 프로필 현황
+
+    학습된 `waitFor`, 콘텐츠 모드(main/trimmed/full), 렌더링 시간 중앙값,
+    재시도/대기 시간 증가·감소 수와 모드별 평균 추출 항목 수를 반환합니다.
+    """
+    return render_profiles.stats()
+
+
+@admin_router.get("/traces")
+async def get_recent_traces(limit: int = 20):
+    """
+    최근 트레이스
+
+    샘플링되었거나 느렸거나 실패한 요청의 스팬(Firecrawl/OpenRouter 호출, 대기열 대기 포함)을 반환합니다.
+    `TRACING_EXPORTER=memory`일 때만 트레이스 본문이 포함됩니다.
+    """
+    await tracer.flush()
+    traces = tracer.exporter.traces(limit) if isinstance(tracer.exporter, InMemoryExporter) else []
+    return {**tracer.stats(), "traces": traces}
+
+
+@admin_router.get("/crawl")
+async def get_crawl_stats():
+    """
+    웹훅 기반 크롤링 작업 현황
+
+    진행 중인 작업 수, 수신한 웹훅 이벤트 수, 처리 대기 중인 페이지 수를 반환합니다.
+    """
+    return crawl_manager.stats()
+
+
+@admin_router.get("/items")
+async def get_item_store_stats():
+    """
+    추출 아이템 컬럼 저장소 현황
+
+    파티션/행/파일 수와 집계 엔진(arrow 또는 python)을 반환합니다.
+    """
+    return item_store.stats()
+
+
+@admin_router.get("/results")
+async def get_result_store_stats():
+    """
+    저장된 결과 현황
+
+    보관 중인 결과 수/크기, 조회 수, `304 Not Modified` 응답 수를 반환합니다.
+    """
+    return result_store.stats()
+
+
+@admin_router.get("/loop")
+async def get_loop_stats():
+    """
+    이벤트 루프 지연 현황
+
+    루프 지연 p50/p99/최대값과 최근 블로킹 구간(발생 위치 스택 포함)을 반환합니다.
+    """
+    return loop_monitor.stats()
+
+
+router.include_router(admin_router)
@@ -0,0 +1,53 @@
+"""
+Webhook endpoints
+Receives Firecrawl crawl / batch scrape events
+"""
+import json
+
+from fastapi import APIRouter, HTTPException, Request, status
+
+from app.services.crawl_service import (
+    SIGNATURE_HEADER,
+    TOKEN_HEADER,
+    CrawlJobNotFoundError,
+    WebhookSignatureError,
+    crawl_manager,
+    verify_webhook,
+)
+
+router = APIRouter()
+
+
+@router.post("/firecrawl")
+async def firecrawl_webhook(request: Request):
+    """
+    Firecrawl 웹훅 수신
+
+    `crawl.page` / `batch_scrape.page` 이벤트의 페이지를 즉시 처리 대기열에 넣고,
+    `*.completed` / `*.failed` 이벤트로 작업 상태를 갱신합니다.
+    Firecrawl HMAC 서명(`X-Firecrawl-Signature`) 또는 작업별 토큰으로 인증합니다.
+    """
+    body = await request.body()
+    try:
+        event = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="JSON 본문이 아닙니다")
+    if not isinstance(event, dict):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="이벤트 형식이 아닙니다")
+
+    try:
+        verify_webhook(
+            body,
+            request.headers.get(SIGNATURE_HEADER),
+            request.headers.get(TOKEN_HEADER),
+            crawl_manager.job_id_for(event),
+        )
+    except WebhookSignatureError as e:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=str(e))
+
+    try:
+        job = crawl_manager.handle_event(event)
+    except CrawlJobNotFoundError:
+        # Acknowledge so Firecrawl stops retrying events of evicted jobs
+        return {"received": True, "job_id": None}
+    return {"received": True, "job_id": job.id, "status": job.status}
@@ -0,0 +1,350 @@
+"""
+Admission control
+Cost-aware, prioritized admission with CoDel-style load shedding for expensive endpoints
+"""
+import asyncio
+import json
+import math
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, Tuple
+
+from starlette.requests import Request
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.deadline import Deadline, request_budget
+
+PRIORITY_HEADER = "X-Priority"
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+
+@dataclass
+class RequestClass:
+    """Endpoints sharing a cost estimate (seconds of service time)."""
+    name: str
+    method: str
+    path_prefix: str
+    initial_cost: float
+    default_budget: float
+
+
+# Most specific prefix first
+REQUEST_CLASSES: List[RequestClass] = [
+    RequestClass("quick", "POST", "/api/v1/scraping/quick", 20.0, settings.QUICK_DEADLINE_SECONDS),
+    RequestClass("extract", "POST", "/api/v1/scraping/extract", 10.0, settings.EXTRACT_DEADLINE_SECONDS),
+    RequestClass("insights", "POST", "/api/v1/insights/", 8.0, settings.INSIGHTS_BUDGET_SECONDS),
+]
+
+
+class AdmissionRejectedError(Exception):
+    """Raised when a request is shed; carries the suggested retry delay."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass
+class _Waiter:
+    future: asyncio.Future
+    request_class: str
+    priority: str
+    cost: float
+    enqueued_at: float
+
+
+@dataclass
+class _ClassStats:
+    cost: float  # EWMA of observed service time
+    admitted: int = 0
+    completed: int = 0
+    shed_on_arrival: int = 0
+    shed_in_queue: int = 0
+    recent_waits: Deque[float] = field(default_factory=lambda: deque(maxlen=256))
+
+
+class AdmissionController:
+    """
+    Gatekeeper in front of the expensive endpoints.
+
+    At most `max_concurrent` admitted requests run at once; the rest wait
+    in two FIFO queues, interactive served before batch. Each request class
+    has a service-time estimate (EWMA of observed durations), so on arrival
+    the wait for a slot can be predicted from the work queued ahead. If the
+    predicted wait exceeds the request's time budget (X-Request-Timeout or
+    the class default), it gets an immediate 503 with Retry-After instead
+    of timing out in the queue. Batch requests only get `batch_wait_ratio`
+    of their budget for waiting. A request that finds a free slot is
+    always admitted: a slow class must not lock itself out, since shed
+    requests never update its cost estimate.
+
+    Queue time is also watched CoDel-style: when the time requests spent
+    queued stays above `target_delay` for a whole `interval`, the
+    controller enters a dropping state and sheds at the head of the queue
+    (all batch requests, interactive ones at an increasing rate of
+    interval / sqrt(drops)) until queue time falls below target again.
+    This keeps the queue short, so admitted requests still finish in time
+    and goodput holds up under overload.
+    """
+
+    def __init__(
+        self,
+        classes: List[RequestClass],
+        max_concurrent: int = 16,
+        max_queue: int = 100,
+        target_delay: float = 2.0,
+        interval: float = 10.0,
+        batch_wait_ratio: float = 0.5,
+        cost_alpha: float = 0.2,
+    ):
+        self.classes = classes
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max_queue
+        self.target_delay = target_delay
+        self.interval = interval
+        self.batch_wait_ratio = batch_wait_ratio
+        self.cost_alpha = cost_alpha
+        self._stats: Dict[str, _ClassStats] = {c.name: _ClassStats(cost=c.initial_cost) for c in classes}
+        self._queues: Dict[str, Deque[_Waiter]] = {INTERACTIVE: deque(), BATCH: deque()}
+        self._active: Dict[int, Tuple[str, float]] = {}  # id -> (class, started_at)
+        self._next_id = 0
+        # CoDel state
+        self._first_above: float = 0.0
+        self._dropping = False
+        self._drop_count = 0
+        self._drop_next: float = 0.0
+
+    def classify(self, method: str, path: str) -> Optional[RequestClass]:
+        for request_class in self.classes:
+            if method == request_class.method and path.startswith(request_class.path_prefix):
+                return request_class
+        return None
+
+    def _queued(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def predicted_wait(self, priority: str) -> float:
+        """Seconds until a new request of `priority` would get a slot."""
+        ahead = sum(w.cost for w in self._queues[INTERACTIVE])
+        if priority == BATCH:
+            ahead += sum(w.cost for w in self._queues[BATCH])
+        if len(self._active) < self.max_concurrent and not ahead:
+            return 0.0
+        now = time.monotonic()
+        in_service = sum(
+            max(self._stats[name].cost - (now - started), self._stats[name].cost * 0.1)
+            for name, started in self._active.values()
+        )
+        return (ahead + in_service) / self.max_concurrent
+
+    async def acquire(self, request_class: RequestClass, priority: str, budget: float) -> int:
+        """
+        Wait for a slot.
+
+        Returns:
+            Slot ID to pass to `release`
+
+        Raises:
+            AdmissionRejectedError: if the request is shed
+        """
+        stats = self._stats[request_class.name]
+        if len(self._active) < self.max_concurrent and not self._queued():
+            stats.recent_waits.append(0.0)
+            return self._start(request_class.name)
+
+        wait = self.predicted_wait(priority)
+        allowed = budget * (self.batch_wait_ratio if priority == BATCH else 1.0)
+        reason = None
+        if wait > allowed:
+            reason = f"예상 대기 {wait:.0f}초 - 처리 시간 한도 초과"
+        elif self._queued() >= self.max_queue:
+            reason = "대기열이 가득 찼습니다"
+        elif priority == BATCH and self._dropping:
+            reason = "과부하 - 배치 요청 일시 거부"
+        if reason is not None:
+            stats.shed_on_arrival += 1
+            raise AdmissionRejectedError(reason, retry_after=wait)
+
+        waiter = _Waiter(
+            future=asyncio.get_running_loop().create_future(),
+            request_class=request_class.name,
+            priority=priority,
+            cost=stats.cost,
+            enqueued_at=time.monotonic(),
+        )
+        self._queues[priority].append(waiter)
+        try:
+            return await asyncio.wait_for(asyncio.shield(waiter.future), timeout=allowed)
+        except asyncio.TimeoutError:
+            if waiter.future.done() and not waiter.future.cancelled() and waiter.future.exception() is None:
+                return waiter.future.result()  # Granted in the same tick
+            self._remove(waiter)
+            stats.shed_in_queue += 1
+            raise AdmissionRejectedError("대기 시간 초과", retry_after=self.predicted_wait(priority)) from None
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled() and waiter.future.exception() is None:
+                self.release(waiter.future.result(), 0.0)
+            else:
+                self._remove(waiter)
+            raise
+
+    def _remove(self, waiter: _Waiter) -> None:
+        try:
+            self._queues[waiter.priority].remove(waiter)
+        except ValueError:
+            pass
+        if not waiter.future.done():
+            waiter.future.cancel()
+
+    def _start(self, class_name: str) -> int:
+        self._next_id += 1
+        self._active[self._next_id] = (class_name, time.monotonic())
+        self._stats[class_name].admitted += 1
+        return self._next_id
+
+    def release(self, slot: int, elapsed: Optional[float] = None) -> None:
+        """Free a slot; `elapsed` (seconds) updates the class cost estimate."""
+        class_name, started = self._active.pop(slot)
+        stats = self._stats[class_name]
+        stats.completed += 1
+        if elapsed is None:
+            elapsed = time.monotonic() - started
+        if elapsed > 0:
+            stats.cost += self.cost_alpha * (elapsed - stats.cost)
+        self._dispatch()
+
+    def _should_drop(self, now: float, sojourn: float) -> bool:
+        """CoDel control law, evaluated when a request leaves the queue."""
+        if sojourn < self.target_delay:
+            self._first_above = 0.0
+            self._dropping = False
+            return False
+        if not self._dropping:
+            if not self._first_above:
+                self._first_above = now + self.interval
+                return False
+            if now < self._first_above:
+                return False
+            self._dropping = True
+            # Resume near the previous drop rate if we were dropping recently
+            self._drop_count = max(self._drop_count - 2, 1) if now - self._drop_next < self.interval else 1
+            self._drop_next = now + self.interval / math.sqrt(self._drop_count)
+            return True
+        if now >= self._drop_next:
+            self._drop_count += 1
+            self._drop_next = now + self.interval / math.sqrt(self._drop_count)
+            return True
+        return False
+
+    def _dispatch(self) -> None:
+        while len(self._active) < self.max_concurrent:
+            queue = self._queues[INTERACTIVE] or self._queues[BATCH]
+            if not queue:
+                # Queue drained - leave the dropping state like CoDel does
+                self._dropping = False
+                self._first_above = 0.0
+                return
+            waiter = queue.popleft()
+            if waiter.future.done():
+                continue
+            now = time.monotonic()
+            sojourn = now - waiter.enqueued_at
+            stats = self._stats[waiter.request_class]
+            drop = self._should_drop(now, sojourn)
+            if drop or (self._dropping and waiter.priority == BATCH):
+                stats.shed_in_queue += 1
+                waiter.future.set_exception(
+                    AdmissionRejectedError("과부하 - 요청 거부", retry_after=self.predicted_wait(waiter.priority))
+                )
+                continue
+            stats.recent_waits.append(sojourn)
+            waiter.future.set_result(self._start(waiter.request_class))
+
+    def stats(self) -> Dict[str, object]:
+        classes = {}
+        for name, stats in self._stats.items():
+            waits = sorted(stats.recent_waits)
+            classes[name] = {
+                "estimated_cost_seconds": round(stats.cost, 2),
+                "admitted": stats.admitted,
+                "completed": stats.completed,
+                "shed_on_arrival": stats.shed_on_arrival,
+                "shed_in_queue": stats.shed_in_queue,
+                "p95_queue_ms": round(waits[int(len(waits) * 0.95) - 1] * 1000, 1) if waits else 0.0,
+            }
+        return {
+            "max_concurrent": self.max_concurrent,
+            "active": len(self._active),
+            "queued": {priority: len(queue) for priority, queue in self._queues.items()},
+            "dropping": self._dropping,
+            "predicted_wait_seconds": round(self.predicted_wait(INTERACTIVE), 2),
+            "classes": classes,
+        }
+
+
+admission_controller = AdmissionController(
+    REQUEST_CLASSES,
+    max_concurrent=settings.ADMISSION_MAX_CONCURRENT,
+    max_queue=settings.ADMISSION_MAX_QUEUE,
+    target_delay=settings.ADMISSION_TARGET_DELAY_SECONDS,
+    interval=settings.ADMISSION_INTERVAL_SECONDS,
+    batch_wait_ratio=settings.ADMISSION_BATCH_WAIT_RATIO,
+)
+
+
+class AdmissionMiddleware:
+    """
+    Apply the admission controller to the expensive endpoints.
+
+    Shed requests get `503` with `Retry-After` before the body is read.
+    Priority comes from the `X-Priority` header (`interactive` or `batch`).
+    The request's deadline is recorded on arrival (`request.state.deadline`,
+    read by `request_deadline`), so queueing time counts against the budget.
+    """
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController = admission_controller):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_class = self.controller.classify(scope["method"], scope["path"])
+        if request_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope)
+        priority = BATCH if request.headers.get(PRIORITY_HEADER, "").lower() == BATCH else INTERACTIVE
+        budget = request_budget(request, request_class.default_budget, settings.MAX_DEADLINE_SECONDS)
+        # The deadline runs from arrival: time spent queued here counts against it
+        scope.setdefault("state", {})["deadline"] = Deadline(budget)
+        try:
+            slot = await self.controller.acquire(request_class, priority, budget)
+        except AdmissionRejectedError as e:
+            await self._reject(send, str(e), e.retry_after)
+            return
+
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(slot, time.monotonic() - started)
+
+    @staticmethod
+    async def _reject(send: Send, detail: str, retry_after: float) -> None:
+        body = json.dumps({"detail": detail}, ensure_ascii=False).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -1,7 +1,7 @@
 """
 Application configuration using Pydantic Settings.
 """
-from typing import List
+from typing import Dict, List, Literal
 from pydantic_settings import BaseSettings
 
 
@@ -33,6 +33,118 @@ class Settings(BaseSettings):
     OPENROUTER_API_KEY: str = ""
     OPENROUTER_BASE_URL: str = "https://openrouter.ai/api/v1"
     LLM_MODEL: str = "meta-llama/llama-3.3-8b-instruct:free"
+    # Models that need explicit cache_control breakpoints for prompt caching (prefixes);
+    # OpenAI, DeepSeek and Gemini 2.5 models cache the stable prompt prefix automatically
+    LLM_CACHE_CONTROL_MODELS: str = "anthropic/,google/gemini"
+    
+    # Token budgeting & cost accounting
+    LLM_CONTEXT_TOKENS: int = 32000
+    LLM_MAX_PROMPT_TOKENS: int = 8000  # Latency cap for variable content
+    LLM_PROMPT_PRICE_PER_MTOK: float = 0.0  # USD, fallback when OpenRouter omits cost
+    LLM_COMPLETION_PRICE_PER_MTOK: float = 0.0
+    TOKEN_BUDGET_PER_TENANT_DAILY: int = 0  # 0 = unlimited
+    TOKEN_BUDGET_PER_REQUEST: int = 0  # 0 = unlimited
+    
+    # Cluster-wide upstream rate limits (shared through Redis)
+    FIRECRAWL_RATE_LIMIT_PER_MINUTE: int = 20
+    OPENROUTER_RATE_LIMIT_PER_MINUTE: int = 20
+    RATE_LIMIT_USE_REDIS: bool = True
+    RATE_LIMIT_EXPECTED_REPLICAS: int = 1  # Local fallback gets 1/N of the budget
+    RATE_LIMIT_MAX_WAIT_SECONDS: float = 30.0
+    
+    # Request deadlines
+    QUICK_DEADLINE_SECONDS: float = 90.0  # Default for /scraping/quick
+    EXTRACT_DEADLINE_SECONDS: float = 60.0  # Default for /scraping/extract
+    INSIGHTS_BUDGET_SECONDS: float = 120.0  # Admission budget for /insights (the LLM call timeout)
+    MAX_DEADLINE_SECONDS: float = 300.0  # Upper bound for X-Request-Timeout
+    LLM_TOKENS_PER_SECOND: float = 40.0  # Used to shrink max_tokens near the deadline
+    LLM_FIRST_TOKEN_SECONDS: float = 2.0
+    
+    # Admission control / load shedding (quick, extract, insights)
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_MAX_CONCURRENT: int = 16
+    ADMISSION_MAX_QUEUE: int = 100
+    ADMISSION_TARGET_DELAY_SECONDS: float = 2.0  # CoDel target queue time
+    ADMISSION_INTERVAL_SECONDS: float = 10.0  # CoDel interval
+    ADMISSION_BATCH_WAIT_RATIO: float = 0.5  # Share of the budget batch requests may wait
+    
+    # Stored results (GET /results/{result_id})
+    RESULT_STORE_TTL_SECONDS: int = 86400
+    RESULT_STORE_MAX_ENTRIES: int = 10000
+    RESULT_STORE_MAX_BYTES: int = 200_000_000
+    
+    # Item store (columnar analytics over extracted items)
+    ITEM_STORE_ENABLED: bool = True
+    ITEM_STORE_DIR: str = ""  # Parquet partitions (needs pyarrow); in memory only when empty
+    ITEM_STORE_MAX_ROWS: int = 1_000_000  # Rows kept in memory
+    ITEM_STORE_FLUSH_ROWS: int = 50_000  # In-memory rows per partition before writing a Parquet file
+    
+    # Crawl / batch scrape webhooks
+    PUBLIC_BASE_URL: str = "http://localhost:8000"  # Where Firecrawl can reach this API
+    FIRECRAWL_WEBHOOK_SECRET: str = ""  # Defaults to SECRET_KEY unless that is the default
+    CRAWL_PAGE_CONCURRENCY: int = 2  # Pages processed at once per job
+    CRAWL_MAX_JOBS: int = 100  # Running jobs at once; finished ones are kept up to this many too
+    
+    # Tracing
+    TRACING_EXPORTER: str = "memory"  # memory | file | otlp | none
+    TRACING_SAMPLE_RATIO: float = 0.1  # Head sampling; slow or failed traces are always kept
+    TRACING_SLOW_MS: float = 5000.0
+    TRACING_FILE_PATH: str = "traces.jsonl"
+    TRACING_OTLP_ENDPOINT: str = "http://localhost:4318"
+    
+    # Multi-tenant scheduling of upstream capacity
+    SCHEDULER_FIRECRAWL_CONCURRENCY: int = 4
+    SCHEDULER_LLM_CONCURRENCY: int = 4
+    SCHEDULER_MAX_QUEUED_PER_TENANT: int = 50
+    SCHEDULER_MAX_IN_FLIGHT_PER_TENANT: int = 2
+    TENANT_WEIGHTS: Dict[str, float] = {}
+    
+    # Per-domain boilerplate stripping before LLM extraction
+    BOILERPLATE_MIN_PAGES: int = 3
+    BOILERPLATE_MIN_RATIO: float = 0.5
+    # Memory bound: about 120 bytes per tracked block or URL, so the defaults
+    # stay under ~100 MB (200 domains x (2000 blocks + 2000 URLs))
+    BOILERPLATE_MAX_DOMAINS: int = 200
+    BOILERPLATE_MAX_BLOCKS_PER_DOMAIN: int = 2000
+    BOILERPLATE_MAX_URLS_PER_DOMAIN: int = 2000
+    
+    # Near-duplicate detection (SimHash)
+    DEDUP_MAX_DISTANCE: int = 3  # Hamming bits; -1 disables reuse
+    DEDUP_INDEX_PATH: str = ""  # Persist index here on shutdown when set
+    
+    # Adaptive per-domain render options (waitFor, onlyMainContent, excludeTags)
+    RENDER_PROFILES_ENABLED: bool = True  # Off: unspecified options mean no wait, main content only
+    RENDER_REEXPLORE_SECONDS: float = 1800.0  # Pause after a failed probe / between content mode rounds
+    RENDER_PROBE_EVERY: int = 5  # Every Nth scrape of a domain may try a shorter wait or other mode
+    RENDER_PROBE_SAMPLES: int = 3  # Complete renders at a shorter wait before adopting it
+    RENDER_MIN_CONTENT_CHARS: int = 200  # Shorter markdown counts as an empty render
+    RENDER_CHROME_TAGS: str = "nav,footer,aside,form,iframe,noscript"  # Excluded in "trimmed" mode
+
+    # Scrape cache & predictive prefetch
+    SCRAPE_CACHE_TTL_SECONDS: float = 600.0  # 0 disables the cache (and prefetch)
+    SCRAPE_CACHE_MAX_ENTRIES: int = 500
+    SCRAPE_SPILL_THRESHOLD_BYTES: int = 1_000_000  # Larger html/rawHtml/screenshot/links go to temp files
+    SCRAPE_SPILL_DIR: str = ""  # Default: system temp dir
+    PREFETCH_ENABLED: bool = True
+    PREFETCH_MAX_PER_VISIT: int = 3
+    PREFETCH_RATE_RESERVE_RATIO: float = 0.5  # Rate-limit share always left to interactive calls
+    PREFETCH_MIN_SAMPLES: int = 20  # Resolved prefetches before judging a domain
+    PREFETCH_MIN_HIT_RATE: float = 0.2  # Below this the domain is switched off
+    PREFETCH_COOLDOWN_SECONDS: float = 3600.0  # Before re-exploring a switched-off domain
+    
+    # CPU offload & event loop monitoring
+    CPU_EXECUTOR: Literal["thread", "process", "none"] = "thread"
+    CPU_EXECUTOR_WORKERS: int = 4
+    CPU_OFFLOAD_THRESHOLD_BYTES: int = 256_000
+    LOOP_MONITOR_ENABLED: bool = True
+    LOOP_LAG_THRESHOLD_MS: float = 100.0
+    
+    # Background dependency health probing
+    HEALTH_PROBE_INTERVAL_SECONDS: float = 15.0
+    HEALTH_PROBE_TIMEOUT_SECONDS: float = 3.0
+    
+    # Operator access to cross-tenant statistics (X-Admin-Key header); empty disables it
+    SYSTEM_ADMIN_KEY: str = ""
     
     # JWT Auth
     SECRET_KEY: str = "your-secret-key-change-in-production"
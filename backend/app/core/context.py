@@ -0,0 +1,68 @@
+"""
+Request-scoped context
+Tenant, endpoint and request ID available to services without threading arguments
+"""
+import uuid
+from contextvars import ContextVar
+from typing import Optional
+
+from starlette.requests import Request
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.deps import resolve_tenant_id
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+tenant_id_var: ContextVar[Optional[str]] = ContextVar("tenant_id", default=None)
+endpoint_var: ContextVar[Optional[str]] = ContextVar("endpoint", default=None)
+
+
+def current_request_id() -> Optional[str]:
+    return request_id_var.get()
+
+
+def current_tenant_id() -> Optional[str]:
+    return tenant_id_var.get()
+
+
+def current_endpoint() -> Optional[str]:
+    return endpoint_var.get()
+
+
+class RequestContextMiddleware:
+    """
+    Populate the request context vars for every HTTP request.
+
+    Background tasks spawned while handling the request inherit a copy of
+    the context, so accounting in services is attributed correctly.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope)
+        request_id = request.headers.get(REQUEST_ID_HEADER) or uuid.uuid4().hex
+        tokens = (
+            request_id_var.set(request_id[:64]),
+            tenant_id_var.set(resolve_tenant_id(request)),
+            endpoint_var.set(f"{request.method} {request.url.path}"),
+        )
+
+        async def send_with_request_id(message) -> None:
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((REQUEST_ID_HEADER.lower().encode(), request_id_var.get().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            for var, token in zip((request_id_var, tenant_id_var, endpoint_var), tokens):
+                var.reset(token)
@@ -0,0 +1,145 @@
+"""
+Request deadlines and cancellation
+End-to-end time budgets propagated to services via a context var
+"""
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Iterator, Optional, TypeVar, Union
+
+from starlette.requests import Request
+
+T = TypeVar("T")
+
+DEADLINE_HEADER = "X-Request-Timeout"
+
+# Below this many seconds an upstream call cannot usefully complete
+MIN_USEFUL_SECONDS = 0.5
+
+
+class DeadlineExceededError(Exception):
+    """Raised when the request's time budget is used up."""
+
+
+class ClientDisconnectedError(Exception):
+    """Raised when the client went away while work was still running."""
+
+
+class Deadline:
+    """Absolute point in (monotonic) time by which the request must finish."""
+
+    def __init__(self, seconds: float):
+        self.budget = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() < MIN_USEFUL_SECONDS
+
+
+_deadline_var: ContextVar[Optional[Deadline]] = ContextVar("deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _deadline_var.get()
+
+
+@contextmanager
+def deadline_scope(deadline: Union[Deadline, float]) -> Iterator[Deadline]:
+    """
+    Set the deadline for everything awaited (or spawned) inside the block:
+    an existing `Deadline` (see `request_deadline`) or a budget in seconds
+    starting now.
+    """
+    if not isinstance(deadline, Deadline):
+        deadline = Deadline(deadline)
+    token = _deadline_var.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline_var.reset(token)
+
+
+def request_budget(request: Request, default: float, maximum: Optional[float] = None) -> float:
+    """
+    Time budget for a request: the client's X-Request-Timeout header
+    (seconds) when present, else `default`, never above `maximum`.
+    """
+    budget = default
+    header = request.headers.get(DEADLINE_HEADER)
+    if header:
+        try:
+            budget = float(header)
+        except ValueError:
+            pass
+    if maximum is not None:
+        budget = min(budget, maximum)
+    return max(budget, MIN_USEFUL_SECONDS)
+
+
+def request_deadline(request: Request, default: float, maximum: Optional[float] = None) -> Deadline:
+    """
+    Deadline of a request, counted from its arrival: the one the admission
+    middleware recorded before queueing the request, else a new one with
+    `request_budget`.
+    """
+    deadline = getattr(request.state, "deadline", None)
+    if isinstance(deadline, Deadline):
+        return deadline
+    return Deadline(request_budget(request, default, maximum))
+
+
+def remaining_timeout(default: float) -> float:
+    """
+    Timeout for the next upstream call: `default` capped by the remaining
+    request budget.
+
+    Raises:
+        DeadlineExceededError: if too little time is left to try at all
+    """
+    deadline = _deadline_var.get()
+    if deadline is None:
+        return default
+    if deadline.expired:
+        raise DeadlineExceededError("요청 처리 시간 초과")
+    return min(default, deadline.remaining())
+
+
+async def within_deadline(awaitable: Awaitable[T]) -> T:
+    """Await `awaitable`, cancelling it when the current deadline passes."""
+    deadline = _deadline_var.get()
+    if deadline is None:
+        return await awaitable
+    if deadline.expired:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise DeadlineExceededError("요청 처리 시간 초과")
+    try:
+        return await asyncio.wait_for(awaitable, timeout=deadline.remaining())
+    except asyncio.TimeoutError:
+        raise DeadlineExceededError("요청 처리 시간 초과") from None
+
+
+async def cancel_on_disconnect(request: Request, awaitable: Awaitable[T], poll_interval: float = 0.5) -> T:
+    """
+    Run `awaitable` but cancel it as soon as the HTTP client disconnects.
+
+    Raises:
+        ClientDisconnectedError: if the client went away first
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                raise ClientDisconnectedError("클라이언트 연결 종료")
+    finally:
+        if not task.done():
+            task.cancel()
@@ -0,0 +1,45 @@
+"""
+Shared FastAPI dependencies
+"""
+import hmac
+
+from fastapi import HTTPException, Request, status
+
+from app.core.config import settings
+
+TENANT_HEADER = "X-Tenant-ID"
+ADMIN_KEY_HEADER = "X-Admin-Key"
+
+
+def resolve_tenant_id(request: Request) -> str:
+    """
+    Resolve the tenant a request is billed and scheduled against.
+
+    Until JWT auth (app/api/v1/auth.py) is implemented, the tenant comes from
+    the X-Tenant-ID header and falls back to the client address.
+    """
+    tenant_id = request.headers.get(TENANT_HEADER, "").strip()
+    if tenant_id:
+        return tenant_id[:64]
+    if request.client:
+        return f"ip:{request.client.host}"
+    return "anonymous"
+
+
+async def get_tenant_id(request: Request) -> str:
+    """FastAPI dependency wrapper around resolve_tenant_id."""
+    return resolve_tenant_id(request)
+
+
+async def is_admin(request: Request) -> bool:
+    """Whether the request carries the operator key (SYSTEM_ADMIN_KEY) for cross-tenant views."""
+    key = request.headers.get(ADMIN_KEY_HEADER, "")
+    return bool(settings.SYSTEM_ADMIN_KEY and key) and hmac.compare_digest(
+        key.encode("utf-8"), settings.SYSTEM_ADMIN_KEY.encode("utf-8")
+    )
+
+
+async def require_admin(request: Request) -> None:
+    """Reject requests without the operator key (403); cross-tenant data stays internal."""
+    if not await is_admin(request):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="관리자 키가 필요합니다")
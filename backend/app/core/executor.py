@@ -0,0 +1,107 @@
+"""
+CPU executor
+Routes CPU-heavy work (large JSON encode/decode, text ranking) off the event loop
+"""
+import asyncio
+import functools
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+from app.core.config import settings
+
+T = TypeVar("T")
+
+_executor: Optional[Executor] = None
+_in_worker_process = False
+
+
+def _init_worker_process() -> None:
+    global _in_worker_process
+    _in_worker_process = True
+
+
+def in_worker_process() -> bool:
+    """Whether this code runs in a worker of the process executor."""
+    return _in_worker_process
+
+
+def get_executor() -> Optional[Executor]:
+    """
+    Shared executor configured by CPU_EXECUTOR ("thread", "process" or "none").
+    """
+    global _executor
+    if _executor is None and settings.CPU_EXECUTOR != "none":
+        if settings.CPU_EXECUTOR == "process":
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.CPU_EXECUTOR_WORKERS, initializer=_init_worker_process
+            )
+        else:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.CPU_EXECUTOR_WORKERS, thread_name_prefix="cpu"
+            )
+    return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def run_cpu(
+    func: Callable[..., T],
+    *args: Any,
+    size: int = 0,
+    shared_state: bool = False,
+    **kwargs: Any,
+) -> T:
+    """
+    Run `func` inline for small payloads, in the executor for large ones.
+
+    Args:
+        func: CPU-bound callable (must be picklable for the process executor)
+        size: Payload size in bytes/chars; offloaded above CPU_OFFLOAD_THRESHOLD_BYTES
+        shared_state: `func` touches in-process state, so never use a process pool
+
+    Returns:
+        Result of `func`
+    """
+    executor = get_executor()
+    if executor is None or size < settings.CPU_OFFLOAD_THRESHOLD_BYTES:
+        return func(*args, **kwargs)
+    if shared_state and isinstance(executor, ProcessPoolExecutor):
+        return await asyncio.to_thread(func, *args, **kwargs)
+    call = functools.partial(func, *args, **kwargs) if kwargs else func
+    return await asyncio.get_running_loop().run_in_executor(
+        executor, call, *(() if kwargs else args)
+    )
+
+
+def approx_size(obj: Any, limit: int = 10_000) -> int:
+    """
+    Cheap upper-bound guess of an object's JSON size without encoding it.
+
+    Walks at most `limit` nodes; anything larger is reported as huge.
+    """
+    size = 0
+    stack = [obj]
+    visited = 0
+    while stack:
+        node = stack.pop()
+        visited += 1
+        if visited > limit:
+            return 1 << 30
+        if isinstance(node, str):
+            size += len(node) + 2
+        elif isinstance(node, dict):
+            size += 2
+            for key, value in node.items():
+                size += len(str(key)) + 4
+                stack.append(value)
+        elif isinstance(node, (list, tuple)):
+            size += 2
+            stack.extend(node)
+        else:
+            size += 8
+    return size
@@ -0,0 +1,121 @@
+"""
+Event loop lag monitor
+Detects blocking spans on the asyncio loop and records where they happened
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class EventLoopMonitor:
+    """
+    Measures event-loop lag and captures the stack of blocking code.
+
+    A coroutine heartbeat sleeps for `interval` and records how late it
+    wakes up. A watchdog thread checks the heartbeat; when it is overdue
+    by more than `threshold`, the loop thread is still inside the blocking
+    code, so its current stack is captured via sys._current_frames().
+    """
+
+    def __init__(self, interval: float = 0.05, threshold: float = 0.1, max_spans: int = 50):
+        self.interval = interval
+        self.threshold = threshold
+        self._spans: Deque[Dict[str, Any]] = deque(maxlen=max_spans)
+        self._lags: Deque[float] = deque(maxlen=1200)
+        self._max_lag = 0.0
+        self._beat = 0.0
+        self._pending: Optional[Dict[str, Any]] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._heartbeat(), name="loop-monitor")
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _heartbeat(self) -> None:
+        while True:
+            before = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(now - before - self.interval, 0.0)
+            self._lags.append(lag)
+            self._max_lag = max(self._max_lag, lag)
+            self._beat = now
+
+            span = self._pending
+            if span is not None:
+                # The loop is running again - close the captured span
+                self._pending = None
+                span["duration_ms"] = round(lag * 1000, 1)
+                self._spans.append(span)
+                logger.warning(
+                    "Event loop blocked for %.0f ms at %s",
+                    lag * 1000, span["location"],
+                )
+
+    def _watch(self) -> None:
+        while not self._stopped.wait(self.interval / 2):
+            overdue = time.monotonic() - self._beat - self.interval
+            if overdue < self.threshold or self._pending is not None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = traceback.extract_stack(frame)
+            self._pending = {
+                "started_at": time.time() - overdue,
+                "location": self._app_location(stack),
+                "stack": [f"{f.filename}:{f.lineno} {f.name}" for f in stack[-8:]],
+            }
+
+    @staticmethod
+    def _app_location(stack: List[traceback.FrameSummary]) -> str:
+        """Innermost frame inside our own code, else the innermost frame."""
+        for frame in reversed(stack):
+            if "/app/" in frame.filename.replace("\\", "/"):
+                return f"{frame.filename}:{frame.lineno} {frame.name}"
+        frame = stack[-1]
+        return f"{frame.filename}:{frame.lineno} {frame.name}"
+
+    def stats(self) -> Dict[str, Any]:
+        lags = sorted(self._lags)
+
+        def pct(p: float) -> float:
+            return round(lags[min(int(len(lags) * p), len(lags) - 1)] * 1000, 2) if lags else 0.0
+
+        return {
+            "lag_p50_ms": pct(0.5),
+            "lag_p99_ms": pct(0.99),
+            "lag_max_ms": round(self._max_lag * 1000, 2),
+            "blocking_spans": list(self._spans),
+        }
+
+
+loop_monitor = EventLoopMonitor(threshold=settings.LOOP_LAG_THRESHOLD_MS / 1000)
@@ -0,0 +1,53 @@
+"""
+JSON serialization
+orjson on hot paths (API responses, Firecrawl / LLM bodies) with a stdlib fallback
+"""
+import json
+from typing import Any, Union
+
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # Optional: several times faster encode / decode
+    orjson = None
+
+
+def dumps(obj: Any, sort_keys: bool = False) -> bytes:
+    """Compact UTF-8 JSON; non-ASCII kept as is, unknown types via str()."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        try:
+            return orjson.dumps(obj, default=str, option=option)
+        except TypeError:
+            pass  # e.g. integers beyond 64 bits - the stdlib encoder handles them
+    return json.dumps(
+        obj, ensure_ascii=False, separators=(",", ":"), default=str, sort_keys=sort_keys
+    ).encode("utf-8")
+
+
+def dumps_str(obj: Any, sort_keys: bool = False) -> str:
+    """`dumps()` as text, for prompts and SSE frames."""
+    return dumps(obj, sort_keys).decode("utf-8")
+
+
+def loads(data: Union[str, bytes, bytearray]) -> Any:
+    """
+    Decode JSON.
+
+    Raises:
+        json.JSONDecodeError: for invalid input (orjson's error subclasses it)
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass  # The stdlib decoder also accepts NaN / Infinity literals
+    return json.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with `dumps()` - the app's default response class."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
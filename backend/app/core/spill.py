@@ -0,0 +1,300 @@
+"""
+Spill-to-disk JSON decoding
+Streams large upstream JSON bodies, moving oversized fields to temp files
+"""
+import json
+import os
+import re
+import tempfile
+import weakref
+from typing import Any, AsyncIterator, Iterable, Iterator, List, Optional
+
+from app.core.executor import run_cpu
+from app.core.serialization import loads
+
+# Firecrawl fields that can be megabytes on heavy pages
+DEFAULT_SPILL_KEYS = ("rawHtml", "html", "screenshot", "links")
+
+# Object key of the placeholder left in the parsed body; \u0000 keeps it
+# from ever colliding with a real field name
+_PLACEHOLDER_KEY = "\x00spill"
+_PLACEHOLDER = b'{"\\u0000spill":%d}'
+
+# Body of a JSON string up to (not including) its closing quote
+_STRING_BODY = re.compile(rb'[^"\\]*(?:\\.[^"\\]*)*', re.S)
+_STRUCTURAL = re.compile(rb'["\[\]{}:,]')
+_MAX_KEY_BYTES = 64
+
+
+def _unlink(path: str) -> None:
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+class SpilledValue:
+    """
+    Lazy handle to a large JSON value stored in a temp file.
+
+    The file holds the value's JSON encoding as received; it is decoded
+    only when `load()` is called. The file is deleted on `close()` or when
+    the handle is garbage collected.
+    """
+
+    def __init__(self, path: str, size: int, is_string: bool):
+        self.path = path
+        self.size = size
+        self.is_string = is_string
+        self._finalizer = weakref.finalize(self, _unlink, path)
+
+    def load(self) -> Any:
+        """Decode the full value (a str for string fields)."""
+        with open(self.path, "rb") as f:
+            return loads(f.read())
+
+    async def aload(self) -> Any:
+        """`load()` off the event loop for large values."""
+        return await run_cpu(self.load, size=self.size)
+
+    def preview(self, chars: int = 500) -> str:
+        """First `chars` characters of a string value without loading all of it."""
+        if not self.is_string:
+            return ""
+        with open(self.path, "rb") as f:
+            raw = f.read(chars * 6 + 1)[1:]  # Skip the opening quote
+        # Trim a cut escape sequence, multi-byte character or the closing quote
+        for trim in range(10):
+            try:
+                return json.loads(b'"' + raw[:len(raw) - trim] + b'"')[:chars]
+            except ValueError:
+                continue
+        return ""
+
+    def iter_raw(self, chunk_size: int = 65536) -> Iterator[bytes]:
+        """Stream the stored JSON encoding."""
+        with open(self.path, "rb") as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+
+    def close(self) -> None:
+        self._finalizer()
+
+    def __repr__(self) -> str:
+        return f"SpilledValue(size={self.size}, path={self.path!r})"
+
+
+def materialize(value: Any) -> Any:
+    """The real value behind a possibly spilled field."""
+    return value.load() if isinstance(value, SpilledValue) else value
+
+
+class _Capture:
+    """Bytes of one candidate value; moves to a temp file past the threshold."""
+
+    def __init__(self, threshold: int, spill_dir: Optional[str]):
+        self.threshold = threshold
+        self.spill_dir = spill_dir
+        self.buffer = bytearray()
+        self.file = None
+        self.size = 0
+
+    def write(self, data: bytes) -> None:
+        if not data:
+            return
+        self.size += len(data)
+        if self.file is not None:
+            self.file.write(data)
+            return
+        self.buffer += data
+        if len(self.buffer) > self.threshold:
+            self.file = tempfile.NamedTemporaryFile(
+                prefix="spill-", suffix=".json", dir=self.spill_dir or None, delete=False
+            )
+            self.file.write(self.buffer)
+            self.buffer = bytearray()
+
+    def discard(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            _unlink(self.file.name)
+
+
+class SpillingJSONDecoder:
+    """
+    Incremental JSON scanner that keeps large fields out of memory.
+
+    Bytes are fed as they arrive. String or array values of `spill_keys`
+    larger than `threshold` bytes are written to temp files and replaced by
+    placeholders; everything else (small by construction) is collected and
+    parsed with `json.loads` at the end, so peak memory per body is roughly
+    `threshold` plus the non-spilled remainder.
+    """
+
+    def __init__(
+        self,
+        spill_keys: Iterable[str] = DEFAULT_SPILL_KEYS,
+        threshold: int = 1_000_000,
+        spill_dir: Optional[str] = None,
+    ):
+        self.spill_keys = {key.encode("utf-8") for key in spill_keys}
+        self.threshold = threshold
+        self.spill_dir = spill_dir
+        self.spills: List[SpilledValue] = []
+        self._out = bytearray()
+        self._in_string = False
+        self._escaped = False
+        self._token = bytearray()
+        self._token_overflow = False
+        self._last_string: Optional[bytes] = None
+        self._await_value = False
+        self._capture: Optional[_Capture] = None
+        self._capture_is_string = False
+        self._depth = 0
+
+    def feed(self, chunk: bytes) -> None:
+        n = len(chunk)
+        i = 0
+        start = 0  # First byte of `chunk` not yet written to the current sink
+        while i < n:
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                    self._add_token(chunk[i:i + 1])
+                    i += 1
+                    continue
+                j = _STRING_BODY.match(chunk, i).end()
+                self._add_token(chunk[i:j])
+                if j == n:
+                    break
+                if chunk[j] == 0x5C:  # Trailing backslash: escape continues in next chunk
+                    self._escaped = True
+                    i = n
+                    break
+                # Closing quote
+                self._in_string = False
+                i = j + 1
+                if self._capture is not None:
+                    if self._capture_is_string:
+                        self._capture.write(chunk[start:i])
+                        start = i
+                        self._finish_capture()
+                elif not self._token_overflow:
+                    self._last_string = bytes(self._token)
+                continue
+
+            m = _STRUCTURAL.search(chunk, i)
+            j = m.start() if m else n
+            if self._await_value and chunk[i:j].strip():
+                self._await_value = False  # Number, bool or null - never spilled
+            if m is None:
+                break
+            c = chunk[j]
+            i = j + 1
+
+            if self._await_value:
+                self._await_value = False
+                if c in (0x22, 0x5B):  # '"' or '['
+                    self._out += chunk[start:j]
+                    start = j
+                    self._capture = _Capture(self.threshold, self.spill_dir)
+                    self._capture_is_string = c == 0x22
+                    self._depth = 0 if self._capture_is_string else 1
+                    if self._capture_is_string:
+                        self._start_string()
+                    continue
+
+            if c == 0x22:
+                self._start_string()
+            elif c == 0x3A:  # ':'
+                if self._capture is None and self._last_string in self.spill_keys:
+                    self._await_value = True
+                self._last_string = None
+            elif self._capture is not None and not self._capture_is_string:
+                if c in (0x5B, 0x7B):
+                    self._depth += 1
+                elif c in (0x5D, 0x7D):
+                    self._depth -= 1
+                    if self._depth == 0:
+                        self._capture.write(chunk[start:i])
+                        start = i
+                        self._finish_capture()
+            else:
+                self._last_string = None
+
+        if self._capture is not None:
+            self._capture.write(chunk[start:])
+        else:
+            self._out += chunk[start:]
+
+    def _start_string(self) -> None:
+        self._in_string = True
+        self._token.clear()
+        self._token_overflow = self._capture is not None
+
+    def _add_token(self, data: bytes) -> None:
+        if self._token_overflow:
+            return
+        if len(self._token) + len(data) > _MAX_KEY_BYTES:
+            self._token_overflow = True
+            self._token.clear()
+            return
+        self._token += data
+
+    def _finish_capture(self) -> None:
+        capture, self._capture = self._capture, None
+        if capture.file is None:
+            self._out += capture.buffer
+            return
+        capture.file.close()
+        self.spills.append(SpilledValue(capture.file.name, capture.size, self._capture_is_string))
+        self._out += _PLACEHOLDER % (len(self.spills) - 1)
+
+    def discard(self) -> None:
+        """Drop partial state and temp files (on errors)."""
+        if self._capture is not None:
+            self._capture.discard()
+            self._capture = None
+        for spilled in self.spills:
+            spilled.close()
+        self.spills = []
+
+    async def result(self) -> Any:
+        """Parse the remainder and put the spilled handles back in place."""
+        if self._capture is not None or self._in_string:
+            self.discard()
+            raise ValueError("JSON 본문이 중간에 끊겼습니다")
+        data = await run_cpu(loads, bytes(self._out), size=len(self._out))
+        self._out = bytearray()
+        return self._restore(data) if self.spills else data
+
+    def _restore(self, node: Any) -> Any:
+        if isinstance(node, dict):
+            if len(node) == 1 and _PLACEHOLDER_KEY in node:
+                return self.spills[node[_PLACEHOLDER_KEY]]
+            for key, value in node.items():
+                node[key] = self._restore(value)
+        elif isinstance(node, list):
+            for index, value in enumerate(node):
+                node[index] = self._restore(value)
+        return node
+
+
+async def decode_stream(
+    chunks: AsyncIterator[bytes],
+    spill_keys: Iterable[str] = DEFAULT_SPILL_KEYS,
+    threshold: int = 1_000_000,
+    spill_dir: Optional[str] = None,
+) -> Any:
+    """Decode a streamed JSON body, spilling large fields (see SpillingJSONDecoder)."""
+    decoder = SpillingJSONDecoder(spill_keys, threshold, spill_dir)
+    try:
+        async for chunk in chunks:
+            decoder.feed(chunk)
+    except BaseException:
+        decoder.discard()
+        raise
+    return await decoder.result()
@@ -0,0 +1,460 @@
+"""
+Tracing
+Request-scoped traces with timed spans around upstream calls, exported in batches
+"""
+import asyncio
+import functools
+import json
+import logging
+import random
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+import httpx
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.context import current_request_id, current_tenant_id
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+TRACEPARENT_HEADER = "traceparent"
+TRACE_ID_HEADER = "X-Trace-ID"
+
+INTERNAL = "internal"
+SERVER = "server"
+CLIENT = "client"
+_OTLP_KINDS = {INTERNAL: 1, SERVER: 2, CLIENT: 3}
+
+MAX_SPANS_PER_TRACE = 256
+
+
+class _Trace:
+    """Spans of one trace, kept until the root span decides on export."""
+    __slots__ = ("trace_id", "sampled", "spans", "done", "kept")
+
+    def __init__(self, trace_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.sampled = sampled
+        self.spans: List["Span"] = []
+        self.done = False
+        self.kept = False
+
+
+class Span:
+    """A timed operation with attributes."""
+    __slots__ = ("trace", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, trace: _Trace, parent_id: Optional[str], name: str, kind: str, attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    @property
+    def trace_id(self) -> str:
+        return self.trace.trace_id
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def record_error(self, exc: BaseException) -> None:
+        self.error = f"{type(exc).__name__}: {exc}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_ns": self.start_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """Returned when tracing is off; accepts and drops everything."""
+    trace_id = None
+    span_id = None
+
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, **attributes: Any) -> None:
+        pass
+
+    def record_error(self, exc: BaseException) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Any:
+    """Innermost active span (or a no-op span outside any trace)."""
+    return _current_span.get() or NOOP_SPAN
+
+
+def traceparent() -> Optional[str]:
+    """W3C traceparent for the current span, to propagate to upstreams."""
+    span = _current_span.get()
+    if span is None:
+        return None
+    return f"00-{span.trace_id}-{span.span_id}-{'01' if span.trace.sampled else '00'}"
+
+
+def _parse_traceparent(value: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    if not value:
+        return None
+    parts = value.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        sampled = bool(int(parts[3], 16) & 1)
+    except ValueError:
+        return None
+    return parts[1], parts[2], sampled
+
+
+# ---------------------------------------------------------------------------
+# Exporters
+# ---------------------------------------------------------------------------
+
+
+class SpanExporter:
+    """Destination for finished spans. Called in batches off the request path."""
+
+    async def export(self, spans: List[Span]) -> None:
+        raise NotImplementedError
+
+    async def shutdown(self) -> None:
+        pass
+
+
+class InMemoryExporter(SpanExporter):
+    """Keeps the most recent spans in memory (tests, /system/traces)."""
+
+    def __init__(self, max_spans: int = 5000):
+        self.spans: Deque[Dict[str, Any]] = deque(maxlen=max_spans)
+
+    async def export(self, spans: List[Span]) -> None:
+        self.spans.extend(span.to_dict() for span in spans)
+
+    def traces(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Most recent traces, each with its spans ordered by start time."""
+        grouped: Dict[str, List[Dict[str, Any]]] = {}
+        for span in reversed(self.spans):
+            grouped.setdefault(span["trace_id"], []).append(span)
+            if len(grouped) > limit:
+                grouped.pop(span["trace_id"])
+                break
+        return [
+            {"trace_id": trace_id, "spans": sorted(spans, key=lambda s: s["start_ns"])}
+            for trace_id, spans in grouped.items()
+        ]
+
+
+class FileExporter(SpanExporter):
+    """Appends spans as JSON lines to a local file."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _write(self, lines: List[str]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.writelines(lines)
+
+    async def export(self, spans: List[Span]) -> None:
+        lines = [json.dumps(span.to_dict(), ensure_ascii=False, default=str) + "\n" for span in spans]
+        await asyncio.to_thread(self._write, lines)
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OTLPHttpExporter(SpanExporter):
+    """Sends spans to an OpenTelemetry collector (OTLP/HTTP, JSON encoding)."""
+
+    def __init__(self, endpoint: str, service_name: str, timeout: float = 5.0):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.service_name = service_name
+        self._client = httpx.AsyncClient(timeout=timeout)
+
+    def _encode(self, spans: List[Span]) -> Dict[str, Any]:
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [
+                    {"key": "service.name", "value": {"stringValue": self.service_name}},
+                ]},
+                "scopeSpans": [{
+                    "scope": {"name": "app.core.tracing"},
+                    "spans": [
+                        {
+                            "traceId": span.trace_id,
+                            "spanId": span.span_id,
+                            **({"parentSpanId": span.parent_id} if span.parent_id else {}),
+                            "name": span.name,
+                            "kind": _OTLP_KINDS[span.kind],
+                            "startTimeUnixNano": str(span.start_ns),
+                            "endTimeUnixNano": str(span.end_ns),
+                            "attributes": [
+                                {"key": key, "value": _otlp_value(value)}
+                                for key, value in span.attributes.items() if value is not None
+                            ],
+                            "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+                        }
+                        for span in spans
+                    ],
+                }],
+            }],
+        }
+
+    async def export(self, spans: List[Span]) -> None:
+        response = await self._client.post(self.url, json=self._encode(spans))
+        response.raise_for_status()
+
+    async def shutdown(self) -> None:
+        await self._client.aclose()
+
+
+# ---------------------------------------------------------------------------
+# Tracer
+# ---------------------------------------------------------------------------
+
+
+class Tracer:
+    """
+    Creates spans and hands kept traces to the exporter in batches.
+
+    Sampling is decided per trace: a trace is exported when it was
+    head-sampled (`sample_ratio`, or the incoming traceparent's flag), or
+    when its root turned out slower than `slow_ms` or failed. Unsampled
+    traces only cost a few small objects per span until the root ends, so
+    slow outliers are always explainable down to each upstream call.
+    Export happens on a background task every `flush_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        exporter: Optional[SpanExporter],
+        sample_ratio: float = 0.1,
+        slow_ms: float = 5000.0,
+        flush_interval: float = 5.0,
+        max_queue: int = 10000,
+    ):
+        self.exporter = exporter
+        self.enabled = exporter is not None
+        self.sample_ratio = sample_ratio
+        self.slow_ms = slow_ms
+        self.flush_interval = flush_interval
+        self._queue: Deque[Span] = deque(maxlen=max_queue)
+        self._task: Optional[asyncio.Task] = None
+        self.traces_started = 0
+        self.traces_exported = 0
+        self.export_errors = 0
+
+    @contextmanager
+    def span(self, name: str, kind: str = INTERNAL, **attributes: Any) -> Iterator[Any]:
+        """Time a block as a child of the current span (or as a new trace root)."""
+        if not self.enabled:
+            yield NOOP_SPAN
+            return
+        parent = _current_span.get()
+        if parent is None:
+            self.traces_started += 1
+            trace = _Trace(f"{random.getrandbits(128):032x}", random.random() < self.sample_ratio)
+            parent_id = None
+        else:
+            trace, parent_id = parent.trace, parent.span_id
+        with self._activate(Span(trace, parent_id, name, kind, attributes), root=parent is None) as span:
+            yield span
+
+    @contextmanager
+    def start_trace(
+        self, name: str, traceparent_header: Optional[str] = None, **attributes: Any
+    ) -> Iterator[Any]:
+        """Root span of a server request, continuing the caller's trace if given."""
+        remote = _parse_traceparent(traceparent_header)
+        if not self.enabled or remote is None:
+            with self.span(name, kind=SERVER, **attributes) as span:
+                yield span
+            return
+        trace_id, parent_id, sampled = remote
+        self.traces_started += 1
+        trace = _Trace(trace_id, sampled or random.random() < self.sample_ratio)
+        with self._activate(Span(trace, parent_id, name, SERVER, attributes), root=True) as span:
+            yield span
+
+    @contextmanager
+    def _activate(self, span: Span, root: bool) -> Iterator[Span]:
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+            _current_span.reset(token)
+            self._finish(span, root)
+
+    def _finish(self, span: Span, root: bool) -> None:
+        trace = span.trace
+        if trace.done:
+            # Child that outlived its root (e.g. a detached task)
+            if trace.kept:
+                self._queue.append(span)
+            return
+        if len(trace.spans) < MAX_SPANS_PER_TRACE:
+            trace.spans.append(span)
+        if not root:
+            return
+        trace.done = True
+        trace.kept = (
+            trace.sampled
+            or span.duration_ms >= self.slow_ms
+            or any(s.error for s in trace.spans)
+        )
+        if trace.kept:
+            self.traces_exported += 1
+            self._queue.extend(trace.spans)
+        trace.spans = []
+
+    async def flush(self) -> None:
+        """Export everything queued so far."""
+        if not self._queue or self.exporter is None:
+            return
+        batch = list(self._queue)
+        self._queue.clear()
+        try:
+            await self.exporter.export(batch)
+        except Exception as e:
+            self.export_errors += 1
+            logger.warning("Span export failed (%d spans dropped): %s", len(batch), e)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        if self.exporter is not None:
+            await self.exporter.shutdown()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "exporter": type(self.exporter).__name__ if self.exporter else None,
+            "sample_ratio": self.sample_ratio,
+            "slow_ms": self.slow_ms,
+            "traces_started": self.traces_started,
+            "traces_exported": self.traces_exported,
+            "queued_spans": len(self._queue),
+            "export_errors": self.export_errors,
+        }
+
+
+def traced(name: str, kind: str = INTERNAL) -> Callable[[Callable[..., Awaitable[T]]], Callable[..., Awaitable[T]]]:
+    """Wrap an async function in a span; the body can add attributes via `current_span()`."""
+    def decorator(func: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> T:
+            with tracer.span(name, kind=kind):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _create_exporter() -> Optional[SpanExporter]:
+    exporter = settings.TRACING_EXPORTER
+    if exporter == "memory":
+        return InMemoryExporter()
+    if exporter == "file":
+        return FileExporter(settings.TRACING_FILE_PATH)
+    if exporter == "otlp":
+        return OTLPHttpExporter(settings.TRACING_OTLP_ENDPOINT, settings.PROJECT_NAME)
+    return None
+
+
+tracer = Tracer(
+    _create_exporter(),
+    sample_ratio=settings.TRACING_SAMPLE_RATIO,
+    slow_ms=settings.TRACING_SLOW_MS,
+)
+
+
+class TracingMiddleware:
+    """
+    Root span per HTTP request.
+
+    Continues an incoming W3C `traceparent` and returns the trace ID in
+    `X-Trace-ID`. Must run inside RequestContextMiddleware so the request
+    ID and tenant are available.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        incoming = headers.get(TRACEPARENT_HEADER.encode())
+        with tracer.start_trace(
+            f"{scope['method']} {scope['path']}",
+            incoming.decode("latin-1") if incoming else None,
+            request_id=current_request_id(),
+            tenant_id=current_tenant_id(),
+        ) as span:
+            async def send_with_trace_id(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    span.set("http.status_code", message["status"])
+                    headers = list(message.get("headers", []))
+                    headers.append((TRACE_ID_HEADER.lower().encode(), span.trace_id.encode()))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            await self.app(scope, receive, send_with_trace_id)
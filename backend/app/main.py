@@ -2,12 +2,25 @@
 Web Scraping Automation Builder - FastAPI Backend
 AI Data Intelligence Platform for Korean Market
 """
+import os
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 from app.api import router as api_router
+from app.core.admission import AdmissionMiddleware
 from app.core.config import settings
+from app.core.context import RequestContextMiddleware
+from app.core.executor import shutdown_executor
+from app.core.loop_monitor import loop_monitor
+from app.core.serialization import FastJSONResponse
+from app.core.tracing import TracingMiddleware, tracer
+from app.services.dedup_service import dedup_index
+from app.services.health_service import health_prober
+from app.services.item_store_service import item_store
+from app.services.prefetch_service import prefetcher
+from app.services.rate_limit_service import rate_limiter
 
 
 @asynccontextmanager
@@ -15,9 +28,28 @@ async def lifespan(app: FastAPI):
     """Application lifespan events."""
     # Startup
     print(f"🚀 Starting {settings.PROJECT_NAME} v{settings.VERSION}")
+    await health_prober.start()
+    await tracer.start()
+    if settings.LOOP_MONITOR_ENABLED:
+        await loop_monitor.start()
+    if settings.DEDUP_INDEX_PATH and os.path.exists(settings.DEDUP_INDEX_PATH):
+        pages = dedup_index.load(settings.DEDUP_INDEX_PATH)
+        print(f"📚 Loaded {pages} page signatures for near-duplicate detection")
+    if item_store.directory:
+        files = item_store.load()
+        print(f"🗄️ Loaded {files} item store partitions")
     yield
     # Shutdown
     print("👋 Shutting down...")
+    await prefetcher.stop()
+    await item_store.flush()
+    await tracer.stop()
+    await health_prober.stop()
+    await loop_monitor.stop()
+    await rate_limiter.close()
+    shutdown_executor()
+    if settings.DEDUP_INDEX_PATH:
+        dedup_index.save(settings.DEDUP_INDEX_PATH)
 
 
 app = FastAPI(
@@ -25,10 +57,15 @@ app = FastAPI(
     description="노코드 웹 스크래핑 자동화 빌더 - AI 데이터 인텔리전스 플랫폼",
     version=settings.VERSION,
     lifespan=lifespan,
+    default_response_class=FastJSONResponse,
     docs_url="/docs",
     redoc_url="/redoc",
 )
 
+# Load shedding for expensive endpoints (innermost, so 503s get CORS headers)
+if settings.ADMISSION_ENABLED:
+    app.add_middleware(AdmissionMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -38,6 +75,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Root span per request (runs inside the request context)
+app.add_middleware(TracingMiddleware)
+
+# Request ID / tenant / endpoint context for accounting
+app.add_middleware(RequestContextMiddleware)
+
 # Include API router
 app.include_router(api_router, prefix="/api")
 
@@ -56,3 +99,16 @@ async def root():
 async def health_check():
     """Health check for load balancer."""
     return {"status": "ok"}
+
+
+@app.get("/health/deep")
+async def deep_health_check():
+    """
+    Dependency health from the background prober.
+
+    Served from cache - never calls upstreams. Returns 503 when a critical
+    dependency (Firecrawl, OpenRouter) is known to be down.
+    """
+    snapshot = health_prober.snapshot()
+    status_code = 503 if snapshot["status"] == "down" else 200
+    return JSONResponse(content=snapshot, status_code=status_code)
@@ -0,0 +1,166 @@
+"""
+Boilerplate Service - Per-domain learning of repeated site chrome
+Strips headers, menus and footers that recur across pages of the same site
+"""
+import hashlib
+import re
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple
+from urllib.parse import urlparse
+
+from app.core.config import settings
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def domain_of(url: str) -> str:
+    """Normalized domain key for a URL (lowercase, without www.)."""
+    host = (urlparse(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+@dataclass
+class _DomainModel:
+    """Block frequency counts for one domain."""
+    pages_seen: int = 0
+    # 64-bit block hash -> number of pages the block appeared on
+    counts: Dict[int, int] = field(default_factory=dict)
+    # Hashes of URLs already learned from (oldest first)
+    seen_urls: "OrderedDict[int, None]" = field(default_factory=OrderedDict)
+    chars_in: int = 0
+    chars_removed: int = 0
+
+
+class BoilerplateFilter:
+    """
+    Learns which markdown blocks repeat across pages of a domain.
+
+    Each page is split into blank-line separated blocks; a whitespace- and
+    case-normalized 64-bit hash of every block is counted once per page.
+    A block is treated as boilerplate when it already appeared on at least
+    `min_ratio` of the previously seen pages of that domain (and on at least
+    `min_pages - 1` of them). Only hashes and counts are kept, with the rarest
+    entries pruned when a domain exceeds `max_blocks_per_domain`.
+
+    Pages are distinct URLs: re-scraping the same URL (monitoring) must not
+    make its own title and description look like site chrome, so the last
+    `max_urls_per_domain` URL hashes are remembered and not learned again.
+
+    Only the `max_domains` most recently used domains are kept; each tracked
+    block or URL costs about 120 bytes, so the limits bound total memory.
+    """
+
+    def __init__(
+        self,
+        min_pages: int = 3,
+        min_ratio: float = 0.5,
+        max_blocks_per_domain: int = 2000,
+        max_domains: int = 200,
+        max_urls_per_domain: int = 2000,
+    ):
+        self.min_pages = max(min_pages, 2)
+        self.min_ratio = min_ratio
+        self.max_blocks_per_domain = max_blocks_per_domain
+        self.max_domains = max_domains
+        self.max_urls_per_domain = max_urls_per_domain
+        self._domains: "OrderedDict[str, _DomainModel]" = OrderedDict()
+
+    @staticmethod
+    def split_blocks(markdown: str) -> List[str]:
+        """Split markdown into blank-line separated blocks."""
+        return [block for block in re.split(r"\n\s*\n", markdown) if block.strip()]
+
+    @staticmethod
+    def block_hash(block: str) -> int:
+        normalized = _WHITESPACE_RE.sub(" ", block).strip().lower()
+        digest = hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "big")
+
+    def _model(self, domain: str) -> _DomainModel:
+        model = self._domains.pop(domain, None) or _DomainModel()
+        self._domains[domain] = model  # Most recently used last
+        while len(self._domains) > self.max_domains:
+            self._domains.popitem(last=False)
+        return model
+
+    def _is_repeated(self, model: _DomainModel, block_hash: int) -> bool:
+        if model.pages_seen < self.min_pages - 1:
+            return False
+        seen = model.counts.get(block_hash, 0)
+        return seen >= self.min_pages - 1 and seen >= self.min_ratio * model.pages_seen
+
+    def _first_visit(self, model: _DomainModel, url: str) -> bool:
+        """Remember the URL; False when it was already learned from."""
+        url_hash = self.block_hash(url.split("#", 1)[0])
+        if url_hash in model.seen_urls:
+            model.seen_urls.move_to_end(url_hash)
+            return False
+        model.seen_urls[url_hash] = None
+        while len(model.seen_urls) > self.max_urls_per_domain:
+            model.seen_urls.popitem(last=False)
+        return True
+
+    def _learn(self, model: _DomainModel, hashes: List[int]) -> None:
+        model.pages_seen += 1
+        for block_hash in set(hashes):
+            model.counts[block_hash] = model.counts.get(block_hash, 0) + 1
+        if len(model.counts) > self.max_blocks_per_domain:
+            # Keep the most frequent half - one-off blocks are page content
+            keep = sorted(model.counts.items(), key=lambda kv: kv[1], reverse=True)
+            model.counts = dict(keep[: self.max_blocks_per_domain // 2])
+
+    def strip(self, url: str, markdown: str, learn: bool = True) -> Tuple[str, int]:
+        """
+        Remove blocks known to repeat on the URL's domain.
+
+        Args:
+            url: Page URL (used for the domain key)
+            markdown: Scraped markdown
+            learn: Update the domain model with this page (first visit of the URL only)
+
+        Returns:
+            (cleaned markdown, number of characters removed)
+        """
+        if not markdown:
+            return markdown, 0
+        domain = domain_of(url)
+        model = self._model(domain)
+        blocks = self.split_blocks(markdown)
+        hashes = [self.block_hash(block) for block in blocks]
+
+        kept = [block for block, h in zip(blocks, hashes) if not self._is_repeated(model, h)]
+        if learn and self._first_visit(model, url):
+            self._learn(model, hashes)
+
+        if not kept:
+            # Whole page matches known chrome - keep it rather than send nothing
+            return markdown, 0
+
+        cleaned = "\n\n".join(kept)
+        removed = max(len(markdown) - len(cleaned), 0)
+        model.chars_in += len(markdown)
+        model.chars_removed += removed
+        return cleaned, removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Learned domains with page counts and stripped share."""
+        return {
+            "domains": {
+                domain: {
+                    "pages_seen": model.pages_seen,
+                    "tracked_blocks": len(model.counts),
+                    "removed_ratio": round(model.chars_removed / model.chars_in, 3) if model.chars_in else 0.0,
+                }
+                for domain, model in self._domains.items()
+            }
+        }
+
+
+boilerplate_filter = BoilerplateFilter(
+    min_pages=settings.BOILERPLATE_MIN_PAGES,
+    min_ratio=settings.BOILERPLATE_MIN_RATIO,
+    max_blocks_per_domain=settings.BOILERPLATE_MAX_BLOCKS_PER_DOMAIN,
+    max_domains=settings.BOILERPLATE_MAX_DOMAINS,
+    max_urls_per_domain=settings.BOILERPLATE_MAX_URLS_PER_DOMAIN,
+)
@@ -0,0 +1,147 @@
+"""
+Cache Service - In-process TTL/LRU cache of Firecrawl scrape results
+Serves repeated and prefetched scrapes without another render
+"""
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.boilerplate_service import domain_of
+
+CacheKey = Tuple[Any, ...]
+
+
+@dataclass
+class _Entry:
+    """A cached scrape result."""
+    value: Dict[str, Any]
+    stored_at: float
+    expires_at: float
+    prefetched: bool = False
+    used: bool = False
+
+
+def scrape_key(
+    url: str,
+    formats: List[str],
+    only_main_content: Optional[bool],
+    wait_for: Optional[int] = None,
+    include_tags: Optional[List[str]] = None,
+    exclude_tags: Optional[List[str]] = None,
+) -> CacheKey:
+    """
+    Cache key covering every option that changes the scrape output.
+    Options the caller left to the render profile stay None in the key.
+    """
+    return (
+        url,
+        tuple(formats),
+        only_main_content,
+        wait_for,
+        tuple(include_tags or ()),
+        tuple(exclude_tags or ()),
+    )
+
+
+class ScrapeCache:
+    """
+    Scrape results keyed by URL and scrape options.
+
+    Entries expire after `ttl` seconds and the least recently used entry is
+    evicted above `max_entries`. Entries written by the prefetcher are
+    tracked per domain: the first read counts as a prefetch hit, expiry or
+    eviction without any read counts as waste.
+
+    `get` returns a shallow copy of the stored result: top-level keys can
+    be changed freely, nested values (metadata, spilled handles) are shared
+    with the cache and must be treated as read-only.
+    """
+
+    def __init__(self, ttl: float = 600.0, max_entries: int = 500):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[CacheKey, _Entry]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.prefetched: Counter = Counter()
+        self.prefetch_hits: Counter = Counter()
+        self.prefetch_wasted: Counter = Counter()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def get(self, key: CacheKey, max_age: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Cached result for `key`, None when missing, expired or older than `max_age` seconds."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        now = time.monotonic()
+        if entry.expires_at <= now:
+            self._drop(key)
+            self.misses += 1
+            return None
+        if max_age is not None and now - entry.stored_at > max_age:
+            self.misses += 1  # Too old for this caller; a fresh scrape replaces it
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        if entry.prefetched and not entry.used:
+            self.prefetch_hits[domain_of(key[0])] += 1
+        entry.used = True
+        return dict(entry.value)
+
+    def contains(self, key: CacheKey) -> bool:
+        """Whether a fresh entry exists (does not count as a read)."""
+        entry = self._entries.get(key)
+        return entry is not None and entry.expires_at > time.monotonic()
+
+    def put(self, key: CacheKey, value: Dict[str, Any], prefetched: bool = False) -> None:
+        if not self.enabled:
+            return
+        if key in self._entries:
+            self._drop(key)
+        now = time.monotonic()
+        self._entries[key] = _Entry(dict(value), now, now + self.ttl, prefetched=prefetched)
+        if prefetched:
+            self.prefetched[domain_of(key[0])] += 1
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+
+    def _drop(self, key: CacheKey) -> None:
+        entry = self._entries.pop(key)
+        if entry.prefetched and not entry.used:
+            self.prefetch_wasted[domain_of(key[0])] += 1
+
+    def purge_expired(self) -> int:
+        """Drop expired entries so unused prefetches are counted as waste."""
+        now = time.monotonic()
+        expired = [key for key, entry in self._entries.items() if entry.expires_at <= now]
+        for key in expired:
+            self._drop(key)
+        return len(expired)
+
+    def reset_domain(self, domain: str) -> None:
+        """Forget prefetch accounting for a domain (after a re-exploration)."""
+        for counter in (self.prefetched, self.prefetch_hits, self.prefetch_wasted):
+            counter.pop(domain, None)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+scrape_cache = ScrapeCache(
+    ttl=settings.SCRAPE_CACHE_TTL_SECONDS,
+    max_entries=settings.SCRAPE_CACHE_MAX_ENTRIES,
+)
@@ -0,0 +1,321 @@
+"""
+Crawl Service - Webhook-driven Firecrawl crawl and batch scrape jobs
+Pages are processed (boilerplate, dedup, auto-extract) as their webhook events arrive
+"""
+import asyncio
+import contextvars
+import hashlib
+import hmac
+import logging
+import secrets
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+
+from app.core.config import Settings, settings
+from app.core.context import endpoint_var, tenant_id_var
+from app.services.firecrawl_service import FirecrawlService
+from app.services.llm_service import LLMService
+from app.services.pipeline_service import QuickPipeline
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_HEADER = "X-Firecrawl-Signature"
+TOKEN_HEADER = "X-Webhook-Token"
+
+CRAWL = "crawl"
+BATCH_SCRAPE = "batch_scrape"
+
+
+class CrawlJobNotFoundError(Exception):
+    """Raised when a job ID is unknown (or already evicted)."""
+
+
+class CrawlJobLimitError(Exception):
+    """Raised when `max_jobs` jobs are already running."""
+
+
+class WebhookSignatureError(Exception):
+    """Raised when a webhook request is not signed by us or Firecrawl."""
+
+
+# Keys shipped in config.py and .env.example - anyone could sign with them
+_PUBLISHED_KEYS = {Settings.model_fields["SECRET_KEY"].default, "dev-secret-key-change-in-production"}
+
+# Per-job tokens only need to outlive the (in-memory) jobs of this process
+_PROCESS_SECRET = secrets.token_bytes(32)
+
+
+def _signing_secret() -> Optional[bytes]:
+    """Secret shared with Firecrawl for body signatures; None unless one is really configured."""
+    secret = settings.FIRECRAWL_WEBHOOK_SECRET
+    if not secret and settings.SECRET_KEY not in _PUBLISHED_KEYS:
+        secret = settings.SECRET_KEY
+    return secret.encode("utf-8") if secret else None
+
+
+def webhook_token(job_id: str) -> str:
+    """Per-job token sent back by Firecrawl in the webhook headers."""
+    secret = _signing_secret() or _PROCESS_SECRET
+    return hmac.new(secret, job_id.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def verify_webhook(body: bytes, signature: Optional[str], token: Optional[str], job_id: Optional[str]) -> None:
+    """
+    Authenticate a webhook request.
+
+    Accepts Firecrawl's own HMAC-SHA256 body signature (`sha256=<hex>`) or,
+    for self-hosted instances that do not sign, the per-job token we
+    registered with the webhook. Signatures are only checked when a secret
+    is configured (FIRECRAWL_WEBHOOK_SECRET or a SECRET_KEY other than the
+    published defaults, which would let anyone sign).
+
+    Raises:
+        WebhookSignatureError: if neither check passes
+    """
+    secret = _signing_secret()
+    if signature and secret:
+        expected = hmac.new(secret, body, hashlib.sha256).hexdigest()
+        if hmac.compare_digest(signature.removeprefix("sha256="), expected):
+            return
+    if token and job_id and hmac.compare_digest(token, webhook_token(job_id)):
+        return
+    raise WebhookSignatureError("웹훅 서명이 올바르지 않습니다")
+
+
+@dataclass
+class CrawlJob:
+    """A crawl or batch scrape started by a tenant and its processed pages."""
+    id: str
+    kind: str
+    tenant_id: str
+    data_type: str
+    firecrawl_id: Optional[str] = None
+    status: str = "pending"  # pending, running, completed, failed, cancelled
+    error: Optional[str] = None
+    pages_received: int = 0
+    pages_processed: int = 0
+    pages_failed: int = 0
+    duplicates: int = 0
+    results: List[Dict[str, Any]] = field(default_factory=list)
+    created_at: float = field(default_factory=time.time)
+    completed_at: Optional[float] = None
+    upstream_done: bool = False
+    tasks: Set[asyncio.Task] = field(default_factory=set)
+    semaphore: Optional[asyncio.Semaphore] = None
+
+    def summary(self, include_results: bool = False) -> Dict[str, Any]:
+        summary = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "firecrawl_id": self.firecrawl_id,
+            "status": self.status,
+            "error": self.error,
+            "pages_received": self.pages_received,
+            "pages_processed": self.pages_processed,
+            "pages_failed": self.pages_failed,
+            "pages_pending": len(self.tasks),
+            "duplicates": self.duplicates,
+            "created_at": self.created_at,
+            "completed_at": self.completed_at,
+        }
+        if include_results:
+            summary["results"] = self.results
+        return summary
+
+
+class CrawlJobManager:
+    """
+    Starts Firecrawl crawl / batch scrape jobs with a webhook and processes
+    their events.
+
+    Firecrawl calls the webhook for every finished page and once when the
+    job completes, so no status polling is needed. Each page is run through
+    `QuickPipeline.process_page` in the background (at most
+    `page_concurrency` per job, scheduled under the job's tenant), so the
+    webhook responds immediately and Firecrawl does not retry.
+    """
+
+    def __init__(
+        self,
+        firecrawl: FirecrawlService,
+        pipeline: QuickPipeline,
+        webhook_url: str,
+        page_concurrency: int = 2,
+        max_jobs: int = 100,
+        max_results_per_job: int = 1000,
+    ):
+        self.firecrawl = firecrawl
+        self.pipeline = pipeline
+        self.webhook_url = webhook_url
+        self.page_concurrency = page_concurrency
+        self.max_jobs = max_jobs
+        self.max_results_per_job = max_results_per_job
+        self._jobs: "OrderedDict[str, CrawlJob]" = OrderedDict()
+        self._by_firecrawl_id: Dict[str, str] = {}
+        self.events_received = 0
+
+    def _new_job(self, kind: str, tenant_id: str, data_type: str) -> CrawlJob:
+        active = sum(1 for job in self._jobs.values() if job.status in ("pending", "running"))
+        if active >= self.max_jobs:
+            raise CrawlJobLimitError(f"실행 중인 작업이 최대 개수({self.max_jobs})에 도달했습니다")
+        job = CrawlJob(id=uuid.uuid4().hex, kind=kind, tenant_id=tenant_id, data_type=data_type)
+        job.semaphore = asyncio.Semaphore(self.page_concurrency)
+        self._jobs[job.id] = job
+        # Evict the oldest finished jobs
+        for old_id in list(self._jobs):
+            if len(self._jobs) <= self.max_jobs:
+                break
+            old = self._jobs[old_id]
+            if old.status in ("completed", "failed", "cancelled"):
+                self._jobs.pop(old_id)
+                self._by_firecrawl_id.pop(old.firecrawl_id or "", None)
+        return job
+
+    def _webhook(self, job: CrawlJob) -> Dict[str, Any]:
+        return self.firecrawl.webhook_config(
+            self.webhook_url,
+            headers={TOKEN_HEADER: webhook_token(job.id)},
+            metadata={"job_id": job.id},
+        )
+
+    def _started(self, job: CrawlJob, response: Dict[str, Any]) -> CrawlJob:
+        job.firecrawl_id = response.get("id")
+        job.status = "running"
+        if job.firecrawl_id:
+            self._by_firecrawl_id[job.firecrawl_id] = job.id
+        return job
+
+    async def start_crawl(self, tenant_id: str, url: str, data_type: str = "auto", **options: Any) -> CrawlJob:
+        """Start a crawl; options are passed to `FirecrawlService.crawl`."""
+        job = self._new_job(CRAWL, tenant_id, data_type)
+        try:
+            response = await self.firecrawl.crawl(url, webhook=self._webhook(job), **options)
+        except Exception:
+            self._jobs.pop(job.id, None)
+            raise
+        return self._started(job, response)
+
+    async def start_batch(self, tenant_id: str, urls: List[str], data_type: str = "auto") -> CrawlJob:
+        """Start a batch scrape of `urls`."""
+        job = self._new_job(BATCH_SCRAPE, tenant_id, data_type)
+        try:
+            response = await self.firecrawl.batch_scrape(urls, webhook=self._webhook(job))
+        except Exception:
+            self._jobs.pop(job.id, None)
+            raise
+        return self._started(job, response)
+
+    def get(self, job_id: str) -> CrawlJob:
+        job = self._jobs.get(job_id)
+        if job is None:
+            raise CrawlJobNotFoundError(f"작업을 찾을 수 없습니다: {job_id}")
+        return job
+
+    async def cancel(self, job_id: str) -> CrawlJob:
+        job = self.get(job_id)
+        if job.kind == CRAWL and job.firecrawl_id and job.status == "running":
+            await self.firecrawl.cancel_crawl(job.firecrawl_id)
+        for task in list(job.tasks):
+            task.cancel()
+        self._finish(job, "cancelled")
+        return job
+
+    def job_id_for(self, event: Dict[str, Any]) -> Optional[str]:
+        """Our job ID for a webhook event (from metadata, else the Firecrawl ID)."""
+        metadata = event.get("metadata") or {}
+        if isinstance(metadata, dict) and metadata.get("job_id"):
+            return metadata["job_id"]
+        return self._by_firecrawl_id.get(event.get("id") or "")
+
+    def handle_event(self, event: Dict[str, Any]) -> CrawlJob:
+        """
+        Apply one webhook event (`crawl.page`, `batch_scrape.completed`, ...).
+
+        Pages are queued for background processing; this returns at once.
+        """
+        self.events_received += 1
+        job = self.get(self.job_id_for(event) or "")
+        if job.status in ("completed", "failed", "cancelled"):
+            return job
+
+        event_type = str(event.get("type", "")).rsplit(".", 1)[-1]
+        pages = event.get("data") or []
+        if isinstance(pages, dict):
+            pages = [pages]
+        if event_type == "page" and event.get("success") is False:
+            # One page failed upstream; the rest of the job carries on
+            job.pages_failed += max(1, len(pages))
+            logger.warning("Firecrawl page failed (job %s): %s", job.id, event.get("error"))
+        else:
+            for page in pages:
+                self._enqueue_page(job, page)
+
+        if event_type == "failed":
+            job.error = event.get("error") or "Firecrawl 작업 실패"
+            self._finish(job, "failed")
+        elif event_type == "completed":
+            job.upstream_done = True
+            self._maybe_complete(job)
+        return job
+
+    def _enqueue_page(self, job: CrawlJob, page: Dict[str, Any]) -> None:
+        markdown = page.get("markdown") or ""
+        metadata = page.get("metadata") or {}
+        url = metadata.get("sourceURL") or metadata.get("url") or page.get("url")
+        if not url or not markdown:
+            return
+        job.pages_received += 1
+        # Fresh context: usage is billed to the job's tenant, not the webhook caller
+        task = asyncio.create_task(self._process_page(job, url, markdown), context=contextvars.Context())
+        job.tasks.add(task)
+        task.add_done_callback(lambda t: self._page_done(job, t))
+
+    async def _process_page(self, job: CrawlJob, url: str, markdown: str) -> None:
+        tenant_id_var.set(job.tenant_id)
+        endpoint_var.set(f"webhook {job.kind}")
+        async with job.semaphore:
+            try:
+                result = await self.pipeline.process_page(url, markdown, job.data_type, job.tenant_id)
+            except Exception as e:
+                job.pages_failed += 1
+                logger.warning("Crawl page processing failed (%s): %s", url, e)
+                return
+        job.pages_processed += 1
+        if result["duplicate_of"]:
+            job.duplicates += 1
+        if len(job.results) < self.max_results_per_job:
+            job.results.append(result)
+
+    def _page_done(self, job: CrawlJob, task: asyncio.Task) -> None:
+        job.tasks.discard(task)
+        self._maybe_complete(job)
+
+    def _maybe_complete(self, job: CrawlJob) -> None:
+        if job.upstream_done and not job.tasks and job.status == "running":
+            self._finish(job, "completed")
+
+    def _finish(self, job: CrawlJob, status: str) -> None:
+        job.status = status
+        job.completed_at = time.time()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "jobs": len(self._jobs),
+            "running": sum(1 for job in self._jobs.values() if job.status == "running"),
+            "events_received": self.events_received,
+            "pages_pending": sum(len(job.tasks) for job in self._jobs.values()),
+        }
+
+
+_firecrawl = FirecrawlService()
+
+crawl_manager = CrawlJobManager(
+    _firecrawl,
+    QuickPipeline(_firecrawl, LLMService()),
+    webhook_url=f"{settings.PUBLIC_BASE_URL.rstrip('/')}{settings.API_V1_PREFIX}/webhooks/firecrawl",
+    page_concurrency=settings.CRAWL_PAGE_CONCURRENCY,
+    max_jobs=settings.CRAWL_MAX_JOBS,
+)
@@ -0,0 +1,235 @@
+"""
+Dedup Service - Near-duplicate page detection with SimHash
+Reuses extraction results for pages whose content was already processed
+"""
+import hashlib
+import json
+import os
+import re
+import struct
+from array import array
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+_LINK_RE = re.compile(r"\]\([^)]*\)")
+_TOKEN_RE = re.compile(r"[0-9a-z가-힣]+")
+
+_FILE_MAGIC = b"SIMH2"
+# URL length prefix per file version (SIMH1 files used 2 bytes and are still read)
+_URL_LENGTH_FORMATS = {b"SIMH1": "<H", _FILE_MAGIC: "<I"}
+
+# Byte value -> its 8 bits spread into separate lanes (see simhash)
+_LANE_BITS = 24
+_SPREAD = [sum(((b >> i) & 1) << (_LANE_BITS * i) for i in range(8)) for b in range(256)]
+
+
+@dataclass
+class DuplicateMatch:
+    """An already indexed page that is a near duplicate."""
+    url: str
+    distance: int
+
+
+class NearDuplicateIndex:
+    """
+    SimHash index over scraped markdown.
+
+    Pages are reduced to 64-bit SimHash signatures of word 3-shingles
+    (link targets and markup dropped, so tracking parameters and mobile vs
+    desktop variants collapse together). Signatures are split into
+    `max_distance + 1` bands; by pigeonhole, any signature within
+    `max_distance` bits shares at least one band exactly, so a lookup only
+    checks the few candidates in matching band buckets.
+
+    Storage is an `array('Q')` of signatures plus one small `array('I')`
+    of row numbers per band bucket, which keeps millions of pages compact.
+    """
+
+    SHINGLE_SIZE = 3
+    MIN_CHARS = 200  # Shorter pages (errors, empty renders) are never deduplicated
+
+    def __init__(self, max_distance: int = 3, max_cached_results: int = 10000):
+        self.enabled = max_distance >= 0
+        max_distance = max(max_distance, 0)
+        self.max_distance = max_distance
+        self.max_cached_results = max_cached_results
+        bands = max_distance + 1
+        width = 64 // bands
+        self._bands = [
+            (i * width, 64 - i * width if i == bands - 1 else width) for i in range(bands)
+        ]
+        self._signatures = array("Q")
+        self._urls: List[str] = []
+        self._row_by_url: Dict[str, int] = {}
+        self._buckets: Dict[int, array] = {}
+        self._results: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self.lookups = 0
+        self.reused = 0
+
+    @classmethod
+    def simhash(cls, text: str) -> int:
+        """64-bit SimHash of the normalized text's word shingles."""
+        tokens = _TOKEN_RE.findall(_LINK_RE.sub("]", text.lower()))
+        if len(tokens) < cls.SHINGLE_SIZE:
+            shingles = Counter([" ".join(tokens)])
+        else:
+            shingles = Counter(
+                " ".join(tokens[i:i + cls.SHINGLE_SIZE])
+                for i in range(len(tokens) - cls.SHINGLE_SIZE + 1)
+            )
+
+        # Bit-sliced accumulation: every hash bit gets its own 24-bit lane in
+        # one big integer, so per-shingle work is 8 table lookups, not 64 branches
+        acc = 0
+        total = 0
+        for shingle, count in shingles.items():
+            digest = hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest()
+            spread = 0
+            for i, byte in enumerate(reversed(digest)):
+                spread |= _SPREAD[byte] << (_LANE_BITS * 8 * i)
+            acc += spread * count
+            total += count
+
+        lane_mask = (1 << _LANE_BITS) - 1
+        signature = 0
+        for bit in range(64):
+            if 2 * ((acc >> (_LANE_BITS * bit)) & lane_mask) > total:
+                signature |= 1 << bit
+        return signature
+
+    def signature(self, text: str) -> Optional[int]:
+        """SimHash of a page, or None when dedup is disabled or the page is too short."""
+        if not self.enabled or len(text) < self.MIN_CHARS:
+            return None
+        return self.simhash(text)
+
+    def _bucket_keys(self, signature: int) -> List[int]:
+        return [
+            (band << 64) | ((signature >> offset) & ((1 << width) - 1))
+            for band, (offset, width) in enumerate(self._bands)
+        ]
+
+    def find(self, signature: int, exclude_url: Optional[str] = None) -> Optional[DuplicateMatch]:
+        """Closest indexed page within `max_distance` bits (other than `exclude_url`), if any."""
+        best_row, best_distance = -1, self.max_distance + 1
+        for key in self._bucket_keys(signature):
+            rows = self._buckets.get(key)
+            if rows is None:
+                continue
+            for row in rows:
+                if exclude_url is not None and self._urls[row] == exclude_url:
+                    continue
+                distance = (self._signatures[row] ^ signature).bit_count()
+                if distance < best_distance:
+                    best_row, best_distance = row, distance
+        if best_row < 0:
+            return None
+        return DuplicateMatch(url=self._urls[best_row], distance=best_distance)
+
+    def reuse(self, url: str, signature: int, task: str) -> Optional[Tuple[DuplicateMatch, Dict[str, Any]]]:
+        """
+        Stored `task` result of a near duplicate of the page at `url`.
+
+        The page's own earlier scrape never matches: small changes such as
+        a price drop barely move the signature, so a re-scraped URL is
+        always processed again (and its stored result refreshed).
+
+        Returns:
+            (match, result), or None when nothing can be reused
+        """
+        self.lookups += 1
+        match = self.find(signature, exclude_url=url)
+        result = self.get_result(match.url, task) if match else None
+        if result is None:
+            return None
+        self.reused += 1
+        return match, result
+
+    def add(self, url: str, signature: int) -> None:
+        """Index a processed page (re-adding a URL replaces its signature)."""
+        row = self._row_by_url.get(url)
+        if row is not None:
+            old = self._signatures[row]
+            if old == signature:
+                return
+            for key in self._bucket_keys(old):
+                bucket = self._buckets[key]
+                bucket.remove(row)
+                if not bucket:
+                    del self._buckets[key]
+            self._signatures[row] = signature
+        else:
+            row = len(self._urls)
+            self._signatures.append(signature)
+            self._urls.append(url)
+            self._row_by_url[url] = row
+        for key in self._bucket_keys(signature):
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = array("I")
+            bucket.append(row)
+
+    def get_result(self, url: str, task: str) -> Optional[Dict[str, Any]]:
+        """Cached processing result of an indexed page for a task."""
+        result = self._results.get((url, task))
+        if result is not None:
+            self._results.move_to_end((url, task))
+        return result
+
+    def put_result(self, url: str, task: str, result: Dict[str, Any]) -> None:
+        """Cache a processing result (LRU bounded)."""
+        self._results[(url, task)] = result
+        self._results.move_to_end((url, task))
+        while len(self._results) > self.max_cached_results:
+            self._results.popitem(last=False)
+
+    def save(self, path: str) -> None:
+        """Persist signatures and URLs (results are not persisted)."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_FILE_MAGIC)
+            f.write(struct.pack("<I", len(self._urls)))
+            self._signatures.tofile(f)
+            for url in self._urls:
+                encoded = url.encode("utf-8")
+                f.write(struct.pack("<I", len(encoded)))
+                f.write(encoded)
+        os.replace(tmp_path, path)
+
+    def load(self, path: str) -> int:
+        """Load a saved index into this (empty) index. Returns pages loaded."""
+        with open(path, "rb") as f:
+            length_format = _URL_LENGTH_FORMATS.get(f.read(len(_FILE_MAGIC)))
+            if length_format is None:
+                raise ValueError(f"{path}: SimHash 인덱스 파일이 아닙니다")
+            length_size = struct.calcsize(length_format)
+            (count,) = struct.unpack("<I", f.read(4))
+            signatures = array("Q")
+            signatures.fromfile(f, count)
+            for signature in signatures:
+                (length,) = struct.unpack(length_format, f.read(length_size))
+                self.add(f.read(length).decode("utf-8"), signature)
+        return count
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "pages": len(self._urls),
+            "buckets": len(self._buckets),
+            "cached_results": len(self._results),
+            "max_distance": self.max_distance,
+            "lookups": self.lookups,
+            "reused_results": self.reused,
+        }
+
+
+def task_key(*parts: Any) -> str:
+    """Stable key for a processing task (e.g. extraction prompt + schema)."""
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=12).hexdigest()
+
+
+dedup_index = NearDuplicateIndex(max_distance=settings.DEDUP_MAX_DISTANCE)
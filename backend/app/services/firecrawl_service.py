@@ -2,10 +2,20 @@
 Firecrawl Service - Web Scraping Engine
 Connects to self-hosted Firecrawl instance
 """
+import time
 import httpx
 from typing import Optional, Dict, Any, List
 
 from app.core.config import settings
+from app.core.deadline import remaining_timeout
+from app.core.executor import run_cpu
+from app.core.serialization import loads
+from app.core.spill import decode_stream
+from app.core.tracing import CLIENT, current_span, traced, traceparent
+from app.services.cache_service import scrape_cache, scrape_key
+from app.services.health_service import health_prober
+from app.services.rate_limit_service import RateLimitExceededError, rate_limiter
+from app.services.render_profile_service import RenderOptions, render_profiles
 
 
 class FirecrawlService:
@@ -28,63 +38,177 @@ class FirecrawlService:
         }
         if self.api_key:
             headers["Authorization"] = f"Bearer {self.api_key}"
+        trace_header = traceparent()
+        if trace_header:
+            headers["traceparent"] = trace_header
         return headers
     
+    async def _acquire(self, background: bool = False) -> None:
+        """
+        Check upstream health and take rate-limit budget for one call.
+        
+        Background calls only use spare budget and fail fast instead of waiting.
+        """
+        health_prober.ensure_available("firecrawl")
+        if not background:
+            await rate_limiter.acquire("firecrawl", self.api_key)
+        elif not await rate_limiter.try_acquire_spare(
+            "firecrawl", self.api_key, reserve_ratio=settings.PREFETCH_RATE_RESERVE_RATIO
+        ):
+            raise RateLimitExceededError("firecrawl 여유 한도 없음 - 백그라운드 호출 건너뜀")
+    
+    async def _decode(self, response: httpx.Response) -> Dict[str, Any]:
+        """Decode a JSON body, off the event loop when it is large (rawHtml, screenshots)."""
+        current_span().set("bytes", len(response.content))
+        return await run_cpu(loads, response.content, size=len(response.content))
+    
+    def cached(
+        self,
+        url: str,
+        formats: List[str] = ["markdown"],
+        only_main_content: Optional[bool] = None,
+        wait_for: Optional[int] = None,
+        include_tags: Optional[List[str]] = None,
+        exclude_tags: Optional[List[str]] = None,
+        max_age: Optional[float] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Cached result of `scrape` with the same options, or None.
+
+        Callers that queue scrapes behind a scheduler check this first, so
+        a cache hit doesn't wait for an upstream slot; on a miss they pass
+        `cache_checked=True` to `scrape`.
+        """
+        key = scrape_key(url, formats, only_main_content, wait_for, include_tags, exclude_tags)
+        cached = scrape_cache.get(key, max_age)
+        current_span().set("cache_hit", cached is not None)
+        return cached
+    
+    @traced("firecrawl.scrape", kind=CLIENT)
     async def scrape(
         self,
         url: str,
         formats: List[str] = ["markdown"],
-        only_main_content: bool = True,
+        only_main_content: Optional[bool] = None,
         wait_for: Optional[int] = None,
         include_tags: Optional[List[str]] = None,
         exclude_tags: Optional[List[str]] = None,
+        use_cache: bool = True,
+        max_age: Optional[float] = None,
+        background: bool = False,
+        cache_checked: bool = False,
     ) -> Dict[str, Any]:
         """
         Scrape a single URL.
         
+        Options left as None are taken from the domain's learned render
+        profile (see app.services.render_profile_service); a render that
+        comes back incomplete is retried once with a longer wait.
+        
         Args:
             url: URL to scrape
             formats: Output formats (markdown, html, rawHtml, links)
-            only_main_content: Extract only main content
-            wait_for: Wait time in milliseconds
+            only_main_content: Extract only main content (None: learned)
+            wait_for: Wait time in milliseconds (None: learned)
             include_tags: HTML tags to include
-            exclude_tags: HTML tags to exclude
+            exclude_tags: HTML tags to exclude (None: learned when
+                only_main_content is None as well)
+            use_cache: Serve from / store into the scrape cache
+            max_age: Only serve cached results at most this many seconds
+                old (0: always scrape, the result still refreshes the cache)
+            background: Low-priority call (prefetch) - only spare rate-limit
+                budget is used and the result is cached as a prefetch
+            cache_checked: The caller already missed in `cached`; skip the
+                lookup and only store the result
             
         Returns:
-            Scraped content with metadata
+            Scraped content with metadata. `rawHtml`, `html`, `screenshot`
+            and `links` larger than SCRAPE_SPILL_THRESHOLD_BYTES are
+            SpilledValue handles (see app.core.spill.materialize)
         """
+        span = current_span()
+        span.set_attributes(url=url, formats=",".join(formats), background=background)
+        key = scrape_key(url, formats, only_main_content, wait_for, include_tags, exclude_tags)
+        if use_cache and not background and not cache_checked:
+            cached = scrape_cache.get(key, max_age)
+            span.set("cache_hit", cached is not None)
+            if cached is not None:
+                return cached
+        
+        options = render_profiles.resolve(
+            url, only_main_content, wait_for, exclude_tags, explore=not background
+        )
+        span.set_attributes(wait_for=options.wait_for, render_mode=options.mode, render_probe=options.probe)
+        await self._acquire(background)
+        started = time.perf_counter()
+        data = await self._render(url, formats, options, include_tags)
+        retry = render_profiles.record(
+            url, options, data, (time.perf_counter() - started) * 1000, allow_retry=not background
+        )
+        if retry is not None:
+            span.set("render_retry_wait_for", retry.wait_for)
+            await self._acquire()
+            retry_data = await self._render(url, formats, retry, include_tags)
+            data = render_profiles.record_retry(
+                url, options, data, retry, retry_data, (time.perf_counter() - started) * 1000
+            )
+        
+        # The key holds the caller's options; a probe used other ones than the
+        # learned profile they stand for, so its result isn't cached
+        if use_cache and not options.probe:
+            scrape_cache.put(key, data, prefetched=background)
+        return data
+    
+    async def _render(
+        self,
+        url: str,
+        formats: List[str],
+        options: RenderOptions,
+        include_tags: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        """One /v1/scrape call with resolved render options."""
+        span = current_span()
         payload = {
             "url": url,
             "formats": formats,
-            "onlyMainContent": only_main_content,
+            "onlyMainContent": options.only_main_content,
         }
         
-        if wait_for:
-            payload["waitFor"] = wait_for
+        if options.wait_for:
+            payload["waitFor"] = options.wait_for
         if include_tags:
             payload["includeTags"] = include_tags
-        if exclude_tags:
-            payload["excludeTags"] = exclude_tags
+        if options.exclude_tags:
+            payload["excludeTags"] = options.exclude_tags
         
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.post(
+        async with httpx.AsyncClient(timeout=remaining_timeout(self.timeout)) as client:
+            # Streamed so rawHtml / screenshots never sit in memory whole
+            async with client.stream(
+                "POST",
                 f"{self.base_url}/v1/scrape",
                 json=payload,
                 headers=self._get_headers()
-            )
-            response.raise_for_status()
-            data = response.json()
-            
-            # Firecrawl returns data nested in "data" key
-            if "data" in data:
-                return data["data"]
-            return data
+            ) as response:
+                response.raise_for_status()
+                data = await decode_stream(
+                    response.aiter_bytes(),
+                    threshold=settings.SCRAPE_SPILL_THRESHOLD_BYTES,
+                    spill_dir=settings.SCRAPE_SPILL_DIR,
+                )
+                span.set("bytes", response.num_bytes_downloaded)
+        
+        # Firecrawl returns data nested in "data" key
+        if "data" in data:
+            data = data["data"]
+        return data
     
+    @traced("firecrawl.batch_scrape", kind=CLIENT)
     async def batch_scrape(
         self,
         urls: List[str],
         formats: List[str] = ["markdown"],
         only_main_content: bool = True,
+        webhook: Optional[Dict[str, Any]] = None,
     ) -> Dict[str, Any]:
         """
         Batch scrape multiple URLs.
@@ -93,30 +217,168 @@ class FirecrawlService:
             urls: List of URLs to scrape
             formats: Output formats
             only_main_content: Extract only main content
+            webhook: Webhook config (see `webhook_config`) to be notified per
+                page and on completion instead of polling
             
         Returns:
             Batch operation ID and status
         """
+        current_span().set("url_count", len(urls))
         payload = {
             "urls": urls,
             "formats": formats,
             "onlyMainContent": only_main_content,
         }
+        if webhook:
+            payload["webhook"] = webhook
         
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
+        await self._acquire()
+        async with httpx.AsyncClient(timeout=remaining_timeout(self.timeout)) as client:
             response = await client.post(
                 f"{self.base_url}/v1/batch/scrape",
                 json=payload,
                 headers=self._get_headers()
             )
             response.raise_for_status()
-            return response.json()
+            return await self._decode(response)
+    
+    @traced("firecrawl.batch_scrape_status", kind=CLIENT)
+    async def batch_scrape_status(self, job_id: str) -> Dict[str, Any]:
+        """
+        Get the status (and pages so far) of a batch scrape job.
+        
+        Args:
+            job_id: Batch job ID returned by `batch_scrape`
+            
+        Returns:
+            Job status with scraped pages
+        """
+        return await self._request("GET", f"/v1/batch/scrape/{job_id}")
+    
+    @traced("firecrawl.crawl", kind=CLIENT)
+    async def crawl(
+        self,
+        url: str,
+        limit: int = 100,
+        max_depth: Optional[int] = None,
+        include_paths: Optional[List[str]] = None,
+        exclude_paths: Optional[List[str]] = None,
+        formats: List[str] = ["markdown"],
+        only_main_content: bool = True,
+        webhook: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Start an asynchronous crawl of a website.
+        
+        Args:
+            url: Starting URL
+            limit: Maximum number of pages to crawl
+            max_depth: Maximum link depth from the starting URL
+            include_paths: URL path regexes to include
+            exclude_paths: URL path regexes to exclude
+            formats: Output formats for each page
+            only_main_content: Extract only main content
+            webhook: Webhook config (see `webhook_config`) to be notified per
+                page and on completion instead of polling
+            
+        Returns:
+            Crawl job ID
+        """
+        current_span().set_attributes(url=url, limit=limit)
+        payload = {
+            "url": url,
+            "limit": limit,
+            "scrapeOptions": {
+                "formats": formats,
+                "onlyMainContent": only_main_content,
+            },
+        }
+        
+        if max_depth is not None:
+            payload["maxDepth"] = max_depth
+        if include_paths:
+            payload["includePaths"] = include_paths
+        if exclude_paths:
+            payload["excludePaths"] = exclude_paths
+        if webhook:
+            payload["webhook"] = webhook
+        
+        return await self._request("POST", "/v1/crawl", payload)
+    
+    @traced("firecrawl.crawl_status", kind=CLIENT)
+    async def crawl_status(self, job_id: str) -> Dict[str, Any]:
+        """
+        Get the status (and pages so far) of a crawl job.
+        
+        Args:
+            job_id: Crawl job ID returned by `crawl`
+            
+        Returns:
+            Job status with crawled pages
+        """
+        return await self._request("GET", f"/v1/crawl/{job_id}")
+    
+    @traced("firecrawl.cancel_crawl", kind=CLIENT)
+    async def cancel_crawl(self, job_id: str) -> Dict[str, Any]:
+        """
+        Cancel a running crawl job.
+        
+        Args:
+            job_id: Crawl job ID returned by `crawl`
+            
+        Returns:
+            Cancellation status
+        """
+        return await self._request("DELETE", f"/v1/crawl/{job_id}")
+    
+    @staticmethod
+    def webhook_config(
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        events: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Webhook settings for `crawl` / `batch_scrape`.
+        
+        Firecrawl echoes `headers` and `metadata` back on every event, which
+        lets the receiver authenticate and route events.
+        
+        Args:
+            url: Receiver URL
+            headers: Extra headers sent with each event
+            metadata: Data included in each event payload
+            events: Event types (started, page, completed, failed)
+        """
+        webhook: Dict[str, Any] = {
+            "url": url,
+            "events": events or ["started", "page", "completed", "failed"],
+        }
+        if headers:
+            webhook["headers"] = headers
+        if metadata:
+            webhook["metadata"] = metadata
+        return webhook
+    
+    async def _request(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        await self._acquire()
+        async with httpx.AsyncClient(timeout=remaining_timeout(self.timeout)) as client:
+            response = await client.request(
+                method,
+                f"{self.base_url}{path}",
+                json=payload,
+                headers=self._get_headers()
+            )
+            response.raise_for_status()
+            return await self._decode(response)
     
+    @traced("firecrawl.map_site", kind=CLIENT)
     async def map_site(
         self,
         url: str,
         limit: int = 100,
         include_subdomains: bool = False,
+        background: bool = False,
     ) -> Dict[str, Any]:
         """
         Map a website to discover all URLs.
@@ -125,25 +387,29 @@ class FirecrawlService:
             url: Starting URL
             limit: Maximum number of URLs to return
             include_subdomains: Include subdomain URLs
+            background: Low-priority call - only spare rate-limit budget is used
             
         Returns:
             List of discovered URLs
         """
+        current_span().set("url", url)
         payload = {
             "url": url,
             "limit": limit,
             "includeSubdomains": include_subdomains,
         }
         
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
+        await self._acquire(background)
+        async with httpx.AsyncClient(timeout=remaining_timeout(self.timeout)) as client:
             response = await client.post(
                 f"{self.base_url}/v1/map",
                 json=payload,
                 headers=self._get_headers()
             )
             response.raise_for_status()
-            return response.json()
+            return await self._decode(response)
     
+    @traced("firecrawl.extract", kind=CLIENT)
     async def extract(
         self,
         urls: List[str],
@@ -164,6 +430,7 @@ class FirecrawlService:
         Returns:
             Extracted structured data
         """
+        current_span().set("url_count", len(urls))
         payload = {
             "urls": urls,
             "prompt": prompt,
@@ -172,20 +439,22 @@ class FirecrawlService:
         if schema:
             payload["schema"] = schema
         
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
+        await self._acquire()
+        async with httpx.AsyncClient(timeout=remaining_timeout(self.timeout)) as client:
             response = await client.post(
                 f"{self.base_url}/v1/extract",
                 json=payload,
                 headers=self._get_headers()
             )
             response.raise_for_status()
-            return response.json()
+            return await self._decode(response)
     
+    @traced("firecrawl.health_check")
     async def health_check(self) -> bool:
-        """Check if Firecrawl service is available."""
-        try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                response = await client.get(f"{self.base_url}/health")
-                return response.status_code == 200
-        except Exception:
-            return False
+        """
+        Check if Firecrawl service is available.
+        
+        Reads the background prober's cached result instead of probing inline.
+        """
+        result = health_prober.get("firecrawl")
+        return result is not None and result.healthy
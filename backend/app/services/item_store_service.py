@@ -0,0 +1,767 @@
+"""
+Item Store Service - Columnar store of extracted items with aggregate queries
+Flattens auto_extract items into typed columns, partitioned by domain and date
+"""
+import asyncio
+import glob
+import logging
+import math
+import os
+import re
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.core.executor import run_cpu
+from app.core.serialization import dumps, loads
+from app.services.boilerplate_service import domain_of
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:  # Pinned in requirements; without it aggregates run in pure Python, in memory
+    pa = pc = pq = None
+
+logger = logging.getLogger(__name__)
+
+NUMBER = "number"
+STRING = "string"
+BOOL = "bool"
+
+# Columns added to every row
+META_TYPES = {
+    "_tenant": STRING,
+    "_domain": STRING,
+    "_url": STRING,
+    "_data_type": STRING,
+    "_ts": NUMBER,
+}
+
+BUCKETS = {"hour": 3600, "day": 86400, "week": 7 * 86400}
+AGGREGATES = ("count", "sum", "avg", "min", "max")  # Plus percentiles: p50, p95, ...
+
+MAX_FIELDS_PER_ITEM = 64
+MAX_STRING_CHARS = 500
+CHUNK_ROWS = 4096  # Rows buffered per partition before packing an Arrow chunk
+MAX_RESULT_ROWS = 10000
+NUM_SUFFIX = "#num"  # Physical column holding the numeric value of a field
+COLUMNS_FILE = "_columns.json"  # Per-tenant column value counts next to the partitions
+
+# "₩12,900", "$19.99", "12,900원", "1,234 reviews" - one number with short affixes
+_NUMERIC = re.compile(r"^(?:[$€£¥₩]|[A-Z]{3})?\s*([-+]?\d[\d,]*(?:\.\d+)?)\s*\D{0,12}$")
+
+
+class ItemQueryError(ValueError):
+    """Raised for an invalid aggregate query (unknown column, metric or bucket)."""
+
+
+def to_number(value: Any) -> Optional[float]:
+    """Numeric value of a number or a number-like string, else None."""
+    if isinstance(value, bool):
+        return float(value)
+    if isinstance(value, (int, float)):
+        return float(value) if math.isfinite(value) else None
+    if isinstance(value, str):
+        match = _NUMERIC.match(value.strip())
+        if match:
+            try:
+                return float(match.group(1).replace(",", ""))
+            except ValueError:
+                return None
+    return None
+
+
+def flatten_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Flatten a nested item into dotted column names ("seller.name").
+
+    Lists of scalars are joined into one string; lists of objects are
+    reduced to their length (`<name>.count`).
+    """
+    flat: Dict[str, Any] = {}
+
+    def walk(node: Dict[str, Any], prefix: str) -> None:
+        for key, value in node.items():
+            if len(flat) >= MAX_FIELDS_PER_ITEM:
+                return
+            name = f"{prefix}{key}".lstrip("_") or "field"  # Leading _ is reserved for meta columns
+            if isinstance(value, dict):
+                walk(value, f"{name}.")
+            elif isinstance(value, list):
+                if all(not isinstance(v, (dict, list)) for v in value):
+                    flat[name] = ", ".join(str(v) for v in value)
+                else:
+                    flat[f"{name}.count"] = len(value)
+            elif value is not None:
+                flat[name] = value
+
+    walk(item, "")
+    return flat
+
+
+def _text(value: Any) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)[:MAX_STRING_CHARS]
+
+
+def _parse_metric(spec: str) -> Tuple[str, Optional[str], Optional[float]]:
+    """Parse a metric spec: "avg:price" → ("avg", "price", None), "p95:price" → ("percentile", "price", 0.95)."""
+    name, _, column = spec.partition(":")
+    name = name.strip().lower()
+    column = column.strip() or None
+    quantile = None
+    if re.fullmatch(r"p\d{1,2}(\.\d+)?", name):
+        quantile = float(name[1:]) / 100
+        name = "percentile"
+    elif name not in AGGREGATES:
+        raise ItemQueryError(f"지원하지 않는 집계: {spec}")
+    if name != "count" and column is None:
+        raise ItemQueryError(f"집계할 컬럼이 필요합니다: {spec}")
+    return name, column, quantile
+
+
+def _percentile(values: List[float], quantile: float) -> Optional[float]:
+    if not values:
+        return None
+    values.sort()
+    position = (len(values) - 1) * quantile
+    low = math.floor(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+def _bucket_label(start: float) -> str:
+    return datetime.fromtimestamp(start, timezone.utc).isoformat()
+
+
+class _Partition:
+    """Rows of one domain and UTC day: Python buffer → Arrow chunks → Parquet files."""
+
+    def __init__(self, domain: str, day: str):
+        self.domain = domain
+        self.day = day
+        self.buffer: Dict[str, List[Any]] = {}
+        self.buffered = 0
+        self.chunks: List[Any] = []  # pa.Table
+        self.chunk_rows = 0
+        self.files: List[Tuple[str, int, Tuple[str, ...]]] = []  # (path, rows, column names)
+        self.file_rows = 0
+        self.flushing = False
+
+    @property
+    def memory_rows(self) -> int:
+        return self.buffered + self.chunk_rows
+
+    @property
+    def rows(self) -> int:
+        return self.memory_rows + self.file_rows
+
+    def append(self, row: Dict[str, Any]) -> None:
+        for name, values in self.buffer.items():
+            values.append(row.get(name))
+        for name, value in row.items():
+            if name not in self.buffer:
+                self.buffer[name] = [None] * self.buffered + [value]
+        self.buffered += 1
+
+
+class ItemStore:
+    """
+    Columnar store of the items `LLMService.auto_extract` returns.
+
+    Items are flattened (see `flatten_item`) and every field is stored
+    twice: as text in the `<name>` column and, when it parses as a number
+    ("₩12,900" → 12900.0), in the `<name>#num` column. Column types are
+    not fixed at ingestion but per tenant, from the values that tenant
+    stored: bool when all are booleans, number when most of them are
+    numeric (the others count as null), else string. One tenant's
+    "가격문의" therefore never turns another tenant's prices into text.
+    Rows also carry the meta columns _tenant, _domain, _url, _data_type
+    and _ts (epoch seconds) and are partitioned by domain and UTC day.
+
+    With pyarrow installed, buffered rows are packed into Arrow chunks and
+    `query` runs vectorized with Arrow compute (group-by, time buckets,
+    t-digest percentiles) over millions of rows. If `directory` is set,
+    partitions are written as Parquet files under
+    `<directory>/domain=<domain>/date=<day>/` once they hold `flush_rows`
+    rows in memory (and on shutdown); queries prune files by domain and
+    date. Without pyarrow, the same queries run in pure Python over the
+    in-memory columns - fine for tens of thousands of rows, but the
+    vectorized performance (millions of rows in well under a second)
+    needs pyarrow.
+
+    At most `max_rows` rows are kept in memory; beyond that the oldest
+    partitions are flushed to disk, or dropped when there is no directory.
+    """
+
+    def __init__(
+        self,
+        directory: str = "",
+        max_rows: int = 1_000_000,
+        flush_rows: int = 50_000,
+        enabled: bool = True,
+    ):
+        if directory and pa is None:
+            logger.warning("pyarrow not installed - item store is in memory only")
+            directory = ""
+        self.directory = directory
+        self.max_rows = max_rows
+        self.flush_rows = flush_rows
+        self.enabled = enabled
+        # tenant -> column -> [values, numeric values, booleans]
+        self._counts: Dict[str, Dict[str, List[int]]] = {}
+        self._partitions: Dict[Tuple[str, str], _Partition] = {}
+        self._flushes: set = set()
+        self.items_added = 0
+        self.dropped_rows = 0
+        self.queries = 0
+
+    @property
+    def engine(self) -> str:
+        return "arrow" if pa is not None else "python"
+
+    def columns(self, tenant_id: str) -> Dict[str, str]:
+        """A tenant's item columns and their types (meta columns excluded)."""
+        columns = {}
+        for name, (values, numeric, booleans) in self._counts.get(tenant_id, {}).items():
+            if booleans == values:
+                columns[name] = BOOL
+            elif numeric * 2 > values:
+                columns[name] = NUMBER
+            else:
+                columns[name] = STRING
+        return columns
+
+    # Ingestion
+
+    def add(self, tenant_id: str, url: str, data_type: str, extracted: Dict[str, Any]) -> int:
+        """
+        Store the `items` of one auto_extract result.
+
+        Returns:
+            Number of rows added
+        """
+        items = extracted.get("items") if isinstance(extracted, dict) else None
+        if not self.enabled or not isinstance(items, list):
+            return 0
+        now = time.time()
+        domain = domain_of(url)
+        partition = self._partition(domain, datetime.fromtimestamp(now, timezone.utc).strftime("%Y-%m-%d"))
+        meta = {
+            "_tenant": tenant_id,
+            "_domain": domain,
+            "_url": url,
+            "_data_type": extracted.get("detected_type") or data_type,
+            "_ts": now,
+        }
+        counts = self._counts.setdefault(tenant_id, {})
+        added = 0
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            row = dict(meta)
+            for name, value in flatten_item(item).items():
+                number = to_number(value)
+                row[name] = _text(value)
+                if number is not None:
+                    row[name + NUM_SUFFIX] = number
+                count = counts.get(name)
+                if count is None:
+                    count = counts[name] = [0, 0, 0]
+                count[0] += 1
+                count[1] += number is not None
+                count[2] += isinstance(value, bool)
+            partition.append(row)
+            added += 1
+        self.items_added += added
+
+        if pa is not None and partition.buffered >= CHUNK_ROWS:
+            self._pack(partition)
+        self._enforce_limits(partition)
+        return added
+
+    def _partition(self, domain: str, day: str) -> _Partition:
+        partition = self._partitions.get((domain, day))
+        if partition is None:
+            partition = self._partitions[(domain, day)] = _Partition(domain, day)
+        return partition
+
+    @staticmethod
+    def _arrow_schema(names: Sequence[str]) -> Any:
+        def arrow_type(name: str) -> Any:
+            if name.endswith(NUM_SUFFIX) or META_TYPES.get(name) == NUMBER:
+                return pa.float64()
+            return pa.string()
+
+        return pa.schema([(name, arrow_type(name)) for name in names])
+
+    def _buffer_table(self, buffer: Dict[str, List[Any]], rows: int) -> Any:
+        schema = self._arrow_schema(list(buffer))
+        return pa.Table.from_arrays(
+            [pa.array(buffer[field.name][:rows], type=field.type) for field in schema], schema=schema
+        )
+
+    def _pack(self, partition: _Partition) -> None:
+        """Move the Python row buffer into an Arrow chunk."""
+        if not partition.buffered:
+            return
+        partition.chunks.append(self._buffer_table(partition.buffer, partition.buffered))
+        partition.chunk_rows += partition.buffered
+        partition.buffer = {}
+        partition.buffered = 0
+
+    def _enforce_limits(self, current: _Partition) -> None:
+        if self.directory and current.memory_rows >= self.flush_rows:
+            self._schedule_flush(current)
+        in_memory = sum(p.memory_rows for p in self._partitions.values())
+        if in_memory <= self.max_rows:
+            return
+        for key in sorted(self._partitions, key=lambda k: k[1]):  # Oldest day first
+            partition = self._partitions[key]
+            if partition is current or not partition.memory_rows:
+                continue
+            in_memory -= partition.memory_rows
+            if self.directory:
+                self._schedule_flush(partition)
+            else:
+                self.dropped_rows += partition.memory_rows
+                del self._partitions[key]
+            if in_memory <= self.max_rows:
+                return
+
+    # Parquet partitions
+
+    def _schedule_flush(self, partition: _Partition) -> None:
+        if partition.flushing:
+            return
+        try:
+            task = asyncio.get_running_loop().create_task(self._flush(partition))
+        except RuntimeError:  # No event loop (scripts): flush on shutdown instead
+            return
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, partition: _Partition) -> None:
+        """Write a partition's in-memory rows as one Parquet file."""
+        if partition.flushing:
+            return
+        self._pack(partition)
+        chunks = list(partition.chunks)
+        if not chunks:
+            return
+        partition.flushing = True
+        directory = os.path.join(self.directory, f"domain={partition.domain}", f"date={partition.day}")
+        path = os.path.join(directory, f"part-{uuid.uuid4().hex[:12]}.parquet")
+        try:
+            table = await asyncio.to_thread(self._write, chunks, directory, path)
+        except Exception as e:
+            logger.warning("Item store flush to %s failed: %s", path, e)
+            return
+        finally:
+            partition.flushing = False
+        # Rows appended while writing stay in memory
+        partition.chunks = partition.chunks[len(chunks):]
+        partition.chunk_rows -= table.num_rows
+        partition.files.append((path, table.num_rows, tuple(table.column_names)))
+        partition.file_rows += table.num_rows
+
+    @staticmethod
+    def _write(chunks: List[Any], directory: str, path: str) -> Any:
+        table = pa.concat_tables(chunks, promote_options="permissive")
+        os.makedirs(directory, exist_ok=True)
+        pq.write_table(table, path)
+        return table
+
+    def load(self) -> int:
+        """
+        Register the Parquet files under `directory` (on startup).
+
+        Returns:
+            Number of files found
+        """
+        if not self.directory:
+            return 0
+        found = 0
+        for path in glob.glob(os.path.join(self.directory, "domain=*", "date=*", "*.parquet")):
+            day_dir = os.path.dirname(path)
+            domain = os.path.basename(os.path.dirname(day_dir)).split("=", 1)[1]
+            day = os.path.basename(day_dir).split("=", 1)[1]
+            try:
+                metadata = pq.read_metadata(path)
+                schema = pq.read_schema(path)
+            except Exception as e:
+                logger.warning("Skipping unreadable item partition %s: %s", path, e)
+                continue
+            partition = self._partition(domain, day)
+            partition.files.append((path, metadata.num_rows, tuple(schema.names)))
+            partition.file_rows += metadata.num_rows
+            found += 1
+        columns_path = os.path.join(self.directory, COLUMNS_FILE)
+        if os.path.exists(columns_path):
+            with open(columns_path, "rb") as f:
+                self._counts = loads(f.read())
+        return found
+
+    async def flush(self) -> None:
+        """Write all in-memory rows to Parquet (on shutdown)."""
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+        if not self.directory:
+            return
+        for partition in list(self._partitions.values()):
+            await self._flush(partition)
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, COLUMNS_FILE), "wb") as f:
+            f.write(dumps(self._counts))
+
+    # Queries
+
+    async def query(
+        self,
+        tenant_id: str,
+        metrics: Sequence[str] = ("count",),
+        group_by: Sequence[str] = (),
+        bucket: Optional[str] = None,
+        domain: Optional[str] = None,
+        data_type: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: int = 1000,
+    ) -> Dict[str, Any]:
+        """
+        Aggregate a tenant's items.
+
+        Args:
+            tenant_id: Only this tenant's rows are read
+            metrics: "count", "count:<col>", "sum|avg|min|max:<col>" or
+                percentiles like "p95:<col>"
+            group_by: Columns to group by (item or meta columns)
+            bucket: Time bucket of the `_ts` column (hour, day, week)
+            domain / data_type / since / until: Row filters (epoch seconds)
+            limit: Maximum groups returned
+
+        Returns:
+            Dict with rows (one per group, sorted by key), scanned_rows,
+            engine and elapsed_ms
+
+        Raises:
+            ItemQueryError: for unknown columns, metrics or buckets
+        """
+        started = time.perf_counter()
+        kinds = {**self.columns(tenant_id), **META_TYPES}
+
+        def physical(column: str, numeric: bool) -> str:
+            """Stored column for a tenant's column: numbers read from `<name>#num`."""
+            kind = kinds.get(column)
+            if kind is None:
+                raise ItemQueryError(f"알 수 없는 컬럼: {column}")
+            if numeric and kind == STRING:
+                raise ItemQueryError(f"숫자 컬럼이 아닙니다: {column}")
+            if column in META_TYPES or not (kind == NUMBER or (numeric and kind == BOOL)):
+                return column
+            return column + NUM_SUFFIX
+
+        parsed = [
+            (name, physical(column, name not in ("count", "min", "max")) if column else None, quantile)
+            for name, column, quantile in [_parse_metric(spec) for spec in metrics]
+        ] or [("count", None, None)]
+        group_columns = [physical(column, False) for column in group_by]
+        if bucket is not None and bucket not in BUCKETS:
+            raise ItemQueryError(f"지원하지 않는 시간 단위: {bucket} (hour, day, week)")
+        limit = max(1, min(limit, MAX_RESULT_ROWS))
+
+        since_day = datetime.fromtimestamp(since, timezone.utc).strftime("%Y-%m-%d") if since else None
+        until_day = datetime.fromtimestamp(until, timezone.utc).strftime("%Y-%m-%d") if until else None
+        partitions = [
+            p for p in self._partitions.values()
+            if (domain is None or p.domain == domain)
+            and (since_day is None or p.day >= since_day)
+            and (until_day is None or p.day <= until_day)
+        ]
+        filters = {"tenant_id": tenant_id, "domain": domain, "data_type": data_type, "since": since, "until": until}
+        bucket_seconds = BUCKETS[bucket] if bucket else None
+        rows = sum(p.rows for p in partitions)
+        self.queries += 1
+
+        if pa is not None:
+            needed = list(dict.fromkeys(
+                ["_tenant", "_domain", "_data_type", "_ts"] + group_columns + [m[1] for m in parsed if m[1]]
+            ))
+            # Snapshot on the event loop; ingestion only appends, so the copies stay valid
+            sources = []
+            for p in partitions:
+                sources.extend(("file", path, names) for path, _, names in p.files)
+                sources.extend(("table", chunk, None) for chunk in p.chunks)
+                if p.buffered:
+                    sources.append(("buffer", (dict(p.buffer), p.buffered), None))
+            result = await run_cpu(
+                self._aggregate_arrow, sources, self._arrow_schema(needed), parsed, group_columns,
+                bucket_seconds, filters, limit, size=rows * 100, shared_state=True,
+            )
+        else:
+            sources = [(dict(p.buffer), p.buffered) for p in partitions]
+            result = await run_cpu(
+                self._aggregate_python, sources, parsed, group_columns, bucket_seconds, filters, limit,
+                size=rows * 100, shared_state=True,
+            )
+
+        keys = (["bucket"] if bucket else []) + list(group_by)
+        output = []
+        for key, values in result:
+            row = dict(zip(keys, key))
+            if bucket:
+                row["bucket"] = _bucket_label(row["bucket"])
+            row.update(zip(metrics or ["count"], values))
+            output.append(row)
+        return {
+            "rows": output,
+            "scanned_rows": rows,
+            "engine": self.engine,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+
+    def _aggregate_arrow(
+        self,
+        sources: List[Tuple[str, Any, Optional[Tuple[str, ...]]]],
+        schema: Any,
+        metrics: List[Tuple[str, Optional[str], Optional[float]]],
+        group_by: List[str],
+        bucket_seconds: Optional[int],
+        filters: Dict[str, Any],
+        limit: int,
+    ) -> List[Tuple[tuple, list]]:
+        tables = []
+        for kind, source, names in sources:
+            if kind == "file":
+                table = pq.read_table(source, columns=[f.name for f in schema if f.name in names])
+            elif kind == "buffer":
+                buffer, rows = source
+                table = self._buffer_table({f.name: buffer[f.name] for f in schema if f.name in buffer}, rows)
+            else:
+                table = source
+            tables.append(self._conform(table, schema))
+        table = pa.concat_tables(tables) if tables else schema.empty_table()
+
+        mask = pc.equal(table["_tenant"], filters["tenant_id"])
+        if filters["domain"]:
+            mask = pc.and_(mask, pc.equal(table["_domain"], filters["domain"]))
+        if filters["data_type"]:
+            mask = pc.and_(mask, pc.equal(table["_data_type"], filters["data_type"]))
+        if filters["since"]:
+            mask = pc.and_(mask, pc.greater_equal(table["_ts"], filters["since"]))
+        if filters["until"]:
+            mask = pc.and_(mask, pc.less(table["_ts"], filters["until"]))
+        table = table.filter(mask)
+
+        keys = list(group_by)
+        if bucket_seconds:
+            start = pc.multiply(pc.floor(pc.divide(table["_ts"], float(bucket_seconds))), float(bucket_seconds))
+            table = table.append_column("\x00bucket", start)
+            keys.insert(0, "\x00bucket")
+
+        aggregations = []
+        for name, column, quantile in metrics:
+            if name == "count":
+                aggregations.append((column or "_ts", "count"))
+            elif name == "avg":
+                aggregations.append((column, "mean"))
+            elif name == "percentile":
+                aggregations.append((column, "tdigest", pc.TDigestOptions(q=[quantile])))
+            else:
+                aggregations.append((column, name))
+        grouped = table.group_by(keys).aggregate(aggregations)
+
+        # Keys come first in newer pyarrow releases, after the aggregates in older ones
+        key_offset = 0 if grouped.column_names[:len(keys)] == keys else len(aggregations)
+        value_offset = len(keys) if key_offset == 0 else 0
+        key_columns = [grouped.column(key_offset + i).to_pylist() for i in range(len(keys))]
+        values = [grouped.column(value_offset + i).to_pylist() for i in range(len(aggregations))]
+        result = []
+        for row in range(grouped.num_rows):
+            key = tuple(column[row] for column in key_columns)
+            row_values = []
+            for (name, _, _), column in zip(metrics, values):
+                value = column[row]
+                if name == "percentile" and isinstance(value, list):  # Grouped t-digest returns a list
+                    value = value[0] if value else None
+                row_values.append(value)
+            result.append((key, row_values))
+        return self._sort(result)[:limit]
+
+    @staticmethod
+    def _conform(table: Any, schema: Any) -> Any:
+        """Select the schema's columns, adding nulls for missing or mistyped ones."""
+        arrays = []
+        for field in schema:
+            if field.name in table.column_names:
+                column = table[field.name]
+                if column.type != field.type:
+                    try:
+                        column = column.cast(field.type)
+                    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                        column = pa.nulls(table.num_rows, field.type)
+            else:
+                column = pa.nulls(table.num_rows, field.type)
+            arrays.append(column)
+        return pa.Table.from_arrays(arrays, schema=schema)
+
+    @classmethod
+    def _aggregate_python(
+        cls,
+        sources: List[Tuple[Dict[str, List[Any]], int]],
+        metrics: List[Tuple[str, Optional[str], Optional[float]]],
+        group_by: List[str],
+        bucket_seconds: Optional[int],
+        filters: Dict[str, Any],
+        limit: int,
+    ) -> List[Tuple[tuple, list]]:
+        value_columns = list(dict.fromkeys(column for _, column, _ in metrics if column))
+        groups: Dict[tuple, Tuple[List[int], List[List[Any]]]] = {}
+        tenant_id, domain, data_type = filters["tenant_id"], filters["domain"], filters["data_type"]
+        since, until = filters["since"], filters["until"]
+
+        for columns, rows in sources:
+            tenants, domains, types, stamps = (
+                columns["_tenant"], columns["_domain"], columns["_data_type"], columns["_ts"]
+            )
+            keys = [columns.get(column) for column in group_by]
+            values = [columns.get(column) for column in value_columns]
+            for i in range(rows):
+                if tenants[i] != tenant_id:
+                    continue
+                if (domain and domains[i] != domain) or (data_type and types[i] != data_type):
+                    continue
+                ts = stamps[i]
+                if (since and ts < since) or (until and ts >= until):
+                    continue
+                key = tuple(column[i] if column is not None else None for column in keys)
+                if bucket_seconds:
+                    key = (math.floor(ts / bucket_seconds) * float(bucket_seconds),) + key
+                group = groups.get(key)
+                if group is None:
+                    group = groups[key] = ([0], [[] for _ in value_columns])
+                group[0][0] += 1
+                for collected, column in zip(group[1], values):
+                    if column is not None and column[i] is not None:
+                        collected.append(column[i])
+
+        result = []
+        for key, (count, collected) in groups.items():
+            row_values = []
+            for name, column, quantile in metrics:
+                values = collected[value_columns.index(column)] if column else None
+                if name == "count":
+                    row_values.append(count[0] if column is None else len(values))
+                elif not values:
+                    row_values.append(None)
+                elif name == "sum":
+                    row_values.append(sum(values))
+                elif name == "avg":
+                    row_values.append(sum(values) / len(values))
+                elif name == "min":
+                    row_values.append(min(values))
+                elif name == "max":
+                    row_values.append(max(values))
+                else:
+                    row_values.append(_percentile(list(values), quantile))
+            result.append((key, row_values))
+        return cls._sort(result)[:limit]
+
+    @staticmethod
+    def _sort(result: List[Tuple[tuple, list]]) -> List[Tuple[tuple, list]]:
+        # Columns are typed, so only None needs care (it sorts first)
+        return sorted(result, key=lambda row: tuple((v is not None, v) for v in row[0]))
+
+    async def summarize(
+        self,
+        tenant_id: str,
+        domain: Optional[str] = None,
+        data_type: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        max_columns: int = 8,
+    ) -> Dict[str, Any]:
+        """
+        Compact aggregate profile of a tenant's items for insight prompts:
+        per-column statistics, a daily trend and top categories.
+        """
+        scope = {"domain": domain, "data_type": data_type, "since": since, "until": until}
+        columns = self.columns(tenant_id)
+        numeric = [c for c, kind in columns.items() if kind == NUMBER]
+        categorical = [c for c, kind in columns.items() if kind == STRING]
+
+        totals = await self.query(tenant_id, ["count", "min:_ts", "max:_ts"] + [f"count:{c}" for c in numeric], **scope)
+        if not totals["rows"] or not totals["rows"][0]["count"]:
+            return {"item_count": 0}
+        overall = totals["rows"][0]
+        numeric = sorted((c for c in numeric if overall[f"count:{c}"]), key=lambda c: -overall[f"count:{c}"])
+        numeric = numeric[:max_columns]
+
+        metrics = [f"{m}:{c}" for c in numeric for m in ("avg", "min", "p50", "p95", "max")]
+        stats = (await self.query(tenant_id, metrics, **scope))["rows"][0] if numeric else {}
+        daily = await self.query(
+            tenant_id, ["count"] + [f"avg:{c}" for c in numeric[:3]], bucket="day", **scope
+        )
+        domains = await self.query(tenant_id, ["count"], group_by=["_domain"], **scope)
+
+        categories = {}
+        for column in categorical:
+            if len(categories) >= max_columns // 2:
+                break
+            grouped = await self.query(
+                tenant_id, ["count"] + [f"avg:{c}" for c in numeric[:1]], group_by=[column], limit=51, **scope
+            )
+            # Low-cardinality text columns only (categories, sellers, brands)
+            if 1 < len(grouped["rows"]) <= 50:
+                top = sorted(grouped["rows"], key=lambda row: -row["count"])[:10]
+                categories[column] = top
+
+        def rounded(value: Any) -> Any:
+            return round(value, 2) if isinstance(value, float) else value
+
+        return {
+            "item_count": overall["count"],
+            "from": _bucket_label(overall["min:_ts"]),
+            "to": _bucket_label(overall["max:_ts"]),
+            "domains": {row["_domain"]: row["count"] for row in domains["rows"]},
+            "numeric": {
+                column: {
+                    "count": overall[f"count:{column}"],
+                    **{m: rounded(stats[f"{m}:{column}"]) for m in ("avg", "min", "p50", "p95", "max")},
+                }
+                for column in numeric
+            },
+            "daily": [{k: rounded(v) for k, v in row.items()} for row in daily["rows"][-31:]],
+            "categories": {
+                column: [{k: rounded(v) for k, v in row.items()} for row in rows]
+                for column, rows in categories.items()
+            },
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "engine": self.engine,
+            "directory": self.directory or None,
+            "partitions": len(self._partitions),
+            "rows": sum(p.rows for p in self._partitions.values()),
+            "rows_in_memory": sum(p.memory_rows for p in self._partitions.values()),
+            "files": sum(len(p.files) for p in self._partitions.values()),
+            "tenants": len(self._counts),
+            "columns": len({name for counts in self._counts.values() for name in counts}),
+            "items_added": self.items_added,
+            "dropped_rows": self.dropped_rows,
+            "queries": self.queries,
+        }
+
+
+item_store = ItemStore(
+    directory=settings.ITEM_STORE_DIR,
+    max_rows=settings.ITEM_STORE_MAX_ROWS,
+    flush_rows=settings.ITEM_STORE_FLUSH_ROWS,
+    enabled=settings.ITEM_STORE_ENABLED,
+)
@@ -7,100 +7,43 @@ import httpx
 from typing import Optional, Dict, Any, List
 
 from app.core.config import settings
+from app.core.deadline import remaining_timeout
+from app.core.tracing import CLIENT, current_span, traced, traceparent
+from app.core.executor import approx_size, run_cpu
+from app.core.serialization import dumps_str, loads
+from app.services.health_service import health_prober
+from app.services.prompt_service import get_prompt, serialize_for_prompt
+from app.services.rate_limit_service import rate_limiter
+from app.services.retrieval_service import schema_terms, select_relevant
+from app.services.token_service import (
+    cached_prompt_tokens,
+    estimate_tokens,
+    token_estimator,
+    token_ledger,
+    truncate_to_tokens,
+    with_estimator_factor,
+)
 
 
-# Prompt templates for Korean market
-EXTRACTION_PROMPT_TEMPLATE = """당신은 웹 데이터 추출 전문가입니다.
-다음 웹페이지 콘텐츠에서 {data_type} 데이터를 추출해주세요.
-
-웹페이지 콘텐츠:
-{content}
-
-{schema_instruction}
-
-JSON 형식으로만 응답해주세요. 다른 설명은 필요 없습니다.
-"""
-
-AUTO_EXTRACT_PROMPT = """당신은 웹 데이터 분석 전문가입니다.
-다음 웹페이지 콘텐츠를 분석하여 주요 데이터를 구조화된 JSON으로 추출해주세요.
-
-웹페이지 콘텐츠:
-{content}
-
-데이터 유형 힌트: {data_type}
-
-다음 형식으로 응답해주세요:
-{{
-    "detected_type": "감지된 데이터 유형",
-    "items": [추출된 항목들],
-    "metadata": {{
-        "source_type": "ecommerce|news|blog|etc",
-        "item_count": 숫자,
-        "language": "ko|en"
-    }}
-}}
-
-JSON 형식으로만 응답해주세요.
-"""
-
-INSIGHT_PROMPT_TEMPLATE = """당신은 {data_type} 데이터 분석 전문가입니다.
-다음 데이터를 분석하여 인사이트를 생성해주세요.
-
-데이터:
-{data}
-
-분석 유형: {analysis_type}
-
-다음 형식으로 응답해주세요:
-{{
-    "summary": "핵심 요약 (2-3문장)",
-    "key_findings": ["주요 발견 1", "주요 발견 2", "주요 발견 3"],
-    "trends": ["트렌드 1", "트렌드 2"],
-    "recommendations": ["추천 액션 1", "추천 액션 2"],
-    "risk_factors": ["리스크 요인들"],
-    "confidence_score": 0.0-1.0 사이의 신뢰도
-}}
-
-JSON 형식으로만 응답해주세요.
-"""
-
-REPORT_PROMPT_TEMPLATE = """당신은 비즈니스 리포트 작성 전문가입니다.
-다음 데이터와 분석 결과를 바탕으로 {report_type} 리포트를 작성해주세요.
-
-데이터:
-{data}
-
-언어: {language}
-리포트 유형: {report_type}
-
-마크다운 형식으로 보기 좋은 리포트를 작성해주세요.
-섹션은 다음을 포함해야 합니다:
-1. 요약 (Executive Summary)
-2. 주요 발견 (Key Findings)
-3. 상세 분석 (Detailed Analysis)
-4. 추천 사항 (Recommendations)
-5. 결론 (Conclusion)
-"""
-
-COMPARE_PROMPT_TEMPLATE = """당신은 데이터 비교 분석 전문가입니다.
-다음 데이터셋들을 비교 분석해주세요.
-
-{data_description}
-
-비교 유형: {comparison_type}
-
-다음 형식으로 응답해주세요:
-{{
-    "comparison_summary": "비교 요약",
-    "similarities": ["공통점들"],
-    "differences": ["차이점들"],
-    "highlights": ["주목할 포인트들"],
-    "winner": "특정 기준에서의 우위 (해당시)",
-    "detailed_comparison": {{}}
-}}
-
-JSON 형식으로만 응답해주세요.
-"""
+def _split_sections(markdown: str) -> Dict[str, str]:
+    """Split a markdown report into `## ` sections."""
+    sections = {}
+    current_section = "intro"
+    current_content = []
+    
+    for line in markdown.split("\n"):
+        if line.startswith("## "):
+            if current_content:
+                sections[current_section] = "\n".join(current_content)
+            current_section = line[3:].strip().lower().replace(" ", "_")
+            current_content = []
+        else:
+            current_content.append(line)
+    
+    if current_content:
+        sections[current_section] = "\n".join(current_content)
+    
+    return sections
 
 
 class LLMService:
@@ -117,18 +60,24 @@ class LLMService:
     
     def _get_headers(self) -> Dict[str, str]:
         """Get request headers for OpenRouter."""
-        return {
+        headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
             "HTTP-Referer": "https://webscraping.app",  # Required by OpenRouter
             "X-Title": "WebScraping Automation Builder",
         }
+        trace_header = traceparent()
+        if trace_header:
+            headers["traceparent"] = trace_header
+        return headers
     
+    @traced("openrouter.chat_completion", kind=CLIENT)
     async def _chat_completion(
         self,
-        messages: List[Dict[str, str]],
+        messages: List[Dict[str, Any]],
         temperature: float = 0.3,
         max_tokens: int = 4000,
+        prompt: Optional[str] = None,
     ) -> str:
         """
         Send chat completion request to OpenRouter.
@@ -137,28 +86,75 @@ class LLMService:
             messages: Chat messages
             temperature: Response randomness (0-1)
             max_tokens: Maximum response tokens
+            prompt: Registry key of the prompt ("extraction@v2"), for usage accounting
             
         Returns:
             LLM response text
         """
+        health_prober.ensure_available("openrouter")
+        
+        # Pre-flight budget check: estimated prompt + worst-case completion
+        estimated_prompt_tokens = token_estimator.estimate_messages(messages, self.model)
+        token_ledger.check_budget(estimated_prompt_tokens + max_tokens)
+        await rate_limiter.acquire("openrouter", self.api_key)
+        
+        timeout = remaining_timeout(self.timeout)
+        if timeout < self.timeout:
+            # Only ask for what can be generated before the request deadline
+            affordable = int((timeout - settings.LLM_FIRST_TOKEN_SECONDS) * settings.LLM_TOKENS_PER_SECOND)
+            max_tokens = max(min(max_tokens, affordable), 64)
+        
         payload = {
             "model": self.model,
             "messages": messages,
             "temperature": temperature,
             "max_tokens": max_tokens,
+            "usage": {"include": True},  # Ask OpenRouter to report cost
         }
+        span = current_span()
+        span.set_attributes(
+            model=self.model, prompt=prompt, max_tokens=max_tokens,
+            estimated_prompt_tokens=estimated_prompt_tokens,
+        )
         
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
+        async with httpx.AsyncClient(timeout=timeout) as client:
             response = await client.post(
                 f"{self.base_url}/chat/completions",
                 json=payload,
                 headers=self._get_headers()
             )
             response.raise_for_status()
-            data = response.json()
+            data = await run_cpu(loads, response.content, size=len(response.content))
+            
+            usage = data.get("usage") or {}
+            span.set_attributes(
+                bytes=len(response.content),
+                prompt_tokens=usage.get("prompt_tokens"),
+                cached_tokens=cached_prompt_tokens(usage),
+                completion_tokens=usage.get("completion_tokens"),
+                cost=usage.get("cost"),
+            )
+            token_ledger.record(
+                model=self.model,
+                usage=usage,
+                estimated_prompt_tokens=estimated_prompt_tokens,
+                prompt=prompt,
+            )
             
             return data["choices"][0]["message"]["content"]
     
+    def _content_budget(self, *fixed_parts: str, max_tokens: int = 4000) -> int:
+        """
+        Tokens left for variable content once the fixed prompt parts and the
+        completion are reserved, capped by LLM_MAX_PROMPT_TOKENS.
+        """
+        available = min(
+            settings.LLM_CONTEXT_TOKENS - max_tokens,
+            settings.LLM_MAX_PROMPT_TOKENS,
+        )
+        fixed = sum(estimate_tokens(part, self.model) for part in fixed_parts) + 16
+        return max(available - fixed, 256)
+    
     def _parse_json_response(self, response: str) -> Dict[str, Any]:
         """
         Parse JSON from LLM response, handling markdown code blocks.
@@ -170,11 +166,12 @@ class LLMService:
             response = response.split("```")[1].split("```")[0]
         
         try:
-            return json.loads(response.strip())
+            return loads(response.strip())
         except json.JSONDecodeError:
             # Return as-is if parsing fails
             return {"raw_response": response}
     
+    @traced("llm.extract_structured_data")
     async def extract_structured_data(
         self,
         content: str,
@@ -192,23 +189,30 @@ class LLMService:
         Returns:
             Extracted structured data
         """
+        current_span().set("content_chars", len(content))
         schema_instruction = ""
         if schema:
-            schema_instruction = f"추출 결과는 다음 스키마를 따라야 합니다:\n{json.dumps(schema, ensure_ascii=False, indent=2)}"
+            # sort_keys: the same schema must render identically to hit the provider cache
+            schema_instruction = f"스키마:\n{dumps_str(schema, sort_keys=True)}"
         
-        full_prompt = EXTRACTION_PROMPT_TEMPLATE.format(
-            data_type=prompt,
-            content=content[:8000],  # Truncate for token limits
-            schema_instruction=schema_instruction
+        fields = {"data_type": prompt, "schema_instruction": schema_instruction}
+        template = get_prompt("extraction")
+        budget = self._content_budget(*template.fixed_parts(**fields))
+        messages = template.render(
+            self.model,
+            **fields,
+            # Only the blocks relevant to the prompt and schema fields, not the page head
+            content=await run_cpu(
+                with_estimator_factor(select_relevant, self.model), content, prompt, budget,
+                extra_terms=schema_terms(schema), model=self.model, size=len(content)
+            ),
         )
         
-        response = await self._chat_completion([
-            {"role": "system", "content": "당신은 정확한 데이터 추출 전문가입니다. JSON 형식으로만 응답합니다."},
-            {"role": "user", "content": full_prompt}
-        ])
+        response = await self._chat_completion(messages, prompt=template.key)
         
         return self._parse_json_response(response)
     
+    @traced("llm.auto_extract")
     async def auto_extract(
         self,
         content: str,
@@ -224,18 +228,23 @@ class LLMService:
         Returns:
             Extracted data with detected type
         """
-        prompt = AUTO_EXTRACT_PROMPT.format(
-            content=content[:8000],
-            data_type=data_type
+        current_span().set_attributes(content_chars=len(content), data_type=data_type)
+        template = get_prompt("auto_extract")
+        budget = self._content_budget(*template.fixed_parts(data_type=data_type))
+        messages = template.render(
+            self.model,
+            data_type=data_type,
+            content=await run_cpu(
+                with_estimator_factor(truncate_to_tokens, self.model),
+                content, budget, self.model, size=len(content)
+            ),
         )
         
-        response = await self._chat_completion([
-            {"role": "system", "content": "당신은 웹 데이터 분석 전문가입니다. JSON 형식으로만 응답합니다."},
-            {"role": "user", "content": prompt}
-        ])
+        response = await self._chat_completion(messages, prompt=template.key)
         
         return self._parse_json_response(response)
     
+    @traced("llm.generate_insights")
     async def generate_insights(
         self,
         data: Dict[str, Any],
@@ -253,19 +262,23 @@ class LLMService:
         Returns:
             Generated insights
         """
-        prompt = INSIGHT_PROMPT_TEMPLATE.format(
-            data_type=data_type,
-            data=json.dumps(data, ensure_ascii=False, indent=2)[:6000],
-            analysis_type=analysis_type
+        fields = {"data_type": data_type, "analysis_type": analysis_type}
+        template = get_prompt("insight")
+        budget = self._content_budget(*template.fixed_parts(**fields))
+        messages = template.render(
+            self.model,
+            **fields,
+            data=await run_cpu(
+                with_estimator_factor(serialize_for_prompt, self.model),
+                data, budget, self.model, size=approx_size(data)
+            ),
         )
         
-        response = await self._chat_completion([
-            {"role": "system", "content": "당신은 데이터 인사이트 생성 전문가입니다. JSON 형식으로만 응답합니다."},
-            {"role": "user", "content": prompt}
-        ])
+        response = await self._chat_completion(messages, prompt=template.key)
         
         return self._parse_json_response(response)
     
+    @traced("llm.compare_data")
     async def compare_data(
         self,
         data_sets: List[Dict[str, Any]],
@@ -283,23 +296,29 @@ class LLMService:
         Returns:
             Comparison results
         """
+        template = get_prompt("compare")
+        budget = self._content_budget(*template.fixed_parts(comparison_type=comparison_type))
+        per_set_budget = budget // max(len(data_sets), 1)
+        
         data_description = ""
         for i, (data, label) in enumerate(zip(data_sets, labels)):
             data_description += f"\n--- {label} ---\n"
-            data_description += json.dumps(data, ensure_ascii=False, indent=2)[:3000]
+            data_description += await run_cpu(
+                with_estimator_factor(serialize_for_prompt, self.model),
+                data, per_set_budget, self.model, size=approx_size(data)
+            )
         
-        prompt = COMPARE_PROMPT_TEMPLATE.format(
-            data_description=data_description,
-            comparison_type=comparison_type
+        messages = template.render(
+            self.model,
+            comparison_type=comparison_type,
+            data_description=data_description.strip(),
         )
         
-        response = await self._chat_completion([
-            {"role": "system", "content": "당신은 데이터 비교 분석 전문가입니다. JSON 형식으로만 응답합니다."},
-            {"role": "user", "content": prompt}
-        ])
+        response = await self._chat_completion(messages, prompt=template.key)
         
         return self._parse_json_response(response)
     
+    @traced("llm.generate_report")
     async def generate_report(
         self,
         data: Dict[str, Any],
@@ -317,46 +336,39 @@ class LLMService:
         Returns:
             Generated report in markdown format
         """
-        prompt = REPORT_PROMPT_TEMPLATE.format(
-            data=json.dumps(data, ensure_ascii=False, indent=2)[:6000],
-            report_type=report_type,
-            language=language
+        fields = {"report_type": report_type, "language": language}
+        template = get_prompt("report")
+        budget = self._content_budget(*template.fixed_parts(**fields))
+        messages = template.render(
+            self.model,
+            **fields,
+            data=await run_cpu(
+                with_estimator_factor(serialize_for_prompt, self.model),
+                data, budget, self.model, size=approx_size(data)
+            ),
         )
         
-        response = await self._chat_completion([
-            {"role": "system", "content": "당신은 비즈니스 리포트 작성 전문가입니다."},
-            {"role": "user", "content": prompt}
-        ], temperature=0.5)  # Slightly more creative for reports
+        response = await self._chat_completion(
+            messages,
+            temperature=0.5,  # Slightly more creative for reports
+            prompt=template.key,
+        )
         
         # Parse sections from markdown response
-        sections = {}
-        current_section = "intro"
-        current_content = []
-        
-        for line in response.split("\n"):
-            if line.startswith("## "):
-                if current_content:
-                    sections[current_section] = "\n".join(current_content)
-                current_section = line[3:].strip().lower().replace(" ", "_")
-                current_content = []
-            else:
-                current_content.append(line)
-        
-        if current_content:
-            sections[current_section] = "\n".join(current_content)
+        sections = await run_cpu(_split_sections, response, size=len(response))
         
         return {
             "full_report": response,
             "sections": sections
         }
     
+    @traced("llm.health_check")
     async def health_check(self) -> bool:
-        """Check if LLM service is available."""
-        try:
-            response = await self._chat_completion(
-                [{"role": "user", "content": "Hello"}],
-                max_tokens=10
-            )
-            return len(response) > 0
-        except Exception:
-            return False
+        """
+        Check if LLM service is available.
+        
+        Reads the background prober's cached result (a cheap /auth/key probe)
+        instead of spending quota on a chat completion.
+        """
+        result = health_prober.get("openrouter")
+        return result is not None and result.healthy
@@ -0,0 +1,255 @@
+"""
+Pipeline Service - Quick scrape → extract → insights pipeline
+Emits progress events per stage so clients can render partial results
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import httpx
+
+from app.core.deadline import DeadlineExceededError, within_deadline
+from app.core.executor import run_cpu
+from app.services.boilerplate_service import boilerplate_filter
+from app.services.dedup_service import DuplicateMatch, dedup_index, task_key
+from app.services.firecrawl_service import FirecrawlService
+from app.services.item_store_service import item_store
+from app.services.llm_service import LLMService
+from app.services.prefetch_service import prefetcher
+from app.services.rate_limit_service import RateLimitExceededError
+from app.services.render_profile_service import render_profiles
+from app.services.scheduler_service import firecrawl_scheduler, llm_scheduler
+from app.services.token_service import UsageTotals, estimate_tokens, token_ledger
+
+# Receives (event_type, payload) for every progress event
+ProgressCallback = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+PREVIEW_CHARS = 500
+
+# Upstream failures that mean "out of time" rather than "broken" (a rate-limit
+# slot that would not free up before the deadline counts as out of time)
+_TIMEOUT_ERRORS = (
+    DeadlineExceededError, asyncio.TimeoutError, httpx.TimeoutException, RateLimitExceededError,
+)
+
+
+async def _noop(event: str, payload: Dict[str, Any]) -> None:
+    return None
+
+
+class QuickPipeline:
+    """
+    Runs the MVP quick pipeline: scrape → auto_extract → generate_insights.
+
+    Progress events:
+        stage_start  {stage}
+        stage_end    {stage, elapsed_ms, ...sizes and token counts}
+        partial      {stage, ...data available so far}
+        deadline     {stage} - time ran out, later stages were skipped
+
+    When the request deadline (see app.core.deadline) runs out after the
+    scrape, the stages completed so far are returned with `partial=True`
+    instead of failing the whole request.
+    """
+
+    def __init__(self, firecrawl: FirecrawlService, llm: LLMService):
+        self.firecrawl = firecrawl
+        self.llm = llm
+
+    async def run(
+        self,
+        url: str,
+        data_type: str,
+        tenant_id: str,
+        on_event: Optional[ProgressCallback] = None,
+        max_age: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """
+        Run all stages for one URL.
+
+        Args:
+            url: URL to analyze
+            data_type: Data type hint (auto, products, articles, contacts)
+            tenant_id: Tenant for upstream scheduling
+            on_event: Optional async callback for progress events
+            max_age: Oldest cached scrape to reuse, in seconds (None: cache TTL)
+
+        Returns:
+            Dict with extracted_data, insights, raw_content preview,
+            duplicate_of (URL of an already processed near-duplicate page)
+            and partial (True when later stages ran out of time)
+
+        Raises:
+            DeadlineExceededError: if time ran out before the scrape finished
+        """
+        emit = on_event or _noop
+
+        # Step 1: Scrape the page
+        started = await self._start(emit, "scrape")
+        # Cache hits don't queue for a Firecrawl slot
+        scraped = self.firecrawl.cached(url, ["markdown"], max_age=max_age)
+        if scraped is None:
+            scraped = await within_deadline(firecrawl_scheduler.run(
+                tenant_id,
+                self.firecrawl.scrape,
+                url=url,
+                formats=["markdown"],
+                cache_checked=True,
+            ))
+        prefetcher.observe(tenant_id, url)
+        raw_content = scraped.get("markdown", "")
+        # Drop site chrome already seen on other pages of this domain
+        content, boilerplate_removed = boilerplate_filter.strip(url, raw_content)
+        await self._end(
+            emit, "scrape", started,
+            chars=len(raw_content),
+            bytes=len(raw_content.encode("utf-8")),
+            boilerplate_chars_removed=boilerplate_removed,
+            estimated_tokens=estimate_tokens(content),
+        )
+        await emit("partial", {
+            "stage": "scrape",
+            "markdown_preview": raw_content[:PREVIEW_CHARS],
+            "metadata": scraped.get("metadata"),
+        })
+
+        # Step 2: Auto-detect and extract data (reused for near-duplicate pages)
+        started = await self._start(emit, "extract")
+        usage_before = token_ledger.request_totals()
+        try:
+            extracted, duplicate = await self.extract(url, raw_content, content, data_type, tenant_id)
+        except _TIMEOUT_ERRORS:
+            await emit("deadline", {"stage": "extract"})
+            return self._result(raw_content, None, None, None, partial=True)
+        items = extracted.get("items")
+        await self._end(
+            emit, "extract", started,
+            item_count=len(items) if isinstance(items, list) else None,
+            duplicate_of=duplicate.url if duplicate else None,
+            **self._usage_since(usage_before),
+        )
+        await emit("partial", {"stage": "extract", "extracted_data": extracted})
+
+        # Step 3: Generate insights
+        started = await self._start(emit, "insights")
+        usage_before = token_ledger.request_totals()
+        try:
+            insights = await within_deadline(llm_scheduler.run(
+                tenant_id,
+                self.llm.generate_insights,
+                data=extracted,
+                data_type=data_type
+            ))
+        except _TIMEOUT_ERRORS:
+            await emit("deadline", {"stage": "insights"})
+            return self._result(raw_content, extracted, None, duplicate, partial=True)
+        await self._end(emit, "insights", started, **self._usage_since(usage_before))
+
+        return self._result(raw_content, extracted, insights, duplicate)
+
+    async def extract(
+        self,
+        url: str,
+        raw_content: str,
+        content: str,
+        data_type: str,
+        tenant_id: str,
+    ) -> Tuple[Dict[str, Any], Optional[DuplicateMatch]]:
+        """
+        Auto-extract a scraped page, reusing the result of a near-duplicate.
+        Newly extracted items are recorded in the item store.
+
+        Args:
+            url: Page URL
+            raw_content: Scraped markdown (used for the SimHash signature)
+            content: Markdown with boilerplate removed (sent to the LLM)
+            data_type: Data type hint
+            tenant_id: Tenant for upstream scheduling
+
+        Returns:
+            (extracted data, near-duplicate match whose result was reused, or None)
+        """
+        task = task_key("auto_extract", data_type)
+        signature = await run_cpu(
+            dedup_index.signature, raw_content, size=len(raw_content), shared_state=True
+        )
+        reused = dedup_index.reuse(url, signature, task) if signature is not None else None
+        duplicate, extracted = reused or (None, None)
+        if extracted is None:
+            extracted = await within_deadline(llm_scheduler.run(
+                tenant_id,
+                self.llm.auto_extract,
+                content=content,
+                data_type=data_type
+            ))
+            if signature is not None:
+                dedup_index.add(url, signature)
+                dedup_index.put_result(url, task, extracted)
+            items = extracted.get("items")
+            # Tells the render profile whether its content mode keeps the items
+            render_profiles.observe_items(url, len(items) if isinstance(items, list) else 0)
+            # Reused results are not stored again: they already sit under the
+            # original page's URL and time, and would double-count in aggregates
+            item_store.add(tenant_id, url, data_type, extracted)
+        return extracted, duplicate
+
+    async def process_page(
+        self,
+        url: str,
+        raw_content: str,
+        data_type: str,
+        tenant_id: str,
+    ) -> Dict[str, Any]:
+        """
+        Boilerplate stripping, dedup and auto-extraction for a page that was
+        already scraped elsewhere (crawl / batch webhooks).
+
+        Returns:
+            Dict with url, extracted_data and duplicate_of
+        """
+        content, _ = boilerplate_filter.strip(url, raw_content)
+        extracted, duplicate = await self.extract(url, raw_content, content, data_type, tenant_id)
+        return {
+            "url": url,
+            "extracted_data": extracted,
+            "duplicate_of": duplicate.url if duplicate else None,
+        }
+
+    @staticmethod
+    def _result(
+        raw_content: str,
+        extracted: Optional[Dict[str, Any]],
+        insights: Optional[Dict[str, Any]],
+        duplicate: Optional[DuplicateMatch],
+        partial: bool = False,
+    ) -> Dict[str, Any]:
+        return {
+            "extracted_data": extracted,
+            "insights": insights,
+            "raw_content": raw_content[:PREVIEW_CHARS] if raw_content else None,
+            "duplicate_of": duplicate.url if duplicate else None,
+            "partial": partial,
+        }
+
+    @staticmethod
+    def _usage_since(before: UsageTotals) -> Dict[str, Any]:
+        after = token_ledger.request_totals()
+        return {
+            "prompt_tokens": after.prompt_tokens - before.prompt_tokens,
+            "completion_tokens": after.completion_tokens - before.completion_tokens,
+            "cached_tokens": after.cached_tokens - before.cached_tokens,
+            "cost": round(after.cost - before.cost, 6),
+        }
+
+    @staticmethod
+    async def _start(emit: ProgressCallback, stage: str) -> float:
+        await emit("stage_start", {"stage": stage})
+        return time.perf_counter()
+
+    @staticmethod
+    async def _end(emit: ProgressCallback, stage: str, started: float, **sizes: Any) -> None:
+        await emit("stage_end", {
+            "stage": stage,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+            **sizes,
+        })
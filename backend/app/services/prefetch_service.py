@@ -0,0 +1,303 @@
+"""
+Prefetch Service - Predictive cache warming for likely-next pages
+Uses site maps and tenants' browsing history to scrape ahead in the background
+"""
+import asyncio
+import contextvars
+import logging
+import time
+from collections import Counter, OrderedDict, deque
+from typing import Any, Deque, Dict, List, Set, Tuple
+from urllib.parse import urlsplit
+
+from app.core.config import settings
+from app.services.boilerplate_service import domain_of
+from app.services.cache_service import ScrapeCache, scrape_cache, scrape_key
+from app.services.firecrawl_service import FirecrawlService
+from app.services.rate_limit_service import RateLimitExceededError
+from app.services.scheduler_service import FairScheduler, SchedulerBusyError, firecrawl_scheduler
+
+logger = logging.getLogger(__name__)
+
+# Prefetches use the options of the quick / extract pipelines, so those hit the cache
+PREFETCH_FORMATS = ["markdown"]
+
+MAX_TRACKED = 10000  # Tenants, URLs with transitions and site maps kept in memory
+MAP_RETRY_SECONDS = 60.0  # Back-off after a failed map_site call
+
+
+def _segments(url: str) -> List[str]:
+    return [part for part in urlsplit(url).path.split("/") if part]
+
+
+def _shared_prefix(a: List[str], b: List[str]) -> int:
+    shared = 0
+    for left, right in zip(a, b):
+        if left != right:
+            break
+        shared += 1
+    return shared
+
+
+def _normalize(url: str) -> str:
+    return url.split("#", 1)[0]
+
+
+class Prefetcher:
+    """
+    Scrapes the pages a tenant is likely to request next into the scrape cache.
+
+    Candidates for the page just scraped come from:
+        - navigation learned from history: URL A followed by URL B on the
+          same domain (any tenant) makes B a strong candidate after A;
+        - the domain's site map (`map_site`), ranked by how much of the
+          current path they share, so sibling product / article pages win.
+
+    Prefetches only use spare capacity: a scheduler slot via
+    `FairScheduler.run_background` (nothing queued) and rate-limit budget
+    above `PREFETCH_RATE_RESERVE_RATIO`. They never wait, so they cannot
+    delay interactive requests.
+
+    Hits and waste (prefetched entries that expire unused) are counted per
+    domain. Once `min_samples` prefetches have resolved, a hit rate below
+    `min_hit_rate` switches the domain off for `cooldown` seconds, after
+    which it is explored again with fresh counters.
+    """
+
+    def __init__(
+        self,
+        firecrawl: FirecrawlService,
+        cache: ScrapeCache,
+        scheduler: FairScheduler,
+        enabled: bool = True,
+        max_per_visit: int = 3,
+        max_concurrent: int = 1,
+        history_size: int = 20,
+        map_limit: int = 200,
+        map_ttl: float = 3600.0,
+        min_samples: int = 20,
+        min_hit_rate: float = 0.2,
+        cooldown: float = 3600.0,
+    ):
+        self.firecrawl = firecrawl
+        self.cache = cache
+        self.scheduler = scheduler
+        self.enabled = enabled and cache.enabled
+        self.max_per_visit = max_per_visit
+        self.max_concurrent = max_concurrent
+        self.history_size = history_size
+        self.map_limit = map_limit
+        self.map_ttl = map_ttl
+        self.min_samples = min_samples
+        self.min_hit_rate = min_hit_rate
+        self.cooldown = cooldown
+        self._history: "OrderedDict[str, Deque[str]]" = OrderedDict()
+        self._transitions: "OrderedDict[str, Counter]" = OrderedDict()
+        self._site_maps: "OrderedDict[str, Tuple[float, List[str]]]" = OrderedDict()
+        self._disabled_until: Dict[str, float] = {}
+        self._in_flight: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self.observed = 0
+        self.prefetched = 0
+        self.skipped_busy = 0
+        self.failed = 0
+
+    def observe(self, tenant_id: str, url: str) -> None:
+        """Record an interactive scrape and start warming its likely successors."""
+        if not self.enabled:
+            return
+        self.observed += 1
+        url = _normalize(url)
+        history = self._history.get(tenant_id)
+        if history is None:
+            history = self._history[tenant_id] = deque(maxlen=self.history_size)
+        self._history.move_to_end(tenant_id)
+        if history and history[-1] != url and domain_of(history[-1]) == domain_of(url):
+            self._learn(history[-1], url)
+        history.append(url)
+        self._trim(self._history)
+
+        if not self._domain_active(domain_of(url)):
+            return
+        if len(self._tasks) >= self.max_concurrent:
+            self.skipped_busy += 1
+            return
+        # Fresh context: the caller's deadline and request ID must not apply
+        task = asyncio.create_task(self._warm(tenant_id, url), context=contextvars.Context())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _learn(self, previous: str, url: str) -> None:
+        counts = self._transitions.get(previous)
+        if counts is None:
+            counts = self._transitions[previous] = Counter()
+        self._transitions.move_to_end(previous)
+        counts[url] += 1
+        self._trim(self._transitions)
+
+    @staticmethod
+    def _trim(table: OrderedDict) -> None:
+        while len(table) > MAX_TRACKED:
+            table.popitem(last=False)
+
+    def _domain_active(self, domain: str) -> bool:
+        """Whether prefetching currently pays off on this domain."""
+        now = time.monotonic()
+        disabled_until = self._disabled_until.get(domain)
+        if disabled_until is not None:
+            if now < disabled_until:
+                return False
+            # Cool-down over: explore again with fresh counters
+            del self._disabled_until[domain]
+
+        self.cache.purge_expired()
+        hits = self.cache.prefetch_hits[domain]
+        resolved = hits + self.cache.prefetch_wasted[domain]
+        if resolved >= self.min_samples and hits / resolved < self.min_hit_rate:
+            logger.info(
+                "Prefetch disabled for %s: hit rate %.2f over %d prefetches", domain, hits / resolved, resolved
+            )
+            self._disabled_until[domain] = now + self.cooldown
+            self.cache.reset_domain(domain)
+            return False
+        return True
+
+    async def _warm(self, tenant_id: str, url: str) -> None:
+        try:
+            candidates = await self._candidates(tenant_id, url)
+        except Exception as e:
+            self.failed += 1
+            logger.debug("Prefetch candidate selection failed for %s: %s", url, e)
+            return
+
+        for candidate in candidates:
+            key = scrape_key(candidate, PREFETCH_FORMATS, None)
+            if candidate in self._in_flight or self.cache.contains(key):
+                continue
+            self._in_flight.add(candidate)
+            try:
+                await self.scheduler.run_background(
+                    self.firecrawl.scrape,
+                    url=candidate,
+                    formats=PREFETCH_FORMATS,
+                    background=True,
+                )
+                self.prefetched += 1
+            except (SchedulerBusyError, RateLimitExceededError):
+                # Interactive traffic needs the capacity - try again on the next visit
+                self.skipped_busy += 1
+                return
+            except Exception as e:
+                self.failed += 1
+                logger.debug("Prefetch of %s failed: %s", candidate, e)
+                return
+            finally:
+                self._in_flight.discard(candidate)
+
+    async def _candidates(self, tenant_id: str, url: str) -> List[str]:
+        """Likely next URLs, best first, excluding pages the tenant already saw."""
+        seen = set(self._history.get(tenant_id, ()))
+        scores: Dict[str, float] = {}
+
+        # Learned transitions outrank any structural guess
+        for nxt, count in self._transitions.get(url, Counter()).items():
+            scores[nxt] = 100.0 * count
+
+        domain = domain_of(url)
+        path = _segments(url)
+        for link in await self._site_map(url):
+            if domain_of(link) != domain:
+                continue
+            segments = _segments(link)
+            shared = _shared_prefix(path, segments)
+            if not shared:
+                continue
+            score = shared + (0.5 if len(segments) == len(path) else 0.0)
+            scores[link] = max(scores.get(link, 0.0), score)
+
+        ranked = sorted(
+            (link for link in scores if link != url and link not in seen),
+            key=lambda link: scores[link],
+            reverse=True,
+        )
+        return ranked[:self.max_per_visit]
+
+    async def _site_map(self, url: str) -> List[str]:
+        """Cached `map_site` links of the URL's site (fetched with spare budget only)."""
+        domain = domain_of(url)
+        now = time.monotonic()
+        cached = self._site_maps.get(domain)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+
+        parts = urlsplit(url)
+        try:
+            result = await self.scheduler.run_background(
+                self.firecrawl.map_site,
+                url=f"{parts.scheme}://{parts.netloc}",
+                limit=self.map_limit,
+                background=True,
+            )
+        except (SchedulerBusyError, RateLimitExceededError):
+            return cached[1] if cached else []
+        except Exception as e:
+            logger.debug("map_site failed for %s: %s", domain, e)
+            self._site_maps[domain] = (now + MAP_RETRY_SECONDS, cached[1] if cached else [])
+            return self._site_maps[domain][1]
+
+        links = []
+        for link in result.get("links", []):
+            if isinstance(link, dict):
+                link = link.get("url")
+            if isinstance(link, str):
+                links.append(_normalize(link))
+        self._site_maps[domain] = (now + self.map_ttl, links)
+        self._site_maps.move_to_end(domain)
+        self._trim(self._site_maps)
+        return links
+
+    async def stop(self) -> None:
+        """Cancel running prefetches (on shutdown)."""
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        domains = {}
+        for domain in set(self.cache.prefetched) | set(self._disabled_until):
+            hits = self.cache.prefetch_hits[domain]
+            wasted = self.cache.prefetch_wasted[domain]
+            resolved = hits + wasted
+            disabled_until = self._disabled_until.get(domain, 0.0)
+            domains[domain] = {
+                "prefetched": self.cache.prefetched[domain],
+                "hits": hits,
+                "wasted": wasted,
+                "hit_rate": round(hits / resolved, 3) if resolved else None,
+                "disabled_for_seconds": round(disabled_until - now) if disabled_until > now else 0,
+            }
+        return {
+            "enabled": self.enabled,
+            "observed": self.observed,
+            "prefetched": self.prefetched,
+            "skipped_busy": self.skipped_busy,
+            "failed": self.failed,
+            "running": len(self._tasks),
+            "site_maps": len(self._site_maps),
+            "cache": self.cache.stats(),
+            "domains": domains,
+        }
+
+
+prefetcher = Prefetcher(
+    FirecrawlService(),
+    scrape_cache,
+    firecrawl_scheduler,
+    enabled=settings.PREFETCH_ENABLED,
+    max_per_visit=settings.PREFETCH_MAX_PER_VISIT,
+    min_samples=settings.PREFETCH_MIN_SAMPLES,
+    min_hit_rate=settings.PREFETCH_MIN_HIT_RATE,
+    cooldown=settings.PREFETCH_COOLDOWN_SECONDS,
+)
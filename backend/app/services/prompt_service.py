@@ -0,0 +1,390 @@
+"""
+Prompt Service - Versioned prompt registry and compact data encoding for LLM prompts
+Static prompt prefixes first (provider prefix caching), minified JSON / TSV tables, whole-item truncation
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.core.serialization import dumps_str
+from app.services.token_service import estimate_tokens, truncate_to_tokens
+
+MIN_TABLE_ROWS = 3
+MAX_TABLE_COLUMNS = 30
+MAX_SHRINK_STEPS = 8  # Lists shortened before falling back to a plain cut
+
+Path = Tuple[Any, ...]
+
+
+class _Kept(list):
+    """Leading items of a table list that was shortened; remembers how many were dropped."""
+
+    def __init__(self, items: Sequence[Any], omitted: int):
+        super().__init__(items)
+        self.omitted = omitted
+
+
+def _flatten_row(item: Dict[str, Any], prefix: str = "") -> Dict[str, Any]:
+    row: Dict[str, Any] = {}
+    for key, value in item.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            row.update(_flatten_row(value, f"{name}."))
+        elif isinstance(value, list):
+            row[name] = dumps_str(value)
+        else:
+            row[name] = value
+    return row
+
+
+def _cell(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return " ".join(str(value).split())  # Tabs and newlines would break the row
+
+
+def _as_table(items: Any) -> Optional[Tuple[List[str], List[List[str]]]]:
+    """(columns, rows) when `items` is a list of similar objects, else None."""
+    # A shortened table stays a table however few rows are left
+    min_rows = 1 if isinstance(items, _Kept) else MIN_TABLE_ROWS
+    if not isinstance(items, list) or len(items) < min_rows:
+        return None
+    if not all(isinstance(item, dict) for item in items):
+        return None
+    rows = [_flatten_row(item) for item in items]
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    if not columns or len(columns) > MAX_TABLE_COLUMNS:
+        return None
+    # Homogeneous enough: rows fill at least half of the columns on average
+    if sum(len(row) for row in rows) < len(rows) * len(columns) * 0.5:
+        return None
+    return columns, [[_cell(row.get(column)) for column in columns] for row in rows]
+
+
+def _is_table_position(data: Any, path: Path) -> bool:
+    return path == () or (len(path) == 1 and isinstance(data, dict))
+
+
+def encode_compact(data: Any) -> str:
+    """
+    Token-lean encoding of `data`.
+
+    Minified JSON, except that lists of similar objects at the top level
+    (the data itself or its direct values, e.g. auto_extract `items`) are
+    rendered as TSV tables after the JSON part and referenced as "@<key>".
+    Column names are written once instead of per item, and nested objects
+    become dotted columns ("seller.name").
+    """
+    tables: List[Tuple[str, Tuple[List[str], List[List[str]]], int]] = []
+    head: Any = data
+    if isinstance(data, dict):
+        head = {}
+        for key, value in data.items():
+            table = _as_table(value)
+            if isinstance(value, _Kept) and not value:
+                head[key] = f"...({value.omitted}개 항목 생략)"
+            elif table is None:
+                head[key] = value
+            else:
+                head[key] = f"@{key}"
+                tables.append((str(key), table, getattr(value, "omitted", 0)))
+    else:
+        table = _as_table(data)
+        if table is not None:
+            head = None
+            tables.append(("items", table, getattr(data, "omitted", 0)))
+
+    parts = [] if head is None else [dumps_str(head)]
+    for name, (columns, rows), omitted in tables:
+        note = f", {omitted}행 생략" if omitted else ""
+        parts.append(f"@{name} (TSV, {len(rows)}행{note}):")
+        parts.append("\t".join(columns))
+        parts.extend("\t".join(row) for row in rows)
+    return "\n".join(parts)
+
+
+def _largest_list(node: Any, path: Path, done: set) -> Optional[Tuple[int, Path]]:
+    """(encoded size, path) of the biggest list not yet shortened."""
+    best = None
+    if isinstance(node, dict):
+        children = node.items()
+    elif isinstance(node, list):
+        if node and path not in done:
+            best = (len(dumps_str(node)), path)
+        children = enumerate(node)
+    else:
+        return None
+    for key, child in children:
+        if isinstance(child, (dict, list)):
+            found = _largest_list(child, path + (key,), done)
+            if found is not None and (best is None or found[0] > best[0]):
+                best = found
+    return best
+
+
+def _get(data: Any, path: Path) -> Any:
+    for key in path:
+        data = data[key]
+    return data
+
+
+def _replace(data: Any, path: Path, value: Any) -> Any:
+    """Copy of `data` with the node at `path` replaced (containers on the path are copied)."""
+    if not path:
+        return value
+    if isinstance(data, dict):
+        copy = dict(data)
+    else:
+        copy = _Kept(data, data.omitted) if isinstance(data, _Kept) else list(data)
+    copy[path[0]] = _replace(data[path[0]], path[1:], value)
+    return copy
+
+
+def _shorten(items: List[Any], keep: int, table: bool) -> List[Any]:
+    omitted = len(items) - keep
+    if table:
+        return _Kept(items[:keep], omitted)
+    return items[:keep] + [f"...({omitted}개 항목 생략)"]
+
+
+def serialize_for_prompt(data: Any, max_tokens: int, model: Optional[str] = None) -> str:
+    """
+    Compactly encode `data` (see `encode_compact`) within `max_tokens`.
+
+    Over budget, the biggest lists are shortened by whole items (binary
+    search for the most items that fit) and the number of dropped items is
+    noted, so the prompt never ends in a cut-off object. If other lists
+    are too big as well, each keeps its proportional share of the budget.
+    Only a single item larger than the budget, or data without lists,
+    falls back to a plain token cut.
+    """
+    text = encode_compact(data)
+    tokens = estimate_tokens(text, model)
+    if tokens <= max_tokens:
+        return text
+
+    done: set = set()
+    for _ in range(MAX_SHRINK_STEPS):
+        found = _largest_list(data, (), done)
+        if found is None:
+            break
+        path = found[1]
+        done.add(path)
+        items = _get(data, path)
+        table = _is_table_position(data, path) and _as_table(items) is not None
+        share = len(items) * max_tokens // tokens
+
+        without = encode_compact(_replace(data, path, _shorten(items, 0, table)))
+        if estimate_tokens(without, model) > max_tokens:
+            # Not enough even without this list: keep its share, shorten the next one
+            if share < len(items):
+                data = _replace(data, path, _shorten(items, max(share, 1), table))
+                text = encode_compact(data)
+                tokens = estimate_tokens(text, model)
+            continue
+
+        best = without
+        low, high = 1, min(len(items) - 1, share * 2 + 1)
+        while low <= high:
+            keep = (low + high) // 2
+            encoded = encode_compact(_replace(data, path, _shorten(items, keep, table)))
+            if estimate_tokens(encoded, model) <= max_tokens:
+                best = encoded
+                low = keep + 1
+            else:
+                high = keep - 1
+        if best is without and items:
+            # A single item is over budget: a cut-off item beats none at all
+            text = encode_compact(_replace(data, path, _shorten(items, 1, table)))
+            break
+        return best
+
+    return truncate_to_tokens(text, max_tokens, model)
+
+
+# Versioned prompts
+
+CACHE_CONTROL = {"type": "ephemeral"}
+# Providers do not cache prefixes shorter than this (Anthropic Sonnet/Opus, OpenAI, Gemini)
+CACHE_MIN_TOKENS = 1024
+
+
+def supports_cache_control(model: str) -> bool:
+    """Whether OpenRouter honours explicit `cache_control` breakpoints for `model`."""
+    prefixes = [prefix.strip() for prefix in settings.LLM_CACHE_CONTROL_MODELS.split(",")]
+    return any(prefix and model.startswith(prefix) for prefix in prefixes)
+
+
+def _message(role: str, parts: List[str], breakpoints: List[bool]) -> Dict[str, Any]:
+    if not any(breakpoints):
+        return {"role": role, "content": "\n\n".join(parts)}
+    content = []
+    for text, breakpoint in zip(parts, breakpoints):
+        part: Dict[str, Any] = {"type": "text", "text": text}
+        if breakpoint:
+            part["cache_control"] = CACHE_CONTROL
+        content.append(part)
+    return {"role": role, "content": content}
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    """
+    A versioned prompt laid out for provider prefix caching.
+
+    Messages are ordered from most to least stable: `system` (role,
+    instructions, output format) never changes within a version,
+    `context` holds per-request parameters that repeat across calls (data
+    type, schema), and `content` - the scraped page or data - always comes
+    last. Repeated calls then share the longest possible token prefix,
+    which providers with automatic prefix caching (OpenAI, DeepSeek,
+    Gemini) reuse as is. For models that need explicit breakpoints, each
+    part whose prefix reaches CACHE_MIN_TOKENS is marked with
+    `cache_control`. The static instructions alone are only ~100-200
+    tokens, far below that minimum, so in practice the breakpoint falls
+    after the content: retries and re-extractions of the same page hit
+    the cache, and a long schema in the context is cached on its own.
+
+    Bump `version` whenever the static text changes so usage per
+    `key` in the token ledger stays comparable.
+    """
+    name: str
+    version: int
+    system: str
+    context: str
+    content: str
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}@v{self.version}"
+
+    def fixed_parts(self, **fields: Any) -> List[str]:
+        """Prompt text around the content, for reserving budget (fields not given are left empty)."""
+        values = defaultdict(str, fields)
+        return [self.system, self.context.format_map(values), self.content.format_map(values)]
+
+    def render(self, model: str, **fields: Any) -> List[Dict[str, Any]]:
+        """Chat messages with `fields` filled into the context and content parts."""
+        context = self.context.format(**fields).strip()
+        content = self.content.format(**fields)
+        parts = [self.system, context, content] if context else [self.system, content]
+        breakpoints = [False] * len(parts)
+        if supports_cache_control(model):
+            # Shorter prefixes are never cached, and marking them would only use
+            # up breakpoints (at most 4; Gemini uses the last one)
+            prefix = 0
+            for index, text in enumerate(parts):
+                prefix += estimate_tokens(text, model)
+                breakpoints[index] = prefix >= CACHE_MIN_TOKENS
+        return [
+            _message("system", parts[:1], breakpoints[:1]),
+            _message("user", parts[1:], breakpoints[1:]),
+        ]
+
+
+EXTRACTION_PROMPT = PromptTemplate(
+    name="extraction",
+    version=2,
+    system="""당신은 정확한 데이터 추출 전문가입니다.
+사용자가 제공하는 웹페이지 콘텐츠에서 요청된 데이터를 추출해주세요.
+스키마가 주어지면 추출 결과는 그 스키마를 따라야 합니다.
+
+JSON 형식으로만 응답해주세요. 다른 설명은 필요 없습니다.""",
+    context="추출할 데이터: {data_type}\n{schema_instruction}",
+    content="웹페이지 콘텐츠:\n{content}",
+)
+
+AUTO_EXTRACT_PROMPT = PromptTemplate(
+    name="auto_extract",
+    version=2,
+    system="""당신은 웹 데이터 분석 전문가입니다.
+사용자가 제공하는 웹페이지 콘텐츠를 분석하여 주요 데이터를 구조화된 JSON으로 추출해주세요.
+
+다음 형식으로 응답해주세요:
+{
+    "detected_type": "감지된 데이터 유형",
+    "items": [추출된 항목들],
+    "metadata": {
+        "source_type": "ecommerce|news|blog|etc",
+        "item_count": 숫자,
+        "language": "ko|en"
+    }
+}
+
+JSON 형식으로만 응답해주세요.""",
+    context="데이터 유형 힌트: {data_type}",
+    content="웹페이지 콘텐츠:\n{content}",
+)
+
+INSIGHT_PROMPT = PromptTemplate(
+    name="insight",
+    version=2,
+    system="""당신은 데이터 인사이트 생성 전문가입니다.
+사용자가 제공하는 데이터를 분석하여 인사이트를 생성해주세요.
+
+다음 형식으로 응답해주세요:
+{
+    "summary": "핵심 요약 (2-3문장)",
+    "key_findings": ["주요 발견 1", "주요 발견 2", "주요 발견 3"],
+    "trends": ["트렌드 1", "트렌드 2"],
+    "recommendations": ["추천 액션 1", "추천 액션 2"],
+    "risk_factors": ["리스크 요인들"],
+    "confidence_score": 0.0-1.0 사이의 신뢰도
+}
+
+JSON 형식으로만 응답해주세요.""",
+    context="데이터 유형: {data_type}\n분석 유형: {analysis_type}",
+    content="데이터:\n{data}",
+)
+
+REPORT_PROMPT = PromptTemplate(
+    name="report",
+    version=2,
+    system="""당신은 비즈니스 리포트 작성 전문가입니다.
+사용자가 제공하는 데이터와 분석 결과를 바탕으로 요청된 유형의 리포트를 작성해주세요.
+
+마크다운 형식으로 보기 좋은 리포트를 작성해주세요.
+섹션은 다음을 포함해야 합니다:
+1. 요약 (Executive Summary)
+2. 주요 발견 (Key Findings)
+3. 상세 분석 (Detailed Analysis)
+4. 추천 사항 (Recommendations)
+5. 결론 (Conclusion)""",
+    context="리포트 유형: {report_type}\n언어: {language}",
+    content="데이터:\n{data}",
+)
+
+COMPARE_PROMPT = PromptTemplate(
+    name="compare",
+    version=2,
+    system="""당신은 데이터 비교 분석 전문가입니다.
+사용자가 제공하는 데이터셋들을 비교 분석해주세요.
+
+다음 형식으로 응답해주세요:
+{
+    "comparison_summary": "비교 요약",
+    "similarities": ["공통점들"],
+    "differences": ["차이점들"],
+    "highlights": ["주목할 포인트들"],
+    "winner": "특정 기준에서의 우위 (해당시)",
+    "detailed_comparison": {}
+}
+
+JSON 형식으로만 응답해주세요.""",
+    context="비교 유형: {comparison_type}",
+    content="{data_description}",
+)
+
+
+PROMPTS: Dict[str, PromptTemplate] = {
+    prompt.name: prompt
+    for prompt in (EXTRACTION_PROMPT, AUTO_EXTRACT_PROMPT, INSIGHT_PROMPT, REPORT_PROMPT, COMPARE_PROMPT)
+}
+
+
+def get_prompt(name: str) -> PromptTemplate:
+    """Current version of a registered prompt (KeyError for unknown names); its `key` names usage in the ledger."""
+    return PROMPTS[name]
@@ -0,0 +1,243 @@
+"""
+Rate Limit Service - Cluster-wide upstream rate limiting
+Redis token buckets shared by all replicas, with an in-process fallback
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.deadline import current_deadline
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitExceededError(Exception):
+    """Raised when an upstream slot would not free up within the allowed wait."""
+
+
+# Bucket capacity is per_minute // BURST_DIVISOR: a full bucket on top of the
+# refill rate must not let a window see much more than the per-minute limit
+BURST_DIVISOR = 4
+
+
+# Token bucket, atomically evaluated in Redis. Uses the server clock so all
+# replicas agree on time. Returns the seconds to wait (0 = granted) as a
+# string, because Lua numbers are truncated to integers in replies.
+# `reserve` tokens are left untouched (used by low-priority callers).
+_TOKEN_BUCKET_LUA = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local reserve = tonumber(ARGV[4]) or 0
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens - cost >= reserve then
+    tokens = tokens - cost
+else
+    wait = (cost + reserve - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+class LocalTokenBucket:
+    """
+    In-process token bucket backend.
+
+    Used as the fallback when Redis is unavailable and as a drop-in fake
+    for tests (same `try_acquire` interface as RedisTokenBucket).
+    """
+
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+
+    async def try_acquire(
+        self, key: str, rate: float, capacity: float, cost: float = 1.0, reserve: float = 0.0
+    ) -> float:
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * rate)
+        wait = 0.0
+        if tokens - cost >= reserve:
+            tokens -= cost
+        else:
+            wait = (cost + reserve - tokens) / rate
+        self._buckets[key] = (tokens, now)
+        return wait
+
+
+class RedisTokenBucket:
+    """Token bucket backend shared across replicas through Redis."""
+
+    def __init__(self, redis_url: str = "", client: Optional[Any] = None):
+        """Connects to `redis_url`, or uses an existing asyncio `client` (e.g. fakeredis in tests)."""
+        if client is None:
+            import redis.asyncio as redis
+
+            client = redis.from_url(redis_url, socket_timeout=1.0, socket_connect_timeout=1.0)
+        self._client = client
+        self._script = self._client.register_script(_TOKEN_BUCKET_LUA)
+
+    async def try_acquire(
+        self, key: str, rate: float, capacity: float, cost: float = 1.0, reserve: float = 0.0
+    ) -> float:
+        wait = await self._script(keys=[key], args=[rate, capacity, cost, reserve])
+        return float(wait)
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+class DistributedRateLimiter:
+    """
+    One global budget per upstream and API key for the whole cluster.
+
+    Limits are requests per minute. Buckets hold a burst of a quarter of
+    the limit (at least one call), so any 60 s window sees at most
+    `per_minute + burst` calls instead of twice the limit. When the
+    Redis backend fails, the limiter falls back to an in-process bucket that
+    gets `1 / RATE_LIMIT_EXPECTED_REPLICAS` of the budget, so the cluster
+    stays under the upstream limit, and retries Redis after a cool-down.
+    """
+
+    def __init__(
+        self,
+        backend: Optional[object] = None,
+        limits_per_minute: Optional[Dict[str, int]] = None,
+        expected_replicas: int = 1,
+        max_wait: float = 30.0,
+        redis_retry_after: float = 30.0,
+    ):
+        self.backend = backend
+        self.fallback = LocalTokenBucket()
+        self.limits_per_minute = dict(limits_per_minute or {})
+        self.expected_replicas = max(expected_replicas, 1)
+        self.max_wait = max_wait
+        self.redis_retry_after = redis_retry_after
+        self._backend_down_until = 0.0
+        self.waits = 0
+        self.rejections = 0
+        self.fallback_calls = 0
+        self.spare_denials = 0
+
+    @staticmethod
+    def _key(upstream: str, api_key: str) -> str:
+        key_hash = hashlib.sha1(api_key.encode("utf-8")).hexdigest()[:12] if api_key else "anon"
+        return f"ratelimit:{upstream}:{key_hash}"
+
+    @staticmethod
+    def _burst(per_minute: float) -> float:
+        return max(1.0, per_minute // BURST_DIVISOR)
+
+    async def _try_acquire(self, key: str, per_minute: int, cost: float, reserve_ratio: float = 0.0) -> float:
+        if self.backend is not None and time.monotonic() >= self._backend_down_until:
+            burst = self._burst(per_minute)
+            try:
+                return await self.backend.try_acquire(
+                    key, per_minute / 60.0, burst, cost, burst * reserve_ratio
+                )
+            except Exception as e:
+                self._backend_down_until = time.monotonic() + self.redis_retry_after
+                logger.warning("Rate limit backend unavailable, using local fallback: %s", e)
+
+        self.fallback_calls += 1
+        local_limit = max(per_minute / self.expected_replicas, 1.0)
+        burst = self._burst(local_limit)
+        return await self.fallback.try_acquire(
+            key, local_limit / 60.0, burst, cost, burst * reserve_ratio
+        )
+
+    async def acquire(self, upstream: str, api_key: str = "", cost: float = 1.0) -> None:
+        """
+        Wait until the upstream budget allows one more call.
+
+        Raises:
+            RateLimitExceededError: if the wait would exceed `max_wait`
+                or the request deadline
+        """
+        per_minute = self.limits_per_minute.get(upstream)
+        if not per_minute:
+            return
+
+        key = self._key(upstream, api_key)
+        deadline = time.monotonic() + self.max_wait
+        request_deadline = current_deadline()
+        if request_deadline is not None:
+            deadline = min(deadline, request_deadline.expires_at)
+        while True:
+            wait = await self._try_acquire(key, per_minute, cost)
+            if wait <= 0:
+                return
+            if time.monotonic() + wait > deadline:
+                self.rejections += 1
+                raise RateLimitExceededError(
+                    f"{upstream} 요청 한도 초과: 분당 {per_minute}회 (약 {wait:.0f}초 후 재시도)"
+                )
+            self.waits += 1
+            await asyncio.sleep(wait)
+
+    async def try_acquire_spare(
+        self, upstream: str, api_key: str = "", reserve_ratio: float = 0.5, cost: float = 1.0
+    ) -> bool:
+        """
+        Take one call's budget only if the bucket stays above `reserve_ratio`
+        of its burst capacity afterwards. Never waits.
+
+        Used by background work (prefetch) so it only spends budget that
+        interactive requests are not using.
+        """
+        per_minute = self.limits_per_minute.get(upstream)
+        if not per_minute:
+            return True
+        wait = await self._try_acquire(self._key(upstream, api_key), per_minute, cost, reserve_ratio)
+        if wait > 0:
+            self.spare_denials += 1
+            return False
+        return True
+
+    async def close(self) -> None:
+        if isinstance(self.backend, RedisTokenBucket):
+            await self.backend.close()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "backend": type(self.backend).__name__ if self.backend else None,
+            "backend_available": time.monotonic() >= self._backend_down_until,
+            "limits_per_minute": self.limits_per_minute,
+            "expected_replicas": self.expected_replicas,
+            "waits": self.waits,
+            "rejections": self.rejections,
+            "fallback_calls": self.fallback_calls,
+            "spare_denials": self.spare_denials,
+        }
+
+
+def _create_backend() -> Optional[object]:
+    if not settings.RATE_LIMIT_USE_REDIS:
+        return None
+    try:
+        return RedisTokenBucket(settings.REDIS_URL)
+    except ImportError:
+        logger.warning("redis package not installed - rate limits are per process only")
+        return None
+
+
+rate_limiter = DistributedRateLimiter(
+    backend=_create_backend(),
+    limits_per_minute={
+        "firecrawl": settings.FIRECRAWL_RATE_LIMIT_PER_MINUTE,
+        "openrouter": settings.OPENROUTER_RATE_LIMIT_PER_MINUTE,
+    },
+    expected_replicas=settings.RATE_LIMIT_EXPECTED_REPLICAS,
+    max_wait=settings.RATE_LIMIT_MAX_WAIT_SECONDS,
+)
@@ -0,0 +1,346 @@
+"""
+Render Profile Service - Per-domain adaptive Firecrawl render options
+Learns the shortest waitFor that renders complete pages and how much of the page extraction needs
+"""
+import statistics
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field, replace
+from typing import Any, Deque, Dict, List, Optional
+
+from app.core.config import settings
+from app.services.boilerplate_service import domain_of
+
+WAIT_LEVELS_MS = (0, 500, 1000, 2000, 4000, 8000)
+
+# Content modes, most trimmed first
+MAIN = "main"  # onlyMainContent
+TRIMMED = "trimmed"  # Whole page without site chrome tags
+FULL = "full"  # Whole page
+CONTENT_MODES = (MAIN, TRIMMED, FULL)
+
+COMPLETE_RATIO = 0.5  # Below this share of the domain's median length a render looks incomplete
+RETRY_GAIN = 1.2  # A longer wait must add this much content to count as "was incomplete"
+MODE_ITEM_RATIO = 0.9  # A more trimmed mode may find this share of the best mode's items
+MIN_MODE_SAMPLES = 3
+MAX_TRACKED = 5000  # Domains and URL -> mode entries kept in memory
+
+
+@dataclass
+class RenderOptions:
+    """Firecrawl options for one scrape; `wait_level` / `mode` are None when the caller chose them."""
+    wait_for: Optional[int]
+    only_main_content: bool
+    exclude_tags: Optional[List[str]] = None
+    wait_level: Optional[int] = None
+    mode: Optional[str] = None
+    probe: bool = False  # Shorter wait or other content mode than the learned one
+
+
+@dataclass
+class _DomainProfile:
+    """What has been learned about rendering one domain."""
+    wait_level: int = 0
+    retry_level: int = 0  # Lowest level to retry at while renders stay empty
+    mode: str = MAIN
+    scrapes: int = 0
+    probe_successes: int = 0
+    next_wait_probe: float = 0.0
+    next_mode_probe: float = 0.0
+    lengths: Deque[int] = field(default_factory=lambda: deque(maxlen=20))
+    render_ms: Deque[float] = field(default_factory=lambda: deque(maxlen=50))
+    items: Dict[str, Deque[int]] = field(
+        default_factory=lambda: {mode: deque(maxlen=10) for mode in CONTENT_MODES}
+    )
+    retries: int = 0
+    escalations: int = 0
+    lowered: int = 0
+    probes: int = 0
+
+
+def content_chars(data: Dict[str, Any]) -> Optional[int]:
+    """Length of the rendered markdown, None when it was not requested."""
+    markdown = data.get("markdown")
+    return len(markdown) if isinstance(markdown, str) else None
+
+
+class RenderProfileStore:
+    """
+    Per-domain Firecrawl render options learned from scrape outcomes.
+
+    Options the caller leaves unspecified (None) are filled from the
+    domain's profile:
+        - waitFor: the shortest of WAIT_LEVELS_MS that renders complete
+          pages. A render that is empty or far shorter than the domain's
+          median (`min_chars` until there is one) is retried once at the
+          next level; only if that adds content does the domain's level go
+          up, otherwise the page was just short and its length counts
+          toward the median. While a domain renders only empty pages, each
+          retry starts one level higher than the last, without changing the
+          domain's level until one adds content. Every `probe_every`-th
+          scrape tries one level lower, and after `probe_samples` complete
+          probes the level goes down. A failed probe (retried like any
+          other) pauses probing for `reexplore` seconds.
+        - onlyMainContent / excludeTags: main content, whole page without
+          `chrome_tags`, or whole page. Probes sample the other modes and
+          the item counts extraction reports (`observe_items`) decide: the
+          most trimmed mode that finds nearly as many items as the best
+          one wins. Modes are only probed on domains whose pages go through
+          extraction, and samples of the other modes are dropped and taken
+          again every `reexplore` seconds.
+
+    Background scrapes (prefetch) use the learned options but never
+    probe or retry.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        reexplore: float = 1800.0,
+        probe_every: int = 5,
+        probe_samples: int = 3,
+        min_chars: int = 200,
+        chrome_tags: Optional[List[str]] = None,
+    ):
+        self.enabled = enabled
+        self.reexplore = reexplore
+        self.probe_every = max(probe_every, 3)
+        self.probe_samples = probe_samples
+        self.min_chars = min_chars
+        self.chrome_tags = chrome_tags or []
+        self._profiles: "OrderedDict[str, _DomainProfile]" = OrderedDict()
+        self._url_modes: "OrderedDict[str, str]" = OrderedDict()
+
+    def _profile(self, url: str) -> _DomainProfile:
+        domain = domain_of(url)
+        profile = self._profiles.get(domain)
+        if profile is None:
+            profile = self._profiles[domain] = _DomainProfile()
+        self._profiles.move_to_end(domain)
+        while len(self._profiles) > MAX_TRACKED:
+            self._profiles.popitem(last=False)
+        return profile
+
+    def _mode_options(self, mode: str) -> Dict[str, Any]:
+        if mode == MAIN:
+            return {"only_main_content": True, "exclude_tags": None}
+        if mode == TRIMMED:
+            return {"only_main_content": False, "exclude_tags": list(self.chrome_tags) or None}
+        return {"only_main_content": False, "exclude_tags": None}
+
+    def resolve(
+        self,
+        url: str,
+        only_main_content: Optional[bool] = None,
+        wait_for: Optional[int] = None,
+        exclude_tags: Optional[List[str]] = None,
+        explore: bool = True,
+    ) -> RenderOptions:
+        """Options for a scrape of `url`; None means "use the domain's profile"."""
+        if not self.enabled:
+            return RenderOptions(
+                wait_for=wait_for,
+                only_main_content=True if only_main_content is None else only_main_content,
+                exclude_tags=exclude_tags,
+            )
+
+        profile = self._profile(url)
+        profile.scrapes += 1
+        now = time.monotonic()
+        options = RenderOptions(
+            wait_for=wait_for, only_main_content=bool(only_main_content), exclude_tags=exclude_tags
+        )
+
+        if wait_for is None:
+            level = profile.wait_level
+            if (
+                explore and level > 0 and now >= profile.next_wait_probe
+                and profile.scrapes % self.probe_every == 0
+            ):
+                level -= 1
+                options.probe = True
+            options.wait_level = level
+            options.wait_for = WAIT_LEVELS_MS[level] or None
+
+        if only_main_content is None and exclude_tags is None:
+            mode = profile.mode
+            if explore and not options.probe and profile.scrapes % self.probe_every == self.probe_every // 2:
+                mode = self._mode_probe(profile, now) or mode
+                options.probe = mode != profile.mode
+            options.mode = mode
+            for name, value in self._mode_options(mode).items():
+                setattr(options, name, value)
+        elif only_main_content is None:
+            options.only_main_content = True
+        return options
+
+    def _mode_probe(self, profile: _DomainProfile, now: float) -> Optional[str]:
+        if now < profile.next_mode_probe or not profile.items[profile.mode]:
+            return None  # Paused, or nothing extracts items from this domain
+        unsampled = [
+            mode for mode in CONTENT_MODES
+            if mode != profile.mode and len(profile.items[mode]) < MIN_MODE_SAMPLES
+        ]
+        if unsampled:
+            return unsampled[0]
+        # Every mode is sampled: keep the choice, sample the others again later
+        profile.next_mode_probe = now + self.reexplore
+        for mode in CONTENT_MODES:
+            if mode != profile.mode:
+                profile.items[mode].clear()
+        return None
+
+    def _complete(self, profile: _DomainProfile, chars: int) -> bool:
+        if not profile.lengths:
+            return chars >= self.min_chars
+        # Relative to the domain: sites with genuinely short pages are not retried forever
+        return chars >= COMPLETE_RATIO * statistics.median(profile.lengths)
+
+    def record(
+        self,
+        url: str,
+        options: RenderOptions,
+        data: Dict[str, Any],
+        elapsed_ms: float,
+        allow_retry: bool = True,
+    ) -> Optional[RenderOptions]:
+        """
+        Learn from a finished render.
+
+        Returns:
+            Options for one retry with a longer wait when the render looks
+            incomplete, the wait was chosen by the profile and `allow_retry`
+            is set, else None (the caller then reports the retry through
+            `record_retry`)
+        """
+        if not self.enabled:
+            return None
+        profile = self._profile(url)
+        if options.mode is not None:
+            self._url_modes[url] = options.mode
+            self._url_modes.move_to_end(url)
+            while len(self._url_modes) > MAX_TRACKED:
+                self._url_modes.popitem(last=False)
+
+        chars = content_chars(data)
+        if chars is not None and options.wait_level is not None:
+            if self._complete(profile, chars):
+                self._completed(profile, options, chars)
+            elif allow_retry:
+                # Probes retry at the learned level, everything else one level up
+                level = max(options.wait_level + 1, profile.wait_level, profile.retry_level)
+                if level < len(WAIT_LEVELS_MS):
+                    profile.retries += 1
+                    return replace(options, wait_level=level, wait_for=WAIT_LEVELS_MS[level], probe=False)
+        profile.render_ms.append(elapsed_ms)
+        return None
+
+    def record_retry(
+        self,
+        url: str,
+        first: RenderOptions,
+        first_data: Dict[str, Any],
+        retry: RenderOptions,
+        retry_data: Dict[str, Any],
+        elapsed_ms: float,
+    ) -> Dict[str, Any]:
+        """
+        Compare a retry with the render it replaced; `elapsed_ms` covers both.
+
+        Returns:
+            The more complete of the two results
+        """
+        profile = self._profile(url)
+        profile.render_ms.append(elapsed_ms)
+        first_chars = content_chars(first_data) or 0
+        retry_chars = content_chars(retry_data) or 0
+        gained = retry_chars > first_chars * RETRY_GAIN + self.min_chars / 2
+        if not gained and retry_chars == 0 and retry.wait_level < len(WAIT_LEVELS_MS) - 1:
+            # Still empty: the next retry on this domain starts one level higher
+            profile.retry_level = retry.wait_level + 1
+            return retry_data
+        profile.retry_level = 0
+        if not gained:
+            # No more content with a longer wait: the page is just short, and
+            # its length becomes part of the domain's median
+            self._completed(profile, first, first_chars)
+            return first_data if first_chars >= retry_chars else retry_data
+
+        profile.probe_successes = 0
+        profile.next_wait_probe = time.monotonic() + self.reexplore
+        if retry.wait_level > profile.wait_level:
+            profile.wait_level = retry.wait_level
+            profile.escalations += 1
+        profile.lengths.append(retry_chars)
+        return retry_data
+
+    def _completed(self, profile: _DomainProfile, options: RenderOptions, chars: int) -> None:
+        profile.lengths.append(chars)
+        if options.wait_level is None or options.wait_level >= profile.wait_level:
+            return
+        # A shorter wait rendered the page completely
+        profile.probe_successes += 1
+        if profile.probe_successes >= self.probe_samples:
+            profile.wait_level = options.wait_level
+            profile.probe_successes = 0
+            profile.lowered += 1
+
+    def observe_items(self, url: str, item_count: int) -> None:
+        """Record how many items extraction found on a page scraped with a learned content mode."""
+        mode = self._url_modes.pop(url, None)
+        if mode is None:
+            return
+        profile = self._profile(url)
+        if mode != profile.mode:
+            profile.probes += 1
+        profile.items[mode].append(item_count)
+
+        means = {
+            name: statistics.fmean(counts)
+            for name, counts in profile.items.items()
+            if len(counts) >= MIN_MODE_SAMPLES
+        }
+        if not means:
+            return
+        best = max(means.values())
+        for name in CONTENT_MODES:
+            if name in means and means[name] >= MODE_ITEM_RATIO * best:
+                profile.mode = name
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        domains = {}
+        for domain, profile in self._profiles.items():
+            domains[domain] = {
+                "wait_for_ms": WAIT_LEVELS_MS[profile.wait_level],
+                "mode": profile.mode,
+                "scrapes": profile.scrapes,
+                "median_render_ms": (
+                    round(statistics.median(profile.render_ms)) if profile.render_ms else None
+                ),
+                "median_chars": round(statistics.median(profile.lengths)) if profile.lengths else None,
+                "retries": profile.retries,
+                "escalations": profile.escalations,
+                "lowered": profile.lowered,
+                "mode_probes": profile.probes,
+                "mean_items": {
+                    mode: round(statistics.fmean(counts), 2)
+                    for mode, counts in profile.items.items() if counts
+                },
+            }
+        return {
+            "enabled": self.enabled,
+            "wait_levels_ms": list(WAIT_LEVELS_MS),
+            "chrome_tags": self.chrome_tags,
+            "domains": domains,
+        }
+
+
+render_profiles = RenderProfileStore(
+    enabled=settings.RENDER_PROFILES_ENABLED,
+    reexplore=settings.RENDER_REEXPLORE_SECONDS,
+    probe_every=settings.RENDER_PROBE_EVERY,
+    probe_samples=settings.RENDER_PROBE_SAMPLES,
+    min_chars=settings.RENDER_MIN_CONTENT_CHARS,
+    chrome_tags=[tag.strip() for tag in settings.RENDER_CHROME_TAGS.split(",") if tag.strip()],
+)
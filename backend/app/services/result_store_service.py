@@ -0,0 +1,249 @@
+"""
+Result Store Service - Stored endpoint results addressable by ID
+Content-hash ETags, field projection and cursor pagination over items
+"""
+import base64
+import hashlib
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.core.executor import approx_size, run_cpu
+from app.core.serialization import dumps
+
+
+class ResultNotFoundError(Exception):
+    """Raised when a result ID is unknown, expired or owned by another tenant."""
+
+
+class InvalidCursorError(ValueError):
+    """Raised for a malformed pagination cursor or one issued for another result."""
+
+
+@dataclass
+class StoredResult:
+    """One stored endpoint response."""
+    id: str
+    tenant_id: str
+    kind: str  # Endpoint, e.g. "scraping.quick"
+    body: Dict[str, Any]
+    content_hash: str
+    size: int
+    created_at: float
+    expires_at: float
+    items_path: Optional[Tuple[str, ...]] = None
+
+    @property
+    def items(self) -> Optional[List[Any]]:
+        node: Any = self.body
+        for key in self.items_path or ():
+            node = node.get(key) if isinstance(node, dict) else None
+        return node if self.items_path and isinstance(node, list) else None
+
+
+def _find_items(body: Dict[str, Any]) -> Optional[Tuple[str, ...]]:
+    """Path of the first `items` list (breadth first), e.g. ("extracted_data", "items")."""
+    queue: List[Tuple[Tuple[str, ...], Dict[str, Any]]] = [((), body)]
+    while queue:
+        path, node = queue.pop(0)
+        if isinstance(node.get("items"), list):
+            return path + ("items",)
+        queue.extend((path + (key,), value) for key, value in node.items() if isinstance(value, dict))
+    return None
+
+
+def _split_paths(paths: Optional[Sequence[str]]) -> List[List[str]]:
+    return [path.split(".") for path in paths or () if path]
+
+
+def _include(node: Any, paths: List[List[str]]) -> Any:
+    if not isinstance(node, dict) or any(not path for path in paths):
+        return node
+    selected: Dict[str, Any] = {}
+    for key in dict.fromkeys(path[0] for path in paths):
+        if key in node:
+            selected[key] = _include(node[key], [path[1:] for path in paths if path[0] == key])
+    return selected
+
+
+def _exclude(node: Any, paths: List[List[str]]) -> Any:
+    if not isinstance(node, dict):
+        return node
+    dropped = {path[0] for path in paths if len(path) == 1}
+    nested = [path for path in paths if len(path) > 1]
+    result = {}
+    for key, value in node.items():
+        if key in dropped:
+            continue
+        below = [path[1:] for path in nested if path[0] == key]
+        result[key] = _exclude(value, below) if below else value
+    return result
+
+
+def project(
+    node: Any,
+    fields: Optional[Sequence[str]] = None,
+    exclude: Optional[Sequence[str]] = None,
+) -> Any:
+    """
+    Keep only the dotted `fields` paths of a dict (all when empty), then
+    drop the dotted `exclude` paths, e.g. fields=["url", "extracted_data.items"]
+    or exclude=["raw_content"].
+    """
+    include_paths = _split_paths(fields)
+    if include_paths:
+        node = _include(node, include_paths)
+    exclude_paths = _split_paths(exclude)
+    return _exclude(node, exclude_paths) if exclude_paths else node
+
+
+def encode_cursor(result_id: str, offset: int) -> str:
+    return base64.urlsafe_b64encode(f"{result_id}:{offset}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(result_id: str, cursor: Optional[str]) -> int:
+    """
+    Item offset of a cursor (0 without one).
+
+    Raises:
+        InvalidCursorError: if the cursor is malformed or belongs to another result
+    """
+    if not cursor:
+        return 0
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        owner, offset = raw.rsplit(":", 1)
+        if owner == result_id and int(offset) >= 0:
+            return int(offset)
+    except ValueError:
+        pass
+    raise InvalidCursorError("잘못된 커서입니다")
+
+
+def view_etag(result: StoredResult, *view: Any) -> str:
+    """
+    Strong ETag of one representation of a result.
+
+    Results never change after they are stored, so hashing the content
+    hash together with the view parameters (projection, page) identifies
+    the response bytes without serializing them again.
+    """
+    digest = hashlib.sha256(f"{result.content_hash}|{view!r}".encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """`If-None-Match` check (weak comparison, as RFC 9110 specifies for it)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+class ResultStore:
+    """
+    Stores successful endpoint responses so clients can fetch them again by
+    `result_id` instead of re-running the scrape + LLM pipeline.
+
+    Results are immutable and kept for `ttl` seconds, within `max_entries`
+    and `max_bytes` (least recently read evicted first). Each one is hashed
+    once when stored; read endpoints derive strong ETags from that hash so
+    a dashboard revalidating with `If-None-Match` gets a 304 without the
+    body being serialized.
+    """
+
+    def __init__(self, ttl: float = 86400.0, max_entries: int = 10000, max_bytes: int = 200_000_000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._results: "OrderedDict[str, StoredResult]" = OrderedDict()
+        self._bytes = 0
+        self.stored = 0
+        self.evicted = 0
+        self.reads = 0
+        self.not_modified = 0
+
+    async def put(self, tenant_id: str, kind: str, body: Dict[str, Any]) -> StoredResult:
+        """Store a response body and return its handle."""
+        encoded = await run_cpu(dumps, body, size=approx_size(body))
+        now = time.time()
+        result = StoredResult(
+            id=uuid.uuid4().hex,
+            tenant_id=tenant_id,
+            kind=kind,
+            body=body,
+            content_hash=hashlib.sha256(encoded).hexdigest(),
+            size=len(encoded),
+            created_at=now,
+            expires_at=now + self.ttl,
+            items_path=_find_items(body),
+        )
+        if result.size > self.max_bytes:
+            return result  # Too big to keep (not retrievable)
+        self._results[result.id] = result
+        self._bytes += result.size
+        self.stored += 1
+        self._evict(now)
+        return result
+
+    async def save(self, tenant_id: str, kind: str, response: Any) -> Any:
+        """Store a successful endpoint response model and set its `result_id`."""
+        if getattr(response, "success", False):
+            stored = await self.put(tenant_id, kind, response.model_dump(exclude={"result_id"}))
+            if stored.id in self._results:
+                response.result_id = stored.id
+        return response
+
+    def get(self, tenant_id: str, result_id: str) -> StoredResult:
+        """
+        Raises:
+            ResultNotFoundError: if the result is unknown, expired or another tenant's
+        """
+        result = self._results.get(result_id)
+        if result is None or result.tenant_id != tenant_id:
+            raise ResultNotFoundError(f"결과를 찾을 수 없습니다: {result_id}")
+        if result.expires_at <= time.time():
+            self._remove(result_id)
+            raise ResultNotFoundError(f"결과가 만료되었습니다: {result_id}")
+        self._results.move_to_end(result_id)
+        self.reads += 1
+        return result
+
+    def _remove(self, result_id: str) -> None:
+        result = self._results.pop(result_id, None)
+        if result is not None:
+            self._bytes -= result.size
+
+    def _evict(self, now: float) -> None:
+        while self._results:
+            oldest_id, oldest = next(iter(self._results.items()))
+            if (
+                len(self._results) <= self.max_entries
+                and self._bytes <= self.max_bytes
+                and oldest.expires_at > now
+            ):
+                return
+            self._remove(oldest_id)
+            self.evicted += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "results": len(self._results),
+            "bytes": self._bytes,
+            "stored": self.stored,
+            "evicted": self.evicted,
+            "reads": self.reads,
+            "not_modified": self.not_modified,
+        }
+
+
+result_store = ResultStore(
+    ttl=settings.RESULT_STORE_TTL_SECONDS,
+    max_entries=settings.RESULT_STORE_MAX_ENTRIES,
+    max_bytes=settings.RESULT_STORE_MAX_BYTES,
+)
@@ -0,0 +1,188 @@
+"""
+Retrieval Service - Query-aware selection of page blocks
+BM25 ranking with Korean-aware tokenization to fill prompts with relevant content
+"""
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.services.token_service import estimate_tokens, split_by_tokens, truncate_to_tokens
+
+_WORD_RE = re.compile(r"[가-힣]+|[0-9a-z]+")
+_HANGUL_RE = re.compile(r"[가-힣]+")
+
+MAX_BLOCK_TOKENS = 300
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Index terms for BM25.
+
+    Latin words and numbers are kept whole. Hangul runs become syllable
+    bigrams, so "가격정보" and "가격" share terms without a morphological
+    analyzer (particles such as 은/는/을 only change the last bigram).
+    """
+    terms: List[str] = []
+    for word in _WORD_RE.findall(text.lower()):
+        if _HANGUL_RE.fullmatch(word):
+            if len(word) == 1:
+                terms.append(word)
+            else:
+                terms.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            terms.append(word)
+    return terms
+
+
+# Keys that mark a dict as a JSON schema node rather than an example object
+_SCHEMA_MARKERS = frozenset({"type", "properties", "items", "$schema", "$ref", "enum", "anyOf", "oneOf", "allOf"})
+_SUBSCHEMA_KEYS = ("items", "additionalProperties", "anyOf", "oneOf", "allOf")
+
+
+def schema_terms(schema: Optional[Dict[str, Any]]) -> List[str]:
+    """
+    Field names and descriptions of a JSON schema (or example object).
+
+    Schema keywords (`type`, `format`, `enum`, ...) are not query terms:
+    only names under `properties`, `description` texts and the keys of
+    example objects are.
+    """
+    if not schema:
+        return []
+    words: List[str] = []
+
+    def walk(node: Any) -> None:
+        if isinstance(node, list):
+            for item in node:
+                walk(item)
+            return
+        if not isinstance(node, dict):
+            return
+        if not _SCHEMA_MARKERS.intersection(node):
+            # Example object: every key is a field name
+            for key, value in node.items():
+                words.append(str(key).replace("_", " "))
+                walk(value)
+            return
+        if isinstance(node.get("description"), str):
+            words.append(node["description"])
+        properties = node.get("properties")
+        if isinstance(properties, dict):
+            for name, subschema in properties.items():
+                words.append(str(name).replace("_", " "))
+                walk(subschema)
+        for key in _SUBSCHEMA_KEYS:
+            walk(node.get(key))
+        for key in ("$defs", "definitions"):
+            if isinstance(node.get(key), dict):
+                walk(list(node[key].values()))
+
+    walk(schema)
+    return words
+
+
+def split_blocks(markdown: str, max_block_tokens: int = MAX_BLOCK_TOKENS) -> List[str]:
+    """Blank-line separated blocks, with oversized blocks split further."""
+    blocks: List[str] = []
+    for block in re.split(r"\n\s*\n", markdown):
+        if not block.strip():
+            continue
+        if estimate_tokens(block) > max_block_tokens:
+            blocks.extend(split_by_tokens(block.replace("\n", "\n\n"), max_block_tokens))
+        else:
+            blocks.append(block)
+    return blocks
+
+
+class BM25:
+    """Okapi BM25 over a small in-memory corpus of blocks."""
+
+    def __init__(self, documents: Iterable[List[str]], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.term_freqs = [Counter(doc) for doc in documents]
+        self.lengths = [sum(tf.values()) for tf in self.term_freqs]
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        doc_freq: Counter = Counter()
+        for tf in self.term_freqs:
+            doc_freq.update(tf.keys())
+        n = len(self.term_freqs)
+        self.idf = {
+            term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in doc_freq.items()
+        }
+
+    def scores(self, query: List[str]) -> List[float]:
+        query_terms = [t for t in set(query) if t in self.idf]
+        results = []
+        for tf, length in zip(self.term_freqs, self.lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / self.avg_length) if self.avg_length else self.k1
+            score = 0.0
+            for term in query_terms:
+                freq = tf.get(term)
+                if freq:
+                    score += self.idf[term] * freq * (self.k1 + 1) / (freq + norm)
+            results.append(score)
+        return results
+
+
+def select_relevant(
+    content: str,
+    query: str,
+    max_tokens: int,
+    extra_terms: Optional[List[str]] = None,
+    model: Optional[str] = None,
+) -> str:
+    """
+    Keep the blocks of `content` most relevant to `query` within `max_tokens`.
+
+    Blocks are ranked with BM25 and added best-first while they fit; the
+    first block (usually title / breadcrumb context) is kept when possible.
+    Budget left over is filled with blocks next to the matches, then with
+    the remaining blocks in document order. The result preserves the
+    original block order. Falls back to head truncation when the query
+    matches nothing.
+
+    Args:
+        content: Scraped markdown
+        query: User extraction prompt
+        max_tokens: Token budget for the selected content
+        extra_terms: Additional query text such as schema field names
+        model: Model name for token estimation
+
+    Returns:
+        Selected content
+    """
+    if estimate_tokens(content, model) <= max_tokens:
+        return content
+
+    blocks = split_blocks(content)
+    query_terms = tokenize(" ".join([query, *(extra_terms or [])]))
+    scores = BM25(tokenize(block) for block in blocks).scores(query_terms) if blocks else []
+    if not any(scores):
+        return truncate_to_tokens(content, max_tokens, model)
+
+    sizes = [estimate_tokens(block, model) + 1 for block in blocks]
+    selected = set()
+    used = 0
+    if sizes[0] <= max_tokens // 4:
+        selected.add(0)
+        used += sizes[0]
+
+    for index in sorted(range(len(blocks)), key=lambda i: scores[i], reverse=True):
+        if scores[index] <= 0:
+            break
+        if index in selected or used + sizes[index] > max_tokens:
+            continue
+        selected.add(index)
+        used += sizes[index]
+
+    # Spend the leftover budget too: blocks next to a match first (labels,
+    # table rows split off), then the rest in document order
+    neighbours = {i + step for i in selected for step in (-1, 1)}
+    for index in sorted(range(len(blocks)), key=lambda i: (i not in neighbours, i)):
+        if index not in selected and used + sizes[index] <= max_tokens:
+            selected.add(index)
+            used += sizes[index]
+
+    return "\n\n".join(blocks[i] for i in sorted(selected))
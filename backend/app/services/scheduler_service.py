@@ -0,0 +1,317 @@
+"""
+Scheduler Service - Weighted fair sharing of upstream capacity
+Deficit round-robin across tenants in front of Firecrawl and OpenRouter
+"""
+import asyncio
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from app.core.config import settings
+from app.core.deadline import within_deadline
+from app.core.tracing import tracer
+from app.services.health_service import health_prober
+
+
+class TenantQuotaExceededError(Exception):
+    """Raised when a tenant already has too many requests queued."""
+
+
+class SchedulerBusyError(Exception):
+    """Raised when background work is refused because tenants need the capacity."""
+
+
+@dataclass
+class _Ticket:
+    """A queued unit of work waiting for an upstream slot."""
+    future: asyncio.Future
+    cost: float
+    enqueued_at: float
+
+
+@dataclass
+class _TenantState:
+    """Per-tenant queue, DRR deficit and statistics."""
+    queue: Deque[_Ticket] = field(default_factory=deque)
+    deficit: float = 0.0
+    in_flight: int = 0
+    submitted: int = 0
+    started: int = 0
+    completed: int = 0
+    rejected: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+    recent_waits: Deque[float] = field(default_factory=lambda: deque(maxlen=256))
+
+
+class FairScheduler:
+    """
+    Multi-tenant scheduler for a single upstream.
+
+    Each tenant gets its own FIFO queue. Free slots are handed out with
+    deficit round-robin: on every turn a tenant earns `quantum * weight`
+    credit and may start work as long as its credit covers the cost.
+    A tenant submitting a large batch therefore only delays others by
+    at most one turn, while idle capacity is still fully used.
+
+    Idle tenants (nothing queued or in flight) keep their statistics until
+    more than `max_tenants` are tracked; then the least recently active
+    idle tenants are forgotten.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        capacity: int,
+        quantum: float = 1.0,
+        max_queued_per_tenant: int = 50,
+        max_in_flight_per_tenant: Optional[int] = None,
+        weights: Optional[Dict[str, float]] = None,
+        health_name: Optional[str] = None,
+        max_tenants: int = 1000,
+    ):
+        self.name = name
+        self.health_name = health_name
+        self.capacity = max(1, capacity)
+        self.quantum = quantum
+        self.max_queued_per_tenant = max_queued_per_tenant
+        self.max_in_flight_per_tenant = max_in_flight_per_tenant
+        self.weights: Dict[str, float] = dict(weights or {})
+        self.max_tenants = max_tenants
+        self._tenants: "OrderedDict[str, _TenantState]" = OrderedDict()
+        self._round: Deque[str] = deque()
+        self._active = 0
+        self.background_started = 0
+        self.background_refused = 0
+
+    def set_weight(self, tenant_id: str, weight: float) -> None:
+        """Set the share weight of a tenant (default 1.0)."""
+        self.weights[tenant_id] = max(weight, 0.01)
+
+    def _weight(self, tenant_id: str) -> float:
+        return self.weights.get(tenant_id, 1.0)
+
+    def _state(self, tenant_id: str) -> _TenantState:
+        state = self._tenants.get(tenant_id)
+        if state is None:
+            state = self._tenants[tenant_id] = _TenantState()
+            self._forget_idle(keep=tenant_id)
+        self._tenants.move_to_end(tenant_id)
+        return state
+
+    def _forget_idle(self, keep: str) -> None:
+        """Drop the least recently active idle tenants above `max_tenants`, never `keep`."""
+        excess = len(self._tenants) - self.max_tenants
+        if excess <= 0:
+            return
+        idle = [
+            tenant_id for tenant_id, state in self._tenants.items()
+            if tenant_id != keep
+            and not state.queue and not state.in_flight and tenant_id not in self._round
+        ]
+        for tenant_id in idle[:excess]:
+            del self._tenants[tenant_id]
+
+    async def run(
+        self,
+        tenant_id: str,
+        func: Callable[..., Awaitable[Any]],
+        *args: Any,
+        cost: float = 1.0,
+        **kwargs: Any,
+    ) -> Any:
+        """
+        Wait for a fair share of upstream capacity, then run `func`.
+
+        Args:
+            tenant_id: Tenant the work is accounted to
+            func: Coroutine function calling the upstream
+            cost: Relative cost of the call (e.g. expected tokens / 1000)
+
+        Returns:
+            Whatever `func` returns
+        """
+        if self.health_name:
+            # Don't make callers queue for an upstream that is known to be down
+            health_prober.ensure_available(self.health_name)
+
+        state = self._state(tenant_id)
+        if len(state.queue) >= self.max_queued_per_tenant:
+            state.rejected += 1
+            raise TenantQuotaExceededError(
+                f"{self.name}: 대기 중인 요청이 너무 많습니다 ({len(state.queue)}건)"
+            )
+
+        ticket = _Ticket(
+            future=asyncio.get_running_loop().create_future(),
+            cost=max(cost, 0.01),
+            enqueued_at=time.monotonic(),
+        )
+        state.queue.append(ticket)
+        state.submitted += 1
+        if tenant_id not in self._round:
+            state.deficit = 0.0
+            self._round.append(tenant_id)
+            if len(self._round) == 1:
+                self._credit_head()
+        self._dispatch()
+
+        try:
+            # Queueing counts against the request deadline too
+            with tracer.span("scheduler.queue", upstream=self.name, tenant_id=tenant_id):
+                await within_deadline(ticket.future)
+        except BaseException:
+            if ticket.future.done() and not ticket.future.cancelled():
+                # Slot was granted in the same tick we got cancelled
+                self._release(tenant_id)
+            else:
+                self._discard(tenant_id, ticket)
+            raise
+
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            state.completed += 1
+            self._release(tenant_id)
+
+    async def run_background(
+        self,
+        func: Callable[..., Awaitable[Any]],
+        *args: Any,
+        reserve: int = 1,
+        **kwargs: Any,
+    ) -> Any:
+        """
+        Run low-priority work only if it cannot delay any tenant.
+
+        The slot is taken only when nothing is queued and at least
+        `reserve` slots stay free; background work never waits in line.
+
+        Raises:
+            SchedulerBusyError: if the upstream is busy
+        """
+        if self._round or self._active + reserve >= self.capacity:
+            self.background_refused += 1
+            raise SchedulerBusyError(f"{self.name} 사용 중 - 백그라운드 작업 건너뜀")
+        self._active += 1
+        self.background_started += 1
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            self._active -= 1
+            self._dispatch()
+
+    def _discard(self, tenant_id: str, ticket: _Ticket) -> None:
+        """Remove a cancelled ticket that never got a slot."""
+        state = self._tenants[tenant_id]
+        try:
+            state.queue.remove(ticket)
+        except ValueError:
+            return
+        if not state.queue and tenant_id in self._round:
+            self._round.remove(tenant_id)
+            state.deficit = 0.0
+
+    def _release(self, tenant_id: str) -> None:
+        self._active -= 1
+        self._tenants[tenant_id].in_flight -= 1
+        self._dispatch()
+
+    def _credit_head(self) -> None:
+        tenant_id = self._round[0]
+        self._tenants[tenant_id].deficit += self.quantum * self._weight(tenant_id)
+
+    def _next_turn(self) -> None:
+        """End the current tenant's turn; the next tenant earns its quantum."""
+        self._round.rotate(-1)
+        self._credit_head()
+
+    def _dispatch(self) -> None:
+        """Hand free slots to queued tickets in deficit round-robin order."""
+        blocked = 0
+        while self._active < self.capacity and self._round and blocked < len(self._round):
+            tenant_id = self._round[0]
+            state = self._tenants[tenant_id]
+            ticket = state.queue[0]
+
+            if (
+                self.max_in_flight_per_tenant is not None
+                and state.in_flight >= self.max_in_flight_per_tenant
+            ):
+                # Tenant is at its concurrency cap - let others go first
+                state.deficit = min(state.deficit, self.quantum * self._weight(tenant_id))
+                self._next_turn()
+                blocked += 1
+                continue
+            blocked = 0
+
+            if state.deficit < ticket.cost:
+                self._next_turn()
+                continue
+
+            state.queue.popleft()
+            state.deficit -= ticket.cost
+            if not state.queue:
+                self._round.popleft()
+                state.deficit = 0.0
+                if self._round:
+                    self._credit_head()
+
+            if ticket.future.done():
+                # Waiter was cancelled before the grant
+                continue
+
+            wait = time.monotonic() - ticket.enqueued_at
+            state.total_wait += wait
+            state.max_wait = max(state.max_wait, wait)
+            state.recent_waits.append(wait)
+            state.started += 1
+            state.in_flight += 1
+            self._active += 1
+            ticket.future.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and wait-time statistics per tenant."""
+        tenants = {}
+        for tenant_id, state in self._tenants.items():
+            recent = sorted(state.recent_waits)
+            p95 = recent[int(len(recent) * 0.95) - 1] if recent else 0.0
+            tenants[tenant_id] = {
+                "weight": self._weight(tenant_id),
+                "queue_depth": len(state.queue),
+                "in_flight": state.in_flight,
+                "submitted": state.submitted,
+                "completed": state.completed,
+                "rejected": state.rejected,
+                "avg_wait_ms": round(state.total_wait / state.started * 1000, 1) if state.started else 0.0,
+                "p95_wait_ms": round(p95 * 1000, 1),
+                "max_wait_ms": round(state.max_wait * 1000, 1),
+            }
+        return {
+            "upstream": self.name,
+            "capacity": self.capacity,
+            "active": self._active,
+            "queued": sum(len(s.queue) for s in self._tenants.values()),
+            "background": {"started": self.background_started, "refused": self.background_refused},
+            "tenants": tenants,
+        }
+
+
+firecrawl_scheduler = FairScheduler(
+    name="firecrawl",
+    capacity=settings.SCHEDULER_FIRECRAWL_CONCURRENCY,
+    max_queued_per_tenant=settings.SCHEDULER_MAX_QUEUED_PER_TENANT,
+    max_in_flight_per_tenant=settings.SCHEDULER_MAX_IN_FLIGHT_PER_TENANT,
+    weights=settings.TENANT_WEIGHTS,
+    health_name="firecrawl",
+)
+
+llm_scheduler = FairScheduler(
+    name="openrouter",
+    capacity=settings.SCHEDULER_LLM_CONCURRENCY,
+    max_queued_per_tenant=settings.SCHEDULER_MAX_QUEUED_PER_TENANT,
+    max_in_flight_per_tenant=settings.SCHEDULER_MAX_IN_FLIGHT_PER_TENANT,
+    weights=settings.TENANT_WEIGHTS,
+    health_name="openrouter",
+)
@@ -0,0 +1,100 @@
+"""
+Prompt encoding and JSON backend benchmark
+
+Run from backend/:
+    PYTHONPATH=. python benchmarks/serialization_bench.py
+
+Compares the old prompt encoding (indented JSON sliced to the budget) with
+the compact encoding, and the stdlib JSON encoder / decoder with orjson.
+"""
+import json
+import random
+import timeit
+
+from app.core.serialization import dumps, loads, orjson
+from app.services.prompt_service import encode_compact, serialize_for_prompt
+from app.services.token_service import estimate_tokens, truncate_to_tokens
+
+CATEGORIES = ["노트북", "스마트폰", "이어폰", "모니터", "키보드"]
+SELLERS = ["쿠팡", "11번가", "G마켓", "네이버쇼핑"]
+
+
+def auto_extract_result(items: int) -> dict:
+    random.seed(items)
+    return {
+        "detected_type": "products",
+        "items": [
+            {
+                "name": f"{random.choice(CATEGORIES)} 모델 {i}",
+                "price": f"₩{random.randint(10, 3000) * 1000:,}",
+                "category": random.choice(CATEGORIES),
+                "rating": round(random.uniform(1, 5), 1),
+                "review_count": random.randint(0, 5000),
+                "seller": {"name": random.choice(SELLERS), "verified": random.random() > 0.3},
+                "url": f"https://shop.example.com/products/{i}",
+            }
+            for i in range(items)
+        ],
+        "metadata": {"source_type": "ecommerce", "item_count": items, "language": "ko"},
+    }
+
+
+def old_encoding(data: dict, max_tokens: int) -> str:
+    return truncate_to_tokens(json.dumps(data, ensure_ascii=False, indent=2), max_tokens)
+
+
+def parses(text: str) -> bool:
+    try:
+        json.loads(text)
+        return True
+    except ValueError:
+        return False
+
+
+def bench_tokens() -> None:
+    print("## Prompt tokens (estimate_tokens)")
+    print(f"{'items':>6} {'indent=2':>10} {'minified':>10} {'compact':>10} {'saved':>7}")
+    for items in (10, 50, 200):
+        data = auto_extract_result(items)
+        indented = estimate_tokens(json.dumps(data, ensure_ascii=False, indent=2))
+        minified = estimate_tokens(json.dumps(data, ensure_ascii=False, separators=(",", ":")))
+        compact = estimate_tokens(encode_compact(data))
+        print(f"{items:>6} {indented:>10} {minified:>10} {compact:>10} {1 - compact / indented:>7.0%}")
+
+    print("\n## Items that fit a 3000-token budget (200 items)")
+    data = auto_extract_result(200)
+    old = old_encoding(data, 3000)
+    new = serialize_for_prompt(data, 3000)
+    old_items = old.count('"name"')
+    new_items = len(new.splitlines()) - 3  # JSON head, table title, column header
+    print(f"old: ~{old_items} items, valid JSON: {parses(old)}, ends with: {old.splitlines()[-1].strip()!r}")
+    print(f"new: {new_items} whole items, header: {new.splitlines()[1]!r}")
+
+
+def bench_cpu(number: int = 20) -> None:
+    print(f"\n## JSON backend (orjson {'installed' if orjson else 'NOT installed - stdlib fallback'})")
+    response = {
+        "success": True,
+        "raw_content": "# 상품 목록\n" + "상품 설명 텍스트 " * 60000,
+        "extracted_data": auto_extract_result(500),
+    }
+    body = dumps(response)
+    cases = [
+        ("encode response", lambda: json.dumps(response, ensure_ascii=False).encode("utf-8"), lambda: dumps(response)),
+        ("decode response", lambda: json.loads(body), lambda: loads(body)),
+    ]
+    print(f"payload: {len(body) / 1e6:.1f} MB")
+    for name, stdlib, fast in cases:
+        t_std = timeit.timeit(stdlib, number=number) / number * 1000
+        t_fast = timeit.timeit(fast, number=number) / number * 1000
+        print(f"{name:<16} stdlib {t_std:7.2f} ms   fast {t_fast:7.2f} ms   {t_std / t_fast:5.1f}x")
+
+    data = auto_extract_result(200)
+    t_old = timeit.timeit(lambda: old_encoding(data, 3000), number=number) / number * 1000
+    t_new = timeit.timeit(lambda: serialize_for_prompt(data, 3000), number=number) / number * 1000
+    print(f"{'prompt (200 items)':<16} old {t_old:7.2f} ms   new {t_new:7.2f} ms (includes whole-item fitting)")
+
+
+if __name__ == "__main__":
+    bench_tokens()
+    bench_cpu()
@@ -0,0 +1,48 @@
+"""
+Admission controller tests
+Shedding on predicted wait, and no lockout of classes slower than their budget
+"""
+import pytest
+
+from app.core.admission import BATCH, INTERACTIVE, AdmissionController, AdmissionRejectedError, RequestClass
+
+QUICK = RequestClass("quick", "POST", "/api/v1/scraping/quick", 20.0, 90.0)
+INSIGHTS = RequestClass("insights", "POST", "/api/v1/insights/", 8.0, 60.0)
+
+
+def _controller(max_concurrent: int = 1) -> AdmissionController:
+    return AdmissionController([QUICK, INSIGHTS], max_concurrent=max_concurrent, max_queue=10)
+
+
+@pytest.mark.asyncio
+async def test_class_slower_than_its_budget_is_not_locked_out():
+    controller = _controller()
+    for _ in range(4):
+        slot = await controller.acquire(INSIGHTS, INTERACTIVE, budget=60.0)
+        controller.release(slot, 100.0)
+    assert controller.stats()["classes"]["insights"]["estimated_cost_seconds"] > 60.0
+
+    # Idle controller: the request is admitted, so the estimate can recover
+    slot = await controller.acquire(INSIGHTS, INTERACTIVE, budget=60.0)
+    controller.release(slot, 5.0)
+    assert controller.stats()["classes"]["insights"]["shed_on_arrival"] == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("priority", [INTERACTIVE, BATCH])
+async def test_free_slot_admits_budget_below_cost(priority):
+    controller = _controller()
+    slot = await controller.acquire(QUICK, priority, budget=5.0)
+    controller.release(slot)
+
+
+@pytest.mark.asyncio
+async def test_sheds_when_predicted_wait_exceeds_budget():
+    controller = _controller()
+    busy = await controller.acquire(QUICK, INTERACTIVE, budget=90.0)
+
+    with pytest.raises(AdmissionRejectedError) as rejected:
+        await controller.acquire(QUICK, INTERACTIVE, budget=10.0)
+    assert rejected.value.retry_after == pytest.approx(20.0, abs=0.5)
+    assert controller.stats()["classes"]["quick"]["shed_on_arrival"] == 1
+    controller.release(busy)
@@ -0,0 +1,196 @@
+"""
+Rate limit service tests
+Token bucket semantics (Redis Lua script and local bucket) and the local fallback
+
+The Redis bucket runs against fakeredis (with Lua support) by default;
+set REDIS_TEST_URL to run it against a real Redis server instead.
+"""
+import asyncio
+import os
+import types
+import uuid
+
+import pytest
+import pytest_asyncio
+
+from app.services import rate_limit_service
+from app.services.rate_limit_service import (
+    DistributedRateLimiter,
+    LocalTokenBucket,
+    RateLimitExceededError,
+    RedisTokenBucket,
+)
+
+REDIS_TEST_URL = os.environ.get("REDIS_TEST_URL", "")
+# Nothing listens here: connections are refused at once
+UNREACHABLE_REDIS_URL = "redis://127.0.0.1:1/0"
+
+
+async def _redis_bucket() -> RedisTokenBucket:
+    if REDIS_TEST_URL:
+        return RedisTokenBucket(REDIS_TEST_URL)
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")  # fakeredis needs it to run Lua scripts
+    return RedisTokenBucket(client=fakeredis.FakeAsyncRedis())
+
+
+@pytest_asyncio.fixture(params=["local", "redis"])
+async def bucket(request):
+    if request.param == "local":
+        yield LocalTokenBucket()
+        return
+    backend = await _redis_bucket()
+    yield backend
+    await backend.close()
+
+
+@pytest.fixture
+def key() -> str:
+    return f"ratelimit:test:{uuid.uuid4().hex}"
+
+
+@pytest.mark.asyncio
+async def test_bucket_allows_burst_up_to_capacity(bucket, key):
+    for _ in range(3):
+        assert await bucket.try_acquire(key, rate=1.0, capacity=3) == 0
+
+    wait = await bucket.try_acquire(key, rate=1.0, capacity=3)
+    assert wait == pytest.approx(1.0, abs=0.1)
+
+
+@pytest.mark.asyncio
+async def test_bucket_refills_at_rate(bucket, key):
+    for _ in range(2):
+        assert await bucket.try_acquire(key, rate=20.0, capacity=2) == 0
+    assert await bucket.try_acquire(key, rate=20.0, capacity=2) > 0
+
+    await asyncio.sleep(0.15)  # 3 tokens' worth, capped at capacity
+    assert await bucket.try_acquire(key, rate=20.0, capacity=2) == 0
+    assert await bucket.try_acquire(key, rate=20.0, capacity=2) == 0
+    assert await bucket.try_acquire(key, rate=20.0, capacity=2) > 0
+
+
+@pytest.mark.asyncio
+async def test_bucket_denied_call_takes_no_tokens(bucket, key):
+    assert await bucket.try_acquire(key, rate=1.0, capacity=1) == 0
+    first = await bucket.try_acquire(key, rate=1.0, capacity=1)
+    second = await bucket.try_acquire(key, rate=1.0, capacity=1)
+    assert 0 < second <= first
+
+
+@pytest.mark.asyncio
+async def test_bucket_reserve_is_left_for_other_callers(bucket, key):
+    for _ in range(2):
+        assert await bucket.try_acquire(key, rate=1.0, capacity=4, reserve=2) == 0
+    wait = await bucket.try_acquire(key, rate=1.0, capacity=4, reserve=2)
+    assert wait == pytest.approx(1.0, abs=0.1)
+
+    # Callers without a reserve still get the reserved tokens
+    for _ in range(2):
+        assert await bucket.try_acquire(key, rate=1.0, capacity=4) == 0
+    assert await bucket.try_acquire(key, rate=1.0, capacity=4) > 0
+
+
+@pytest.mark.asyncio
+async def test_try_acquire_spare_keeps_reserve_for_interactive_calls():
+    backend = await _redis_bucket()
+    # Burst of 16 // 4 = 4 calls, half of them reserved
+    limiter = DistributedRateLimiter(backend, {"firecrawl": 16}, max_wait=0)
+    try:
+        assert await limiter.try_acquire_spare("firecrawl", reserve_ratio=0.5)
+        assert await limiter.try_acquire_spare("firecrawl", reserve_ratio=0.5)
+        assert not await limiter.try_acquire_spare("firecrawl", reserve_ratio=0.5)
+        assert limiter.spare_denials == 1
+
+        # The reserved half is still there for interactive requests
+        await limiter.acquire("firecrawl")
+        await limiter.acquire("firecrawl")
+        with pytest.raises(RateLimitExceededError):
+            await limiter.acquire("firecrawl")
+        assert limiter.fallback_calls == 0
+    finally:
+        await backend.close()
+
+
+@pytest.mark.asyncio
+async def test_unlimited_upstream_never_waits():
+    limiter = DistributedRateLimiter(LocalTokenBucket(), {}, max_wait=0)
+    for _ in range(100):
+        await limiter.acquire("firecrawl")
+    assert await limiter.try_acquire_spare("firecrawl")
+
+
+@pytest.mark.asyncio
+async def test_falls_back_to_local_share_when_redis_is_unreachable():
+    backend = RedisTokenBucket(UNREACHABLE_REDIS_URL)
+    limiter = DistributedRateLimiter(backend, {"openrouter": 16}, expected_replicas=2, max_wait=0)
+    try:
+        # This replica's local limit is 16 / 2 replicas = 8 per minute, a burst of 2 calls
+        await limiter.acquire("openrouter")
+        await limiter.acquire("openrouter")
+        with pytest.raises(RateLimitExceededError):
+            await limiter.acquire("openrouter")
+
+        assert limiter.fallback_calls == 3
+        assert limiter.rejections == 1
+        assert limiter.stats()["backend_available"] is False
+    finally:
+        await backend.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("per_minute", [4, 20, 60])
+async def test_grants_per_minute_stay_near_the_limit(monkeypatch, per_minute):
+    clock = types.SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(rate_limit_service, "time", types.SimpleNamespace(monotonic=lambda: clock.now))
+    limiter = DistributedRateLimiter(LocalTokenBucket(), {"firecrawl": per_minute}, max_wait=0)
+
+    # A client retrying every 100 ms for one simulated minute, starting on a full bucket
+    grants = 0
+    for _ in range(600):
+        if await limiter.try_acquire_spare("firecrawl", reserve_ratio=0.0):
+            grants += 1
+        clock.now += 0.1
+
+    assert per_minute <= grants <= per_minute + max(1, per_minute // 4)
+
+
+class _FlakyBackend(LocalTokenBucket):
+    """Local bucket that fails its first `failures` calls like an unreachable Redis."""
+
+    def __init__(self, failures: int):
+        super().__init__()
+        self.failures = failures
+        self.calls = 0
+
+    async def try_acquire(self, *args, **kwargs) -> float:
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError("redis down")
+        return await super().try_acquire(*args, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_skips_backend_during_cool_down():
+    backend = _FlakyBackend(failures=1)
+    limiter = DistributedRateLimiter(backend, {"firecrawl": 60}, redis_retry_after=60.0)
+
+    for _ in range(3):
+        await limiter.acquire("firecrawl")
+
+    assert backend.calls == 1  # Not retried while cooling down
+    assert limiter.fallback_calls == 3
+
+
+@pytest.mark.asyncio
+async def test_returns_to_backend_after_cool_down():
+    backend = _FlakyBackend(failures=1)
+    limiter = DistributedRateLimiter(backend, {"firecrawl": 10}, redis_retry_after=0.05)
+
+    await limiter.acquire("firecrawl")
+    await asyncio.sleep(0.1)
+    await limiter.acquire("firecrawl")
+
+    assert backend.calls == 2
+    assert limiter.fallback_calls == 1
+    assert limiter.stats()["backend_available"] is True
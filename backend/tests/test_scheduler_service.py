@@ -0,0 +1,43 @@
+"""
+Scheduler service tests
+Forgetting idle tenants above max_tenants
+"""
+import asyncio
+
+import pytest
+
+from app.services.scheduler_service import FairScheduler
+
+
+async def _hold(release: asyncio.Event) -> str:
+    await release.wait()
+    return "done"
+
+
+async def _noop() -> str:
+    return "done"
+
+
+@pytest.mark.asyncio
+async def test_new_tenant_is_not_forgotten_on_arrival():
+    scheduler = FairScheduler("test", capacity=2, max_tenants=2)
+    release = asyncio.Event()
+    busy = [asyncio.create_task(scheduler.run(tenant, _hold, release)) for tenant in ("a", "b")]
+    await asyncio.sleep(0)
+
+    # Both slots and both tracked tenants are taken by a and b
+    waiting = [asyncio.create_task(scheduler.run(tenant, _noop)) for tenant in ("c", "d")]
+    await asyncio.sleep(0)
+    assert set(scheduler._tenants) == {"a", "b", "c", "d"}
+
+    release.set()
+    assert await asyncio.gather(*busy, *waiting) == ["done"] * 4
+
+
+@pytest.mark.asyncio
+async def test_idle_tenants_are_forgotten_above_max_tenants():
+    scheduler = FairScheduler("test", capacity=2, max_tenants=2)
+    for tenant in ("a", "b", "c"):
+        await scheduler.run(tenant, _noop)
+
+    assert list(scheduler._tenants) == ["b", "c"]